@@ -0,0 +1,56 @@
+# -*- coding: utf-8 -*-
+"""
+@Time: 2026/10/18 10:00
+@Author: ZJun
+@File: bench_group.py
+@Description: This file benchmarks Group.chat, Group.dialogue and Group.task(strategy="auto") against the mock client.
+
+Run from the repository root:
+    python -m benchmarks.bench_group --turns 50 --members 4
+    python -m benchmarks.bench_group --latency 0.05  # emulate the network
+"""
+
+from benchmarks.utils import build_group, measure, report, parse_args
+
+
+def bench_chat(turns: int, members: int, latency: float):
+    def run():
+        group = build_group(members, latency)
+        for i in range(turns):
+            group.chat(f"Message {i}: how is the project going?")
+        return turns
+    return run
+
+
+def bench_dialogue(turns: int, members: int, latency: float):
+    def run():
+        # the agents never say "[=END=]", so the dialogue runs all its turns plus the two closing ones
+        group = build_group(members, latency)
+        group.user_input("Let's discuss the project.")
+        group.dialogue(max_turns=turns)
+        return turns + 2
+    return run
+
+
+def bench_task(members: int, latency: float, max_concurrency: int, speculative_planning: bool = False):
+    def run():
+        group = build_group(members, latency)
+        group.task("Write a project report.", strategy="auto", max_concurrency=max_concurrency, speculative_planning=speculative_planning)
+        return members
+    return run
+
+
+def main():
+    args = parse_args("Benchmark the group conversation and task loops.")
+    results = [
+        measure("Group.chat", bench_chat(args.turns, args.members, args.latency), args.repeat),
+        measure("Group.dialogue", bench_dialogue(args.turns, args.members, args.latency), args.repeat),
+        measure("Group.task(auto)", bench_task(args.members, args.latency, 1), args.repeat),
+        measure("Group.task(auto, max_concurrency=4)", bench_task(args.members, args.latency, 4), args.repeat),
+        measure("Group.task(auto, speculative_planning)", bench_task(args.members, args.latency, 4, True), args.repeat),
+    ]
+    report(results, args.latency)
+
+
+if __name__ == "__main__":
+    main()
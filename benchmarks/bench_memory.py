@@ -0,0 +1,56 @@
+# -*- coding: utf-8 -*-
+"""
+@Time: 2026/10/18 10:00
+@Author: ZJun
+@File: bench_memory.py
+@Description: This file benchmarks Memory.get_memorys_str against the mock client, with and without the long term memory database and filters.
+
+Run from the repository root:
+    python -m benchmarks.bench_memory --turns 200
+"""
+
+import tempfile
+
+from src.utilities.mock_client import MockOpenAI, MockEmbeddingFunction
+from src.memory import Memory
+from benchmarks.utils import measure, report, parse_args
+
+
+def build_memory(latency: float, long_term_memories: int, filter_mode: str) -> Memory:
+    memory = Memory(model_client=MockOpenAI(latency=latency), db_path=tempfile.mkdtemp() if long_term_memories else None,
+                    embedding_function=MockEmbeddingFunction(), filter_mode=filter_mode)
+    for i in range(memory.working_memory_threshold):
+        memory.working_memory.append(f"Working memory {i} about the project schedule.")
+    if long_term_memories:
+        memory.db_collection.add(
+            documents=[f"Long term memory {i} about topic {i % 17}." for i in range(long_term_memories)],
+            ids=[str(i) for i in range(long_term_memories)],
+            metadatas=[{"timestamp": ""} for _ in range(long_term_memories)],
+        )
+    return memory
+
+
+def bench_get_memorys_str(turns: int, latency: float, long_term_memories: int, enhanced_filter: bool, filter_mode: str = "local"):
+    memory = build_memory(latency, long_term_memories, filter_mode)
+
+    def run():
+        for i in range(turns):
+            memory.get_memorys_str(query=f"What about topic {i % 17}?", enhanced_filter=enhanced_filter)
+        return turns
+    return run
+
+
+def main():
+    args = parse_args("Benchmark the memory retrieval.")
+    results = [
+        measure("get_memorys_str", bench_get_memorys_str(args.turns, args.latency, 0, False), args.repeat),
+        measure("get_memorys_str(llm filter)", bench_get_memorys_str(args.turns, args.latency, 0, True, "llm"), args.repeat),
+        measure("get_memorys_str(db=1000)", bench_get_memorys_str(args.turns, args.latency, 1000, False), args.repeat),
+        measure("get_memorys_str(db=1000,local filter)", bench_get_memorys_str(args.turns, args.latency, 1000, True), args.repeat),
+        measure("get_memorys_str(db=1000,llm filter)", bench_get_memorys_str(args.turns, args.latency, 1000, True, "llm"), args.repeat),
+    ]
+    report(results, args.latency)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+# -*- coding: utf-8 -*-
+"""
+@Time: 2026/10/18 10:00
+@Author: ZJun
+@File: bench_prompt.py
+@Description: This file benchmarks the per-turn cost of Group._build_send_message as the message history grows.
+
+Run from the repository root:
+    python -m benchmarks.bench_prompt --turns 200
+"""
+
+import time
+
+from src.protocol import Message
+from benchmarks.utils import build_group, parse_args
+
+
+def bench_history(history: int, turns: int, members: int, cut_off):
+    """
+    Fills the group with `history` messages, then measures `turns` turns of appending one message and building the next prompt:
+    the whole prompt, the message sections, and the message sections rebuilt from scratch (every message formatted again).
+    """
+    group = build_group(members)
+    names = list(group.members_map)
+    group.update_group_messages([Message(sender=names[i % members], action="talk", result=f"Message {i} " * 20) for i in range(history)])
+    group._build_send_message(cut_off=cut_off, send_to=names[0]) # the first call formats the existing history
+
+    prompt = incremental = naive = 0.0
+    for i in range(turns):
+        group.update_group_messages(Message(sender=names[i % members], action="talk", result=f"Reply {i} " * 20))
+        send_to = names[(i + 1) % members]
+        start = time.perf_counter()
+        group._build_send_message(cut_off=cut_off, send_to=send_to)
+        prompt += time.perf_counter() - start
+        group._prompt_builder._context = None # force a full rebuild, i.e. format every message again
+        start = time.perf_counter()
+        group._prompt_builder.split_messages(group.group_messages.context, send_to, cut_off)
+        naive += time.perf_counter() - start
+        start = time.perf_counter()
+        group._prompt_builder.split_messages(group.group_messages.context, send_to, cut_off)
+        incremental += time.perf_counter() - start
+    return prompt / turns, incremental / turns, naive / turns
+
+
+def main():
+    args = parse_args("Benchmark the prompt construction on long histories.")
+    print(f"{'history':>10}{'cut_off':>10}{'prompt ms/turn':>18}{'messages ms/turn':>20}{'rebuilt ms/turn':>18}")
+    for cut_off in [3, None]:
+        for history in [100, 1000, 10000]:
+            prompt, incremental, naive = bench_history(history, args.turns, args.members, cut_off)
+            print(f"{history:>10}{str(cut_off):>10}{prompt * 1000:>18.3f}{incremental * 1000:>20.3f}{naive * 1000:>18.3f}")
+
+
+if __name__ == "__main__":
+    main()
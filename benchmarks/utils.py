@@ -0,0 +1,80 @@
+# -*- coding: utf-8 -*-
+"""
+@Time: 2026/10/18 10:00
+@Author: ZJun
+@File: utils.py
+@Description: This file contains the shared helpers of the benchmarks: group fixtures backed by the mock client, timing and reporting.
+"""
+
+from typing import List, Dict, Callable
+import argparse
+import statistics
+import time
+
+from src.utilities.mock_client import MockOpenAI
+from src.protocol import Env
+from src.agent import Agent
+from src.group import Group
+
+
+def plan_responder(**kwargs) -> Dict:
+    """
+    Scripted `parse` replies for the group planner: the first member kicks off the plan and every other member
+    gets one step depending on it only, and no extra task is ever assigned in transit.
+    """
+    prompt = kwargs["messages"][-1]["content"]
+    if "extra tasks" in prompt:
+        return {"tasks": []}
+    names = list(kwargs["response_format"].model_fields["tasks"].annotation.__args__[0].model_fields["agent_name"].annotation.__args__)
+    return {"tasks": [
+        {"agent_name": name, "task": f"Step {i+1} for {name}", "receive_information_from": names[:1] if i else []}
+        for i, name in enumerate(names)
+    ]}
+
+
+def build_group(members: int = 4, latency: float = 0.0, responses=None) -> Group:
+    model_client = MockOpenAI(responses=responses, parsed_responses=plan_responder, latency=latency)
+    agents = [
+        Agent(name=f"Agent_{i}", role=f"Role {i}", description=f"Agent_{i} is member {i} of the team.", model_client=model_client)
+        for i in range(members)
+    ]
+    env = Env(description="A team working on a shared project.", members=agents)
+    return Group(env=env, model_client=model_client)
+
+
+def measure(name: str, run: Callable[[], int], repeat: int = 1) -> Dict:
+    """
+    Runs `run` `repeat` times, `run` returns the number of turns it made.
+    Reports the throughput and the wall time per turn.
+    """
+    durations: List[float] = []
+    turns = 0
+    for _ in range(repeat):
+        start = time.perf_counter()
+        turns += run()
+        durations.append(time.perf_counter() - start)
+    total = sum(durations)
+    return {
+        "name": name,
+        "turns": turns,
+        "seconds": total,
+        "turns_per_second": turns / total if total else float("inf"),
+        "ms_per_turn": 1000 * total / turns if turns else 0.0,
+        "ms_per_run_median": 1000 * statistics.median(durations),
+    }
+
+
+def report(results: List[Dict], latency: float) -> None:
+    print(f"\nmock latency per model call: {latency * 1000:.1f} ms")
+    print(f"{'benchmark':<42}{'turns':>8}{'turns/s':>12}{'ms/turn':>12}{'ms/run (p50)':>16}")
+    for r in results:
+        print(f"{r['name']:<42}{r['turns']:>8}{r['turns_per_second']:>12.1f}{r['ms_per_turn']:>12.2f}{r['ms_per_run_median']:>16.2f}")
+
+
+def parse_args(description: str) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=description)
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds the mock client waits per call, 0 measures the framework overhead only.")
+    parser.add_argument("--turns", type=int, default=50, help="Number of turns per run.")
+    parser.add_argument("--members", type=int, default=4, help="Number of agents in the group.")
+    parser.add_argument("--repeat", type=int, default=3, help="Number of runs per benchmark.")
+    return parser.parse_args()
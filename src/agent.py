@@ -6,19 +6,29 @@
 @Description: This file contains the Agent class which is a subclass of the Member class. The Agent class is used to represent an agent in the system.
 """
 
-from typing import List,Union,Dict
+from typing import List,Union,Dict,Iterator,AsyncIterator,Literal
 from openai import OpenAI,AsyncOpenAI
 import requests
+import httpx
 import json
+import time
+import asyncio
+import threading
+import weakref
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+import websockets
 import websockets.sync.client
+from chromadb import EmbeddingFunction
 
 from src.utilities.logger import Logger
-from src.utilities.utils import function_to_schema
+from src.utilities.utils import function_to_schema, is_async_client, acall, ChatCompletionStreamAccumulator
 from src.protocol import Member,Message
 from src.memory import Memory
 from src.planner import Planner
 
 
+_NO_TOOL_SLOT = object() # result of a tool call that timed out waiting for a free slot
+
 class Agent(Member):
     def __init__(
             self, 
@@ -31,6 +41,10 @@ class Agent(Member):
             tools: List["function"] = None, # List of Python Functions for openai model
             dify_access_token: str = None,
             websocket_url: str = None,
+            tool_timeout: float = None, # Seconds to wait for each tool call, None means no limit
+            max_tool_concurrency: int = 4, # Maximum number of tool calls running at the same time
+            max_tool_iterations: int = 5, # Maximum number of tool calling rounds in one turn
+            tool_token_budget: int = None, # Maximum number of tokens spent on tool calling rounds in one turn
             verbose: bool = False
             ):
         """
@@ -46,6 +60,10 @@ class Agent(Member):
             tools (List["function"], optional): The tools for the agent. Defaults to None.
             dify_access_token (str, optional): The Dify access token for the agent. Defaults to None.
             websocket_url (str, optional): The websocket URL for the agent. Defaults to None.
+            tool_timeout (float, optional): The number of seconds to wait for each tool call. Defaults to None meaning no limit.
+            max_tool_concurrency (int, optional): The maximum number of tool calls of the agent executed concurrently, across all its turns. Defaults to 4.
+            max_tool_iterations (int, optional): The maximum number of tool calling rounds before the agent must answer. Defaults to 5.
+            tool_token_budget (int, optional): The number of tokens after which the agent must answer instead of calling more tools. Defaults to None meaning no limit.
             verbose (bool, optional): The verbosity of the agent. Defaults to False.
         
         """
@@ -55,6 +73,12 @@ class Agent(Member):
         self.model_client = model_client
         self.temperature = temperature
         self.tools = tools
+        self.tool_timeout = tool_timeout
+        self.max_tool_concurrency = max_tool_concurrency
+        self._tool_semaphore = threading.BoundedSemaphore(max(1,max_tool_concurrency))
+        self._tool_asemaphores = weakref.WeakKeyDictionary() # one per event loop
+        self.max_tool_iterations = max_tool_iterations
+        self.tool_token_budget = tool_token_budget
         self.dify_access_token = dify_access_token
         self.websocket_url = websocket_url
         self.verbose = verbose
@@ -72,30 +96,87 @@ class Agent(Member):
     def do(self, 
            message: str,model:str="gpt-4o-mini",
            use_tools:bool=True,use_memory:bool=True,use_planner:bool=True,
-           keep_memory:bool=True) -> List[Message]:
+           keep_memory:bool=True,stream:bool=False) -> Union[List[Message],Iterator[Message]]:
+        """
+        Sends the message to the agent and returns its response.
+
+        Args:
+            stream (bool, optional): If True, return an iterator instead of a list. It yields `talk_chunk` messages with partial content as soon as the model generates it,
+                `tool_call` messages with tool results, and finally the complete `talk` message. Dify and websocket agents yield the complete message only. Defaults to False.
+        """
+        if stream:
+            return self._do_stream(message,model,use_tools,use_memory,use_planner,keep_memory)
         if self.dify_access_token:
             self._logger.log(level="info", message=f"Calling Dify agent [{self.name}]",color="bold_green")
             response = self._call_dify_http_agent(self.dify_access_token, message)
         elif self.websocket_url:
             self._logger.log(level="info", message=f"Calling Websocket agent [{self.name}]",color="bold_green")
             response = self._call_websocket_agent(message)
-        elif isinstance(self.model_client,OpenAI):
+        elif self.model_client is not None and not is_async_client(self.model_client):
             self._logger.log(level="info", message=f"Calling OpenAI agent [{self.name}]",color="bold_green")
             response = self._call_openai_agent(message,model,use_tools,use_memory,use_planner,keep_memory)
+        elif self.model_client is not None:
+            self._logger.log(level="error", message=f"Agent {self.name} has an async model client, use `ado` instead.",color="red")
+            raise ValueError(f"Agent {self.name} has an async model client, please use `await agent.ado(...)` instead.")
         else:
             self._logger.log(level="error", message=f"No model client or Dify access token provided for agent {self.name}.",color="red")
-            raise ValueError("No model client or Dify access token provided, please provide one for agent {self.name}.")
+            raise ValueError(f"No model client or Dify access token provided, please provide one for agent {self.name}.")
         return response
 
-    def init_memory(self,working_memory_threshold:int=10,semantic_memory_db_path ="temp",model:str="gpt-4o-mini",language:str=None) -> None:
+    async def ado(self, 
+                  message: str,model:str="gpt-4o-mini",
+                  use_tools:bool=True,use_memory:bool=True,use_planner:bool=True,
+                  keep_memory:bool=True,stream:bool=False) -> Union[List[Message],AsyncIterator[Message]]:
+        """
+        Async version of `do`. Works with both OpenAI and AsyncOpenAI model clients, sync clients are run in a worker thread.
+        With `stream=True` the awaited result is an async iterator, e.g. `async for chunk in await agent.ado(message,stream=True)`.
+        """
+        if stream:
+            return self._ado_stream(message,model,use_tools,use_memory,use_planner,keep_memory)
+        if self.dify_access_token:
+            self._logger.log(level="info", message=f"Calling Dify agent [{self.name}]",color="bold_green")
+            response = await self._acall_dify_http_agent(self.dify_access_token, message)
+        elif self.websocket_url:
+            self._logger.log(level="info", message=f"Calling Websocket agent [{self.name}]",color="bold_green")
+            response = await self._acall_websocket_agent(message)
+        elif self.model_client is not None:
+            self._logger.log(level="info", message=f"Calling OpenAI agent [{self.name}]",color="bold_green")
+            response = await self._acall_openai_agent(message,model,use_tools,use_memory,use_planner,keep_memory)
+        else:
+            self._logger.log(level="error", message=f"No model client or Dify access token provided for agent {self.name}.",color="red")
+            raise ValueError(f"No model client or Dify access token provided, please provide one for agent {self.name}.")
+        return response
+
+    def _do_stream(self,message:str,model:str,use_tools:bool,use_memory:bool,use_planner:bool,keep_memory:bool) -> Iterator[Message]:
+        if self.dify_access_token or self.websocket_url or self.model_client is None or is_async_client(self.model_client):
+            yield from self.do(message,model,use_tools,use_memory,use_planner,keep_memory)
+            return
+        self._logger.log(level="info", message=f"Calling OpenAI agent [{self.name}] (stream)",color="bold_green")
+        yield from self._stream_openai_agent(message,model,use_tools,use_memory,use_planner,keep_memory)
+
+    async def _ado_stream(self,message:str,model:str,use_tools:bool,use_memory:bool,use_planner:bool,keep_memory:bool) -> AsyncIterator[Message]:
+        if self.dify_access_token or self.websocket_url or self.model_client is None:
+            for m in await self.ado(message,model,use_tools,use_memory,use_planner,keep_memory):
+                yield m
+            return
+        self._logger.log(level="info", message=f"Calling OpenAI agent [{self.name}] (stream)",color="bold_green")
+        async for m in self._astream_openai_agent(message,model,use_tools,use_memory,use_planner,keep_memory):
+            yield m
+
+    def init_memory(self,working_memory_threshold:int=10,semantic_memory_db_path ="temp",model:str="gpt-4o-mini",language:str=None,background_extraction:bool=True,extraction_batch_size:int=1,memory_filter:Literal["local","llm"]="local",embedding_function:Union[Literal["openai","local"],EmbeddingFunction]="openai",shared_collection:str=None) -> None:
         """
         Initializes the memory for the agent. Currently only supported for OpenAI model client agent.
+        With `background_extraction` the long term memory extraction runs in the background, call `agent.memory.flush()` to wait for it.
+        With `extraction_batch_size` > 1 the evicted working memories are extracted in batches with a single call each.
+        `memory_filter` selects how the retrieved memories are filtered every turn: "local" (scores and diversity, no model call) or "llm".
+        `embedding_function` embeds the long term memories: "openai", "local" (on CPU) or any Chroma embedding function, embeddings are cached.
+        With `shared_collection` the agents on the same `semantic_memory_db_path` keep their long term memories in that one collection.
         """
         if not self.model_client:
             self.memory = None
             self._logger.log(level="error", message=f"Currently Memory is only supported for OpenAI model client.",color="bold_red")
             return
-        self.memory = Memory(working_memory_threshold,self.model_client, model, verbose=self.verbose,db_path=semantic_memory_db_path,language=language)
+        self.memory = Memory(working_memory_threshold,self.model_client, model, verbose=self.verbose,db_path=semantic_memory_db_path,language=language,background_extraction=background_extraction,extraction_batch_size=extraction_batch_size,filter_mode=memory_filter,embedding_function=embedding_function,shared_collection=shared_collection)
         self._logger.log(level="info", message=f"Memory initialized for agent {self.name}.",color="bold_green")
 
     def init_planner(self,model:str="gpt-4o-mini",language:str=None) -> None:
@@ -111,6 +192,11 @@ class Agent(Member):
             return
         self.memory.manual_add_long_term_memory(memory)
 
+    async def aadd_memory(self,memory:str) -> None:
+        if not self.memory:
+            return
+        await self.memory.amanual_add_long_term_memory(memory)
+
     def add_working_memory(self,memory:str) -> None:
         if not self.memory:
             return
@@ -132,7 +218,201 @@ class Agent(Member):
         Returns:
             Message: The response from the agent.
         """
+        return [m for m in self._stream_openai_agent(query,model,use_tools,use_memory,use_planner,keep_memory,stream=False) if m.action == "talk"]
+
+    async def _acall_openai_agent(self,query:str,
+                                  model:str="gpt-4o-mini",
+                                  use_tools:bool=True,
+                                  use_memory:bool=False,
+                                  use_planner:bool=False,
+                                  keep_memory:bool=False
+                                  ) -> List[Message]:
+        """
+        Async version of `_call_openai_agent`, tools can be plain functions or coroutine functions.
+        """
+        return [m async for m in self._astream_openai_agent(query,model,use_tools,use_memory,use_planner,keep_memory,stream=False) if m.action == "talk"]
+
+    def _stream_openai_agent(self,query:str,
+                             model:str="gpt-4o-mini",
+                             use_tools:bool=True,
+                             use_memory:bool=False,
+                             use_planner:bool=False,
+                             keep_memory:bool=False,
+                             stream:bool=True
+                             ) -> Iterator[Message]:
+        original_query = query
+
+        if use_memory and self.memory and (memorys_str := self.memory.get_memorys_str(query = original_query,enhanced_filter=True)):
+            query =  f"### Your Recent Memory:\n```{memorys_str}```\n\n" + query
+
+        messages = self._build_openai_messages(query,use_planner)
+
+        tools = self.tools_schema if self.tools_schema and use_tools else None
+        for m in self._iter_openai_agent(messages,model,tools,stream):
+            yield m
+
+        if keep_memory and self.memory:
+            self.memory.add_working_memory(self._build_working_memory(original_query,m.result))
+
+    async def _astream_openai_agent(self,query:str,
+                                    model:str="gpt-4o-mini",
+                                    use_tools:bool=True,
+                                    use_memory:bool=False,
+                                    use_planner:bool=False,
+                                    keep_memory:bool=False,
+                                    stream:bool=True
+                                    ) -> AsyncIterator[Message]:
+        original_query = query
+
+        if use_memory and self.memory and (memorys_str := await self.memory.aget_memorys_str(query = original_query,enhanced_filter=True)):
+            query =  f"### Your Recent Memory:\n```{memorys_str}```\n\n" + query
+
+        messages = self._build_openai_messages(query,use_planner)
+
+        tools = self.tools_schema if self.tools_schema and use_tools else None
+        async for m in self._aiter_openai_agent(messages,model,tools,stream):
+            yield m
+
+        if keep_memory and self.memory:
+            await self.memory.aadd_working_memory(self._build_working_memory(original_query,m.result))
+
+    def _iter_openai_agent(self,messages:List[Dict],model:str,tools:List[Dict]=None,stream:bool=False) -> Iterator[Message]:
+        """
+        Runs the tool calling loop of the agent.
 
+        The model is called repeatedly, executing the requested tools and sending their results back as `tool` messages,
+        until it answers without tool calls. Once `max_tool_iterations` or `tool_token_budget` is used up the model is asked to answer without tools.
+
+        Yields:
+            Message: `talk_chunk` messages while streaming, a `tool_call` message for every tool result, followed by the final `talk` message.
+        """
+        used_tokens = 0
+        for iteration in range(self.max_tool_iterations + 1):
+            exhausted = self._tool_budget_exhausted(iteration,used_tokens)
+            response = self.model_client.chat.completions.create(
+                            model=model,
+                            messages=messages,
+                            tools=tools,
+                            tool_choice="none" if tools and exhausted else None,
+                            temperature=self.temperature,
+                            **self._build_stream_kwargs(stream)
+                        )
+            if stream:
+                accumulator = ChatCompletionStreamAccumulator()
+                for chunk in response:
+                    if delta := accumulator.add(chunk):
+                        yield Message(sender=self.name, action="talk_chunk", result=delta)
+                response = accumulator.to_completion()
+            used_tokens += self._count_used_tokens(response)
+            response_message = response.choices[0].message
+
+            # If there are no tool calls, return the message [Most Common Case]
+            if not response_message.tool_calls or exhausted:
+                yield Message(sender=self.name, action="talk", result=self._build_final_answer(response_message))
+                return
+
+            messages.append(self._build_assistant_tool_calls_message(response_message))
+            tool_results = self._execute_tool_calls(response_message.tool_calls)
+            for tool_call,tool_result in zip(response_message.tool_calls,tool_results):
+                messages.append(self._build_tool_message(tool_call,tool_result))
+                yield Message(sender=self.name, action="tool_call", result=self._build_tool_call_result(tool_call,tool_result))
+            self._logger.log(level="info", message=f"All Tool Calls Completed (round {iteration+1}), Process All Tool Call Results",color="bold_green")
+
+    async def _aiter_openai_agent(self,messages:List[Dict],model:str,tools:List[Dict]=None,stream:bool=False) -> AsyncIterator[Message]:
+        """
+        Async version of `_iter_openai_agent`.
+        """
+        used_tokens = 0
+        for iteration in range(self.max_tool_iterations + 1):
+            exhausted = self._tool_budget_exhausted(iteration,used_tokens)
+            response = await acall(
+                            self.model_client.chat.completions.create,
+                            model=model,
+                            messages=messages,
+                            tools=tools,
+                            tool_choice="none" if tools and exhausted else None,
+                            temperature=self.temperature,
+                            **self._build_stream_kwargs(stream)
+                        )
+            if stream:
+                accumulator = ChatCompletionStreamAccumulator()
+                if is_async_client(self.model_client):
+                    async for chunk in response:
+                        if delta := accumulator.add(chunk):
+                            yield Message(sender=self.name, action="talk_chunk", result=delta)
+                else:
+                    # sync stream, read every chunk in a worker thread
+                    chunks = iter(response)
+                    while (chunk := await asyncio.to_thread(next,chunks,None)) is not None:
+                        if delta := accumulator.add(chunk):
+                            yield Message(sender=self.name, action="talk_chunk", result=delta)
+                response = accumulator.to_completion()
+            used_tokens += self._count_used_tokens(response)
+            response_message = response.choices[0].message
+
+            if not response_message.tool_calls or exhausted:
+                yield Message(sender=self.name, action="talk", result=self._build_final_answer(response_message))
+                return
+
+            messages.append(self._build_assistant_tool_calls_message(response_message))
+            tool_results = await self._aexecute_tool_calls(response_message.tool_calls)
+            for tool_call,tool_result in zip(response_message.tool_calls,tool_results):
+                messages.append(self._build_tool_message(tool_call,tool_result))
+                yield Message(sender=self.name, action="tool_call", result=self._build_tool_call_result(tool_call,tool_result))
+            self._logger.log(level="info", message=f"All Tool Calls Completed (round {iteration+1}), Process All Tool Call Results",color="bold_green")
+
+    def _tool_budget_exhausted(self,iteration:int,used_tokens:int) -> bool:
+        if iteration >= self.max_tool_iterations:
+            self._logger.log(level="info", message=f"Reached max tool iterations ({self.max_tool_iterations}), ask {self.name} to answer",color="bold_green")
+            return True
+        if self.tool_token_budget is not None and used_tokens >= self.tool_token_budget:
+            self._logger.log(level="info", message=f"Used {used_tokens} tokens which exceeds the tool token budget ({self.tool_token_budget}), ask {self.name} to answer",color="bold_green")
+            return True
+        return False
+
+    def _build_final_answer(self,response_message) -> str:
+        """
+        The content of the last response, the tool calls the model may still request once the tool budget is used up (despite `tool_choice="none"`) are ignored.
+        """
+        if response_message.tool_calls:
+            self._logger.log(level="error", message=f"{self.name} requested tool calls after the tool budget was used up, they are ignored",color="red")
+            if not response_message.content:
+                return f"No answer, {self.name} kept calling tools after the tool budget was used up"
+        return response_message.content
+
+    @staticmethod
+    def _build_stream_kwargs(stream:bool) -> Dict:
+        return {"stream": True, "stream_options": {"include_usage": True}} if stream else {}
+
+    @staticmethod
+    def _count_used_tokens(response) -> int:
+        usage = getattr(response,"usage",None)
+        return usage.total_tokens if usage and usage.total_tokens else 0
+
+    @staticmethod
+    def _build_assistant_tool_calls_message(response_message) -> Dict:
+        return {
+            "role": "assistant",
+            "content": response_message.content,
+            "tool_calls": [
+                {
+                    "id": tool_call.id,
+                    "type": "function",
+                    "function": {"name": tool_call.function.name, "arguments": tool_call.function.arguments}
+                }
+                for tool_call in response_message.tool_calls
+            ]
+        }
+
+    @staticmethod
+    def _build_tool_message(tool_call,tool_result) -> Dict:
+        content = tool_result if isinstance(tool_result,str) else json.dumps(tool_result,ensure_ascii=False,default=str)
+        return {"role": "tool", "tool_call_id": tool_call.id, "content": content}
+
+    def _build_openai_messages(self,query:str,use_planner:bool=False) -> List[Dict]:
+        """
+        Builds the system and user messages for the OpenAI model client.
+        """
         instructions =(
             f"## Your Name is :\n {self.name}\n\n"
             f"## Your Role is :\n {self.role}\n\n"
@@ -144,70 +424,147 @@ class Agent(Member):
 
         # self._logger.log(level="info", message=f"instructions:\n{instructions}",color="bold_green")
 
-        original_query = query
-
-        if use_memory and self.memory and (memorys_str := self.memory.get_memorys_str(query = original_query,enhanced_filter=True)):
-            query =  f"### Your Recent Memory:\n```{memorys_str}```\n\n" + query
-
         if use_planner and self.planner and (plan_str := self.planner.get_day_plan_str()):
             query = f"### Your Today's Plan:\n```{plan_str}```\n\n" + query
 
-        messages = system_message + [{"role": "user", "content": query}]
+        return system_message + [{"role": "user", "content": query}]
 
-        tools = self.tools_schema if self.tools_schema and use_tools else None
-        response = self.model_client.chat.completions.create(
-                        model=model,
-                        messages=messages,
-                        tools=tools,
-                        tool_choice=None,
-                        temperature=self.temperature,
-                    )
-        
-        response_message = response.choices[0].message
-
-        # If there are no tool calls, return the message [Most Common Case]
-        if not response_message.tool_calls:
-            if keep_memory and self.memory:
-                self.memory.add_working_memory(json.dumps({
-                "query": original_query,
-                "response": response_message.content
-            }))
-            res = [Message(sender=self.name, action="talk", result=response_message.content)]
-            return res
-        
-        res = []
-
-        for tool_call in response_message.tool_calls:
-            tool = self.tools_map[tool_call.function.name]
-            tool_args = json.loads(tool_call.function.arguments)
-            self._logger.log(level="info", message=f"Tool Call [{tool_call.function.name}] with arguments: {tool_args} by {self.name}",color="bold_green")
-            tool_result = tool(**tool_args)
-            self._logger.log(level="info", message=f"Tool Call [{tool_call.function.name}] Result Received",color="bold_green")
-            tool_call_result = (
-                f"By using the tool '{tool_call.function.name}' with the arguments {tool_args}, "
-                f"the result is '{tool_result}'."
-            )
-            messages.append({"role": "assistant", "content": tool_call_result})
-
-        self._logger.log(level="info", message=f"All Tool Calls Completed, Process All Tool Call Results",color="bold_green")
-        messages.append({"role": "user", "content": "Based on the results from the tools, respond to my previous question."})
-        response = self.model_client.chat.completions.create(
-                model=model,
-                messages=messages,
-                tools=None,
-                tool_choice=None,
-                temperature=0.0,
-            )
-        
-        response_message = response.choices[0].message
-        if keep_memory and self.memory:
-            self.memory.add_working_memory(json.dumps({
-                "query": original_query,
-                "response": response_message.content
-            }))
-        res.append(Message(sender=self.name, action="talk", result=response_message.content))
+    def _execute_tool_calls(self,tool_calls) -> List:
+        """
+        Executes the tool calls concurrently in a thread pool.
 
-        return res
+        At most `max_tool_concurrency` tool calls of the agent run at the same time, also across concurrent turns (e.g. the concurrent steps of a group task).
+        A tool call waits at most `tool_timeout` seconds for a free slot and then at most `tool_timeout` seconds from the moment it starts,
+        a tool call that times out or raises gets an error message as its result. The slot of a tool call that timed out is released
+        even if the tool is still running. The results keep the order of the tool calls.
+        """
+        lock = threading.Lock()
+        started_at = {}
+        started = [threading.Event() for _ in tool_calls]
+        holding, abandoned = set(), set()
+
+        def release(index):
+            with lock:
+                if index in holding:
+                    holding.discard(index)
+                    self._tool_semaphore.release()
+
+        def abandon(index):
+            with lock:
+                abandoned.add(index)
+            release(index)
+
+        def execute(index,tool_name,tool_args):
+            if not self._tool_semaphore.acquire(timeout=self.tool_timeout):
+                return _NO_TOOL_SLOT
+            with lock:
+                if index in abandoned:
+                    self._tool_semaphore.release()
+                    return _NO_TOOL_SLOT
+                holding.add(index)
+                started_at[index] = time.monotonic()
+            started[index].set()
+            try:
+                return self.tools_map[tool_name](**tool_args)
+            finally:
+                release(index)
+
+        executor = ThreadPoolExecutor(max_workers=max(1,len(tool_calls)))
+        submitted_at = time.monotonic()
+        futures = []
+        for index,tool_call in enumerate(tool_calls):
+            try:
+                tool_args = self._parse_tool_arguments(tool_call)
+            except ValueError as error:
+                # malformed arguments, the tool call fails without running
+                future = Future()
+                future.set_exception(error)
+            else:
+                future = executor.submit(execute,index,tool_call.function.name,tool_args)
+            futures.append((tool_call.function.name,future))
+
+        results = []
+        try:
+            for index,(tool_name,future) in enumerate(futures):
+                if self.tool_timeout is not None and not future.done():
+                    # queued tool calls get their full timeout once they start running
+                    started[index].wait(max(0,submitted_at + self.tool_timeout - time.monotonic()))
+                    if started[index].is_set():
+                        wait([future],timeout=max(0,started_at[index] + self.tool_timeout - time.monotonic()))
+                if not future.done() and self.tool_timeout is not None:
+                    abandon(index)
+                    tool_result = self._build_tool_timeout_result(tool_name)
+                elif (error := future.exception()) is not None:
+                    tool_result = self._build_tool_error_result(tool_name,error)
+                elif future.result() is _NO_TOOL_SLOT:
+                    tool_result = self._build_tool_timeout_result(tool_name)
+                else:
+                    tool_result = future.result()
+                    self._logger.log(level="info", message=f"Tool Call [{tool_name}] Result Received",color="bold_green")
+                results.append(tool_result)
+        finally:
+            # do not block on tool calls that timed out
+            executor.shutdown(wait=False,cancel_futures=True)
+        return results
+
+    async def _aexecute_tool_calls(self,tool_calls) -> List:
+        """
+        Async version of `_execute_tool_calls`, coroutine tools are awaited and sync tools run in worker threads.
+        """
+        loop = asyncio.get_running_loop()
+        if loop not in self._tool_asemaphores:
+            self._tool_asemaphores[loop] = asyncio.Semaphore(max(1,self.max_tool_concurrency))
+        semaphore = self._tool_asemaphores[loop]
+
+        async def execute(tool_call):
+            tool_name = tool_call.function.name
+            try:
+                tool_args = self._parse_tool_arguments(tool_call)
+            except ValueError as error:
+                return self._build_tool_error_result(tool_name,error)
+            async with semaphore:
+                try:
+                    tool_result = await asyncio.wait_for(acall(self.tools_map[tool_name],**tool_args),timeout=self.tool_timeout)
+                except asyncio.TimeoutError:
+                    return self._build_tool_timeout_result(tool_name)
+                except Exception as error:
+                    return self._build_tool_error_result(tool_name,error)
+                self._logger.log(level="info", message=f"Tool Call [{tool_name}] Result Received",color="bold_green")
+                return tool_result
+
+        return list(await asyncio.gather(*[execute(tool_call) for tool_call in tool_calls]))
+
+    def _parse_tool_arguments(self,tool_call) -> Dict:
+        """
+        Parses the JSON arguments of a tool call, raises ValueError if they are not a JSON object.
+        """
+        tool_args = json.loads(tool_call.function.arguments or "{}")
+        if not isinstance(tool_args,dict):
+            raise ValueError(f"the arguments must be a JSON object, got {tool_call.function.arguments}")
+        self._logger.log(level="info", message=f"Tool Call [{tool_call.function.name}] with arguments: {tool_args} by {self.name}",color="bold_green")
+        return tool_args
+
+    def _build_tool_timeout_result(self,tool_name:str) -> str:
+        self._logger.log(level="error", message=f"Tool Call [{tool_name}] timed out after {self.tool_timeout} seconds",color="red")
+        return f"No result, the tool did not respond within {self.tool_timeout} seconds"
+
+    def _build_tool_error_result(self,tool_name:str,error:Exception) -> str:
+        self._logger.log(level="error", message=f"Tool Call [{tool_name}] raised {type(error).__name__}: {error}",color="red")
+        return f"No result, the tool raised {type(error).__name__}: {error}"
+
+    @staticmethod
+    def _build_tool_call_result(tool_call,tool_result) -> str:
+        return (
+            f"By using the tool '{tool_call.function.name}' with the arguments {tool_call.function.arguments}, "
+            f"the result is '{tool_result}'."
+        )
+
+    @staticmethod
+    def _build_working_memory(query:str,response:str) -> str:
+        return json.dumps({
+            "query": query,
+            "response": response
+        })
 
     def _call_dify_http_agent(self,token:str,query:str) -> List[Message]:
         """
@@ -240,6 +597,32 @@ class Agent(Member):
         res = [Message(sender=self.name, action="talk", result=response.json()['answer'])]
 
         return res  
+
+    async def _acall_dify_http_agent(self,token:str,query:str) -> List[Message]:
+        """
+        Async version of `_call_dify_http_agent`.
+        """
+        url = 'https://api.dify.ai/v1/chat-messages'
+        headers = {
+            'Authorization': 'Bearer {}'.format(token),
+            'Content-Type': 'application/json'
+        }
+
+        data = {
+            "inputs": {},
+            "query": query,
+            "response_mode": "blocking",
+            "conversation_id": "",
+            "user": self.name,
+            "files": []
+        }
+
+        async with httpx.AsyncClient(timeout=None) as client:
+            response = await client.post(url, headers=headers, json=data)
+
+        res = [Message(sender=self.name, action="talk", result=response.json()['answer'])]
+
+        return res
     
     def _call_websocket_agent(self, query: str) -> List[Message]:
         """
@@ -267,6 +650,24 @@ class Agent(Member):
             self._logger.log(level="error", message=f"Error during websocket communication: {e}", color="bold_red")
             return []
 
+    async def _acall_websocket_agent(self, query: str) -> List[Message]:
+        """
+        Async version of `_call_websocket_agent`. 
+        A new connection is opened per call so that concurrent calls never interleave their replies.
+        """
+        message = {"content": query}
+
+        try:
+            async with websockets.connect(self.websocket_url) as ws:
+                await ws.send(json.dumps(message))
+                response = await ws.recv()
+            res = [Message(sender=self.name, action="talk", result=response)]
+            return res
+
+        except Exception as e:
+            self._logger.log(level="error", message=f"Error during websocket communication: {e}", color="bold_red")
+            return []
+
     def _connect_to_websocket(self):
         """
         Connects to the websocket server.
@@ -7,41 +7,71 @@
 """
 
 import graphviz
-from openai import OpenAI
+from openai import OpenAI,AsyncOpenAI
 import random
 import uuid
 import itertools
 from pydantic import BaseModel
 from tenacity import retry, wait_random_exponential, stop_after_attempt
-from typing import Dict, Optional, Literal, Tuple,List,Union
+from typing import Dict, Optional, Literal, Tuple,List,Union,Iterator,AsyncIterator,Callable
 import os
 import datetime
 import json
+import asyncio
+from concurrent.futures import ThreadPoolExecutor, Future, wait, FIRST_COMPLETED
 from dataclasses import asdict
 
 from src.utilities.logger import Logger
-from src.protocol import Member, Env, Message, GroupMessageProtocol
-from src.group_planner import GroupPlanner
+from src.utilities.utils import acall
+from src.utilities.prompt_builder import IncrementalPromptBuilder
+from src.utilities.tokens import count_tokens, resolve_token_budget
+from src.protocol import Member, Env, Message, GroupMessageProtocol, RelationshipGraph
+from src.group_planner import GroupPlanner, InTransitRevisionPolicy
+from src.group_summarizer import GroupSummarizer
+from src.speaker_selector import SpeakerSelector
 from src.agent import Agent
+from src.memory import Memory
 
 class Group:
+
+    _end_of_talk_prompt = (
+        "\n\nEnd the conversation gracefully in this group when the goal is met, the topic is finished, or dialogue becomes repetitive. Summarize the discussion, suggest next steps, and say goodbye. Append '[=END=]' (e.g., 'Goodbye, Alice. [=END=]')."
+    )
+
+    _conclude_prompt = "Make an effort to conclude the conversation gracefully within the next two exchanges, avoiding any further questions or prompts."
+
     def __init__(
         self, 
         env: Env,
-        model_client: OpenAI,
+        model_client: Union[OpenAI,AsyncOpenAI],
         group_id: Optional[str] = None,
         verbose: bool = False,
-        workspace: Optional[str] = None
+        workspace: Optional[str] = None,
+        context_token_budget: Union[int,Dict[str,int],None] = None,
+        max_message_tokens: Optional[int] = None,
+        token_counter: Callable[[str],int] = count_tokens,
+        summarize_every: Optional[int] = None,
+        summary_keep_recent: int = 20,
+        fast_speaker_selection: bool = False
     ):
         """
         Initializes the Group class.
 
         Args:
             env (Env): The environment settings of the group.
-            model_client (OpenAI): The model client for the group.
+            model_client (Union[OpenAI,AsyncOpenAI]): The model client for the group. The async methods (`achat`, `atask`, `adialogue`) work with both.
             group_id (Optional[str], optional): The group ID. Defaults to None meaning a random UUID will be generated.
             verbose (bool, optional): The verbosity of the group. Defaults to False.
             workspace (Optional[str], optional): The workspace of the group. Defaults to None.
+            context_token_budget (Union[int,Dict[str,int],None], optional): The maximum number of tokens of the group messages put in a prompt, the most recent messages are kept.
+                Either one budget or a budget per model, e.g. {"gpt-4o-mini": 8000, "default": 4000}. Defaults to None meaning only `message_cut_off` applies.
+            max_message_tokens (Optional[int], optional): Truncates every message result put in a prompt to this number of tokens. Defaults to None.
+            token_counter (Callable[[str],int], optional): Counts the tokens of a text, e.g. with tiktoken. Defaults to the offline approximate `count_tokens`.
+            summarize_every (Optional[int], optional): Folds the old group messages into a running summary every time this number of messages is waiting to be folded,
+                the prompts then carry the summary and only the messages after it. Defaults to None meaning no summary.
+            summary_keep_recent (int, optional): The number of most recent group messages never folded into the summary. Defaults to 20.
+            fast_speaker_selection (bool, optional): In auto mode, select the next speaker from the mentions in the last message or the learned transitions
+                between speakers when conclusive, and call the model only otherwise (see `SpeakerSelector`). Defaults to False.
             manager (Union[Agent,bool], optional): The manager of the group. Defaults to None.
         """
         self._logger = Logger(verbose=verbose)
@@ -51,12 +81,18 @@ class Group:
         self.workspace = workspace
         self._create_group_workspace()
         self.env: Env = env
-        self.model_client: OpenAI = model_client # currently only supports OpenAI synthetic API
+        self.model_client: Union[OpenAI,AsyncOpenAI] = model_client
         self.planner: GroupPlanner = None
+        self.speaker_selector: Optional[SpeakerSelector] = SpeakerSelector(verbose=verbose) if fast_speaker_selection else None
+        self.summarizer: Optional[GroupSummarizer] = GroupSummarizer(model_client,fold_every=summarize_every,keep_recent=summary_keep_recent,language=env.language,verbose=verbose) if summarize_every else None
         self.current_agent: Optional[str] = self.env.members[0].name # default current agent is the first agent in the members list
         self.members_map: Dict[str, Member] = {m.name: m for m in self.env.members}
         self.observed_speakers:Dict[str,set[str]] = {m.name:set() for m in self.env.members}
         self.member_iterator = itertools.cycle(self.env.members)
+        self.context_token_budget = context_token_budget
+        self._topology_version = 0 # bumped by _set_env_public when the members or relationships change
+        self._public_members: Dict[str,Tuple[Member,Member]] = {}
+        self._prompt_builder = IncrementalPromptBuilder(count_tokens=token_counter,max_message_tokens=max_message_tokens)
         self._rectify_relationships()
         self._set_env_public()
         self.group_messages: GroupMessageProtocol = GroupMessageProtocol(group_id=self.group_id,env=self.env_public)
@@ -94,7 +130,6 @@ class Group:
         self.members_map[member.name] = member
         self.observed_speakers[member.name] = set()
         self.member_iterator = itertools.cycle(self.env.members)
-        self._rectify_relationships()
         self._add_relationship(member,relation)
         self._set_env_public()
         self.group_messages.env = self.env_public
@@ -112,13 +147,16 @@ class Group:
         if member_name not in self.members_map:
             self._logger.log("warning",f"Member with name {member_name} does not exist",color="red")
             return
-        observed_speakers = self.observed_speakers.pop(member_name)
         takeaway = self.summary_group_messages(member_name,model="gpt-4o-mini")
         self.members_map[member_name].add_memory(takeaway)    
+        observed_speakers = self._remove_member(member_name,with_leave_message)
+        return takeaway,observed_speakers
+
+    def _remove_member(self, member_name:str,with_leave_message:bool=True) -> set:
+        observed_speakers = self.observed_speakers.pop(member_name)
         self.env.members = [m for m in self.env.members if m.name != member_name]
         self.members_map.pop(member_name)
         self.member_iterator = itertools.cycle(self.env.members)
-        self._rectify_relationships()
         self._remove_relationships(member_name)
         self._set_env_public()
         self.group_messages.env = self.env_public
@@ -129,15 +167,67 @@ class Group:
             self.current_agent = random.choice([m.name for m in self.env.members]) if self.env.members else None
             self._logger.log("info",f"current agent {member_name} is deleted, randomly select {self.current_agent} as the new current agent")
         self._logger.log("info",f"Successfully delete member {member_name}")
-
-        return takeaway,observed_speakers
+        return observed_speakers
     
     def summary_group_messages(self,member_name:str,model:str="gpt-4o-mini")->str:
+        messages = self._build_summary_messages(member_name)
+
+        response = self.model_client.chat.completions.create(
+                    model=model,
+                    messages=messages,
+                    tools=None,
+                    tool_choice=None,
+                )
+            
+        response_message = response.choices[0].message
+
+        return response_message.content
+
+    async def asummary_group_messages(self,member_name:str,model:str="gpt-4o-mini")->str:
+        """
+        Async version of `summary_group_messages`.
+        """
+        messages = self._build_summary_messages(member_name)
+        response = await acall(self.model_client.chat.completions.create,model=model,messages=messages,tools=None,tool_choice=None)
+        return response.choices[0].message.content
+
+    def summary_group_messages_multi_view(self,member_names:List[str],model:str="gpt-4o-mini")->Dict[str,str]:
+        """
+        Summarizes the group messages from the viewpoint of every member in a single structured call.
+
+        Args:
+            member_names (List[str]): The members to summarize for.
+            model (str): The model to use. Defaults to "gpt-4o-mini".
+
+        Returns:
+            Dict[str,str]: The summary of every member, the members missing from the response are summarized one by one.
+        """
+        messages,response_format = self._build_multi_view_summary_messages(member_names)
+        completion = self.model_client.beta.chat.completions.parse(model=model,messages=messages,response_format=response_format)
+        takeaways = self._collect_multi_view_takeaways(member_names,completion.choices[0].message.parsed)
+        for name in member_names:
+            if name not in takeaways:
+                takeaways[name] = self.summary_group_messages(name,model=model)
+        return takeaways
+
+    async def asummary_group_messages_multi_view(self,member_names:List[str],model:str="gpt-4o-mini")->Dict[str,str]:
+        """
+        Async version of `summary_group_messages_multi_view`.
+        """
+        messages,response_format = self._build_multi_view_summary_messages(member_names)
+        completion = await acall(self.model_client.beta.chat.completions.parse,model=model,messages=messages,response_format=response_format)
+        takeaways = self._collect_multi_view_takeaways(member_names,completion.choices[0].message.parsed)
+        missing = [name for name in member_names if name not in takeaways]
+        for name,takeaway in zip(missing,await asyncio.gather(*[self.asummary_group_messages(name,model=model) for name in missing])):
+            takeaways[name] = takeaway
+        return takeaways
+
+    def _build_summary_messages(self,member_name:str) -> List[Dict]:
         messages = [{"role":"system","content":"You are good at summarizing.notice what each member has said and summarize the group messages."}]
 
         prompt = (
             f"### Group Messages\n"
-            f"{json.dumps(asdict(self.group_messages), indent=4)}\n\n"
+            f"{json.dumps(self._build_group_messages_record(), indent=4)}\n\n"
             f"### Task\n"
             f"provide a summary of the events in the group from {member_name}'s viewpoint, using {member_name} as the first-person narrator."
             f"just return the summary in simple sentences. Always start with 'On YYYY-MM-DD at HH:MM' if the current time is mentioned in Group Messages."
@@ -147,30 +237,122 @@ class Group:
             prompt += f"\n\n### Response in Language: {self.env.language}\n"
 
         messages.append({"role":"user","content":prompt})
+        return messages
 
-        response = self.model_client.chat.completions.create(
-                    model=model,
-                    messages=messages,
-                    tools=None,
-                    tool_choice=None,
-                )
-            
-        response_message = response.choices[0].message
+    def _build_multi_view_summary_messages(self,member_names:List[str]):
+        class MemberTakeaway(BaseModel):
+            member_name: str
+            takeaway: str
 
-        return response_message.content
+        class GroupTakeaways(BaseModel):
+            takeaways: List[MemberTakeaway]
+
+        messages = [{"role":"system","content":"You are good at summarizing.notice what each member has said and summarize the group messages."}]
+
+        prompt = (
+            f"### Group Messages\n"
+            f"{json.dumps(self._build_group_messages_record(), indent=4)}\n\n"
+            f"### Members\n"
+            f"{', '.join(member_names)}\n\n"
+            f"### Task\n"
+            f"for each member above, provide a summary of the events in the group from the member's viewpoint, using the member as the first-person narrator."
+            f"just write the summaries in simple sentences. Always start with 'On YYYY-MM-DD at HH:MM' if the current time is mentioned in Group Messages."
+        )
+
+        if self.env.language is not None:
+            prompt += f"\n\n### Response in Language: {self.env.language}\n"
+
+        messages.append({"role":"user","content":prompt})
+        return messages,GroupTakeaways
+
+    @staticmethod
+    def _collect_multi_view_takeaways(member_names:List[str],parsed) -> Dict[str,str]:
+        names = set(member_names)
+        return {t.member_name:t.takeaway for t in parsed.takeaways if t.member_name in names}
+
+    def _build_group_messages_record(self) -> Dict:
+        """
+        The group messages as a dict, the messages folded into the running summary are replaced by the summary.
+        """
+        record = {"group_id":self.group_messages.group_id,"env":self.group_messages.env.to_dict()}
+        if self.group_messages.summary is not None:
+            record["summary"] = self.group_messages.summary
+        record["context"] = [asdict(m) for m in self.group_messages.context[self.group_messages.summarized_until:]]
+        return record
+
+    def fold_group_messages(self,model:str="gpt-4o-mini"):
+        """
+        Folds the old group messages into the running summary if enough of them are waiting (see `summarize_every`).
+        Called before every agent turn.
+        """
+        if self.summarizer is not None and self.summarizer.should_fold(self.group_messages):
+            self.summarizer.fold(self.group_messages,model=model)
+
+    async def afold_group_messages(self,model:str="gpt-4o-mini"):
+        """
+        Async version of `fold_group_messages`.
+        """
+        if self.summarizer is not None and self.summarizer.should_fold(self.group_messages):
+            await self.summarizer.afold(self.group_messages,model=model)
+
+    def dismiss_group(self,model:str="gpt-4o-mini",max_concurrency:int=4,multi_view:bool=False):
+        """
+        Dismiss the group: every member gets the summary of the group messages from its viewpoint as a memory, then leaves.
 
-    def dismiss_group(self):
+        Args:
+            model (str): The model used to summarize. Defaults to "gpt-4o-mini".
+            max_concurrency (int): The maximum number of members summarized and memorizing at the same time. Defaults to 4, 1 means one after another.
+            multi_view (bool): If True, summarize for all the members in a single structured call instead of one call per member. Defaults to False.
+
+        Returns:
+            Dict[str,Dict]: The takeaway and the observed speakers of every member.
+        """
+        self._save_group_messages()
+        names = [m.name for m in self.env.members]
+        multi_view_takeaways = self.summary_group_messages_multi_view(names,model=model) if multi_view and names else {}
+
+        def takeaway_of(name):
+            takeaway = multi_view_takeaways[name] if multi_view else self.summary_group_messages(name,model=model)
+            self.members_map[name].add_memory(takeaway)
+            return takeaway
+
+        # the members are summarized on the same group messages, then removed
+        with ThreadPoolExecutor(max_workers=max(1,max_concurrency)) as executor:
+            takeaways_list = list(executor.map(takeaway_of,names))
+        return self._remove_dismissed_members(names,takeaways_list)
+
+    async def adismiss_group(self,model:str="gpt-4o-mini",max_concurrency:int=4,multi_view:bool=False):
+        """
+        Async version of `dismiss_group`.
+        """
+        self._save_group_messages()
+        names = [m.name for m in self.env.members]
+        multi_view_takeaways = await self.asummary_group_messages_multi_view(names,model=model) if multi_view and names else {}
+        semaphore = asyncio.Semaphore(max(1,max_concurrency))
+
+        async def takeaway_of(name):
+            async with semaphore:
+                takeaway = multi_view_takeaways[name] if multi_view else await self.asummary_group_messages(name,model=model)
+                await self.members_map[name].aadd_memory(takeaway)
+                return takeaway
+
+        takeaways_list = await asyncio.gather(*[takeaway_of(name) for name in names])
+        return self._remove_dismissed_members(names,takeaways_list)
+
+    def _save_group_messages(self):
         if self.workspace:
             group_workspace = os.path.join(self.workspace, self.group_id)
             group_messages_file = os.path.join(group_workspace, "group_messages.json")
             with open(group_messages_file, "w") as f:
-                f.write(json.dumps(asdict(self.group_messages), indent=4))
+                f.write(json.dumps(self.group_messages.to_dict(), indent=4))
             self._logger.log("info",f"Group Information saved in {group_workspace}")
+
+    def _remove_dismissed_members(self,names:List[str],takeaways_list:List[str]) -> Dict[str,Dict]:
         takeaways = {}
-        for member in self.env.members:
-            takeaway,observed_speakers = self.delete_member(member.name,with_leave_message=False)
-            self._logger.log("info",f"\nTakeaway for {member.name}:\n{takeaway} \n\nSpeakers observed by {member.name}:\n{observed_speakers}")
-            takeaways[member.name] = {"takeaway":takeaway,"speakers":observed_speakers}
+        for name,takeaway in zip(names,takeaways_list):
+            observed_speakers = self._remove_member(name,with_leave_message=False)
+            self._logger.log("info",f"\nTakeaway for {name}:\n{takeaway} \n\nSpeakers observed by {name}:\n{observed_speakers}")
+            takeaways[name] = {"takeaway":takeaway,"speakers":observed_speakers}
         return takeaways
 
     def invite_member(self, role_description, model="gpt-4o-mini"):
@@ -243,8 +425,9 @@ class Group:
             include_current:bool = True,
             model:str="gpt-4o-mini",
             message_cut_off:int=5,
-            agent:str = None # can mauanlly set the agent to call
-    ) -> List[Message]:
+            agent:str = None, # can mauanlly set the agent to call
+            stream:bool = False
+    ) -> Union[List[Message],Iterator[Message]]:
         """
         Call the agent to respond to the group messages.
 
@@ -254,13 +437,73 @@ class Group:
             model (str): The model to use for the handoff. Defaults to "gpt-4o-mini".
             message_cut_off (int): The number of previous messages to consider. Defaults to 3.
             agent (str): Specify the agent to call. Defaults to None meaning the agent will be selected based on the next_speaker_select_mode.
+            stream (bool): If True, return an iterator of the partial messages (see `Agent.do`), the complete response is added to the group messages once the iterator is exhausted. Defaults to False.
         """
+        if stream:
+            return self._stream_call_agent(next_speaker_select_mode,include_current,model,message_cut_off,agent)
         if agent:
             self.set_current_agent(agent)
         else:
             self.handoff(next_speaker_select_mode=next_speaker_select_mode,model=model,include_current=include_current)
-        message_send = self._build_send_message(cut_off=message_cut_off,send_to=self.current_agent)
+        self.fold_group_messages(model)
+        message_send = self._build_send_message(cut_off=message_cut_off,send_to=self.current_agent,model=model)
         response = self.members_map[self.current_agent].do(message = message_send,model = model,keep_memory=False)
+        self._record_agent_response(response)
+        return response
+
+    async def acall_agent(
+            self,
+            next_speaker_select_mode:Literal["order","auto","random"]="auto",
+            include_current:bool = True,
+            model:str="gpt-4o-mini",
+            message_cut_off:int=5,
+            agent:str = None,
+            stream:bool = False
+    ) -> Union[List[Message],AsyncIterator[Message]]:
+        """
+        Async version of `call_agent`.
+        """
+        if stream:
+            return self._astream_call_agent(next_speaker_select_mode,include_current,model,message_cut_off,agent)
+        if agent:
+            self.set_current_agent(agent)
+        else:
+            await self.ahandoff(next_speaker_select_mode=next_speaker_select_mode,model=model,include_current=include_current)
+        await self.afold_group_messages(model)
+        message_send = self._build_send_message(cut_off=message_cut_off,send_to=self.current_agent,model=model)
+        response = await self.members_map[self.current_agent].ado(message = message_send,model = model,keep_memory=False)
+        self._record_agent_response(response)
+        return response
+
+    def _stream_call_agent(self,next_speaker_select_mode,include_current,model,message_cut_off,agent) -> Iterator[Message]:
+        if agent:
+            self.set_current_agent(agent)
+        else:
+            self.handoff(next_speaker_select_mode=next_speaker_select_mode,model=model,include_current=include_current)
+        self.fold_group_messages(model)
+        message_send = self._build_send_message(cut_off=message_cut_off,send_to=self.current_agent,model=model)
+        response = []
+        for m in self.members_map[self.current_agent].do(message = message_send,model = model,keep_memory=False,stream=True):
+            if m.action == "talk":
+                response.append(m)
+            yield m
+        self._record_agent_response(response)
+
+    async def _astream_call_agent(self,next_speaker_select_mode,include_current,model,message_cut_off,agent) -> AsyncIterator[Message]:
+        if agent:
+            self.set_current_agent(agent)
+        else:
+            await self.ahandoff(next_speaker_select_mode=next_speaker_select_mode,model=model,include_current=include_current)
+        await self.afold_group_messages(model)
+        message_send = self._build_send_message(cut_off=message_cut_off,send_to=self.current_agent,model=model)
+        response = []
+        async for m in await self.members_map[self.current_agent].ado(message = message_send,model = model,keep_memory=False,stream=True):
+            if m.action == "talk":
+                response.append(m)
+            yield m
+        self._record_agent_response(response)
+
+    def _record_agent_response(self, response:List[Message]):
         self.update_group_messages(response)
         for r in response:
             self._logger.log("info",f"Agent {self.current_agent} response:\n\n{r.result}",color="bold_purple")
@@ -268,7 +511,6 @@ class Group:
         for member in self.env.members:
             if member.name != self.current_agent:
                 self.observed_speakers[member.name].add(self.current_agent)
-        return response
 
     
     def dialogue(self,model:str="gpt-4o-mini", message_cut_off:int=3,max_turns:int=20):
@@ -276,30 +518,45 @@ class Group:
         members of the group start to talk based on current group env and messages.
         """
 
-        end_of_talk_prompt = (
-            "\n\nEnd the conversation gracefully in this group when the goal is met, the topic is finished, or dialogue becomes repetitive. Summarize the discussion, suggest next steps, and say goodbye. Append '[=END=]' (e.g., 'Goodbye, Alice. [=END=]')."
-        )
-
-        self.group_messages.env.description += end_of_talk_prompt
+        self.group_messages.env.description += self._end_of_talk_prompt
         
         for _ in range(max_turns):
             ms = self.call_agent(next_speaker_select_mode = "auto",include_current=False,model=model,message_cut_off=message_cut_off)
             if "[=END=]" in ms[-1].result:
                 break
         if "[=END=]" not in ms[-1].result:
-            self.user_input("Make an effort to conclude the conversation gracefully within the next two exchanges, avoiding any further questions or prompts.")
+            self.user_input(self._conclude_prompt)
             self.call_agent(next_speaker_select_mode = "auto",include_current=False,model=model,message_cut_off=message_cut_off)
             self.call_agent(next_speaker_select_mode = "auto",include_current=False,model=model,message_cut_off=message_cut_off)
 
         self.group_messages.env.description = self.env.description
 
+    async def adialogue(self,model:str="gpt-4o-mini", message_cut_off:int=3,max_turns:int=20):
+        """
+        Async version of `dialogue`.
+        """
+
+        self.group_messages.env.description += self._end_of_talk_prompt
+        
+        for _ in range(max_turns):
+            ms = await self.acall_agent(next_speaker_select_mode = "auto",include_current=False,model=model,message_cut_off=message_cut_off)
+            if "[=END=]" in ms[-1].result:
+                break
+        if "[=END=]" not in ms[-1].result:
+            self.user_input(self._conclude_prompt)
+            await self.acall_agent(next_speaker_select_mode = "auto",include_current=False,model=model,message_cut_off=message_cut_off)
+            await self.acall_agent(next_speaker_select_mode = "auto",include_current=False,model=model,message_cut_off=message_cut_off)
+
+        self.group_messages.env.description = self.env.description
+
     def chat(
             self, 
             message:str,
             model:str="gpt-4o-mini",
             message_cut_off:int=3,
-            agent:str = None # can mauanlly set the agent to call
-        )-> List[Message]:
+            agent:str = None, # can mauanlly set the agent to call
+            stream:bool = False
+        )-> Union[List[Message],Iterator[Message]]:
         """
         Chat with the agents in the group.
 
@@ -308,9 +565,25 @@ class Group:
             model (str): The model to use for the handoff. Defaults to "gpt-4o-mini".
             message_cut_off (int): The number of previous messages to consider. Defaults to 3.
             agent (str): Specify the agent to call. Defaults to None meaning the agent will be selected based on the next_speaker_select_mode.
+            stream (bool): If True, return an iterator of partial messages, see `call_agent`. Defaults to False.
+        """
+        self.user_input(message)
+        response = self.call_agent(next_speaker_select_mode = "auto",include_current=True,model=model,message_cut_off=message_cut_off,agent=agent,stream=stream)
+        return response
+
+    async def achat(
+            self, 
+            message:str,
+            model:str="gpt-4o-mini",
+            message_cut_off:int=3,
+            agent:str = None,
+            stream:bool = False
+        )-> Union[List[Message],AsyncIterator[Message]]:
+        """
+        Async version of `chat`.
         """
         self.user_input(message)
-        response = self.call_agent(next_speaker_select_mode = "auto",include_current=True,model=model,message_cut_off=message_cut_off,agent=agent)
+        response = await self.acall_agent(next_speaker_select_mode = "auto",include_current=True,model=model,message_cut_off=message_cut_off,agent=agent,stream=stream)
         return response
 
     def task(
@@ -320,7 +593,9 @@ class Group:
             model:str="gpt-4o-mini",
             model_for_planning:str=None, # can manually set the model for planning for example gpt-4o
             with_plan_revise:bool=True, # only for auto strategy
-            with_in_transit_revise:bool=True # only for auto strategy
+            with_in_transit_revise:Union[bool,InTransitRevisionPolicy]=True, # only for auto strategy
+            max_concurrency:int=4, # only for auto strategy
+            speculative_planning:bool=False # only for auto strategy
         ) -> List[Message]:
         """
         Execute a task with the given strategy.
@@ -330,6 +605,11 @@ class Group:
             strategy (Literal["sequential","hierarchical","auto"], optional): The strategy to use for the task. Defaults to "auto".
             model (str, optional): The model to use for the task. Defaults to "gpt-4o-mini".
             model_for_planning (str, optional): The model to use for the planning. Defaults to None.
+            with_in_transit_revise (Union[bool,InTransitRevisionPolicy], optional): Look for extra tasks after the steps. True revises every step before the next ones,
+                an InTransitRevisionPolicy only revises the steps it flags, alongside the next steps if `background`. Defaults to True.
+            max_concurrency (int, optional): The maximum number of independent plan steps executed at the same time. Defaults to 4, 1 means run the steps one after another.
+            speculative_planning (bool, optional): Start the steps of the initial plan that depend on no other step while the plan is revised,
+                the responses of the steps the revised plan keeps unchanged (same agent and task, still independent) are used, the others are dropped. Defaults to False.
 
         Returns:
             List[Message]: The response
@@ -345,9 +625,31 @@ class Group:
         elif strategy == "hierarchical":
             return self._task_hierarchical(task,model)
         elif strategy == "auto":
-            return self._task_auto(task,model,model_for_planning,with_plan_revise,with_in_transit_revise)
+            return self._task_auto(task,model,model_for_planning,with_plan_revise,with_in_transit_revise,max_concurrency,speculative_planning)
         else:
             raise ValueError("strategy should be one of 'sequential' or 'hierarchical' or 'auto'")
+
+    async def atask(
+            self,
+            task:str,
+            strategy:Literal["sequential","auto"] = "auto",
+            model:str="gpt-4o-mini",
+            model_for_planning:str=None,
+            with_plan_revise:bool=True,
+            with_in_transit_revise:Union[bool,InTransitRevisionPolicy]=True,
+            max_concurrency:int=4,
+            speculative_planning:bool=False
+        ) -> List[Message]:
+        """
+        Async version of `task`. Only the sequential and auto strategies are supported.
+        """
+        self.reset_group_messages()
+        if strategy == "sequential":
+            return await self._atask_sequential(task,model)
+        elif strategy == "auto":
+            return await self._atask_auto(task,model,model_for_planning,with_plan_revise,with_in_transit_revise,max_concurrency,speculative_planning)
+        else:
+            raise ValueError("strategy should be one of 'sequential' or 'auto'")
         
 
     @retry(wait=wait_random_exponential(multiplier=1, max=40), stop=stop_after_attempt(3))
@@ -370,6 +672,10 @@ class Group:
         if self.fully_connected or next_speaker_select_mode in ["order","random"]:
             handoff_max_turns = 1
 
+        if next_speaker_select_mode == "auto" and self._fast_handoff(include_current):
+            return self.current_agent
+
+        start_agent = self.current_agent
         visited_agent = set([self.current_agent])
         next_agent = self.handoff_one_turn(next_speaker_select_mode, model, include_current)
 
@@ -382,8 +688,64 @@ class Group:
             next_agent = self.handoff_one_turn(next_speaker_select_mode,model,True)
             handoff_max_turns -= 1
 
+        self._record_handoff(next_speaker_select_mode,start_agent)
+        return self.current_agent
+
+    @retry(wait=wait_random_exponential(multiplier=1, max=40), stop=stop_after_attempt(3))
+    async def ahandoff(
+            self,
+            handoff_max_turns:int=3,
+            next_speaker_select_mode:Literal["order","auto","random"]="auto",
+            model:str="gpt-4o-mini",
+            include_current:bool = True
+    )->str:
+        """
+        Async version of `handoff`.
+        """
+        if self.fully_connected or next_speaker_select_mode in ["order","random"]:
+            handoff_max_turns = 1
+
+        if next_speaker_select_mode == "auto" and self._fast_handoff(include_current):
+            return self.current_agent
+
+        start_agent = self.current_agent
+        visited_agent = set([self.current_agent])
+        next_agent = await self.ahandoff_one_turn(next_speaker_select_mode, model, include_current)
+
+        while next_agent != self.current_agent and handoff_max_turns > 0:
+            if next_agent in visited_agent:
+                break 
+            self._logger.log("info",f"handoff from {self.current_agent} to {next_agent} by using {next_speaker_select_mode} mode")
+            self.current_agent = next_agent
+            visited_agent.add(next_agent)
+            next_agent = await self.ahandoff_one_turn(next_speaker_select_mode,model,True)
+            handoff_max_turns -= 1
+
+        self._record_handoff(next_speaker_select_mode,start_agent)
         return self.current_agent
 
+    def _fast_handoff(self, include_current:bool) -> bool:
+        """
+        Hands off to the speaker selected by the speaker selector, if any, without calling the model.
+        """
+        # without related agents the model is not called anyway, it is no saving of the selector
+        if self.speaker_selector is None or not self.env.relationships[self.current_agent]:
+            return False
+        candidates = ([self.current_agent] if include_current else []) + list(self.env.relationships[self.current_agent])
+        next_agent = self.speaker_selector.select(candidates, self.group_messages.context)
+        if next_agent is None:
+            return False
+        if next_agent != self.current_agent:
+            self._logger.log("info",f"handoff from {self.current_agent} to {next_agent} by using fast selection")
+            self.current_agent = next_agent
+        return True
+
+    def _record_handoff(self, next_speaker_select_mode:str, start_agent:str):
+        # the model is only called when the agent has related agents
+        if self.speaker_selector is not None and next_speaker_select_mode == "auto" and self.env.relationships[start_agent]:
+            last_sender = self.group_messages.context[-1].sender if self.group_messages.context else None
+            self.speaker_selector.record(last_sender, self.current_agent)
+
     def handoff_one_turn(
             self,
             next_speaker_select_mode: Literal["order", "auto", "random"] = "auto",
@@ -401,6 +763,36 @@ class Group:
         else:
             raise ValueError("next_speaker_select_mode should be one of 'order', 'auto', 'random'")
 
+    async def ahandoff_one_turn(
+            self,
+            next_speaker_select_mode: Literal["order", "auto", "random"] = "auto",
+            model: str = "gpt-4o-mini",
+            include_current: bool = True
+    ) -> str:
+        if next_speaker_select_mode == "auto":
+            if not self.env.relationships[self.current_agent]:
+                return self.current_agent
+            return await self._aselect_next_agent_auto(model, include_current)
+        return self.handoff_one_turn(next_speaker_select_mode, model, include_current)
+
+    def retrieve_members_memories(self, query:str, max_results:int=3, members:List[str]=None, local_filter:bool=True) -> Dict[str,List[Dict]]:
+        """
+        Retrieves the long term memories of the members (agents with memory) relevant to the same query, e.g. the group context,
+        in one batch that embeds the query once, see `Memory.retrieve_long_term_memory_batch`.
+
+        Args:
+            query (str): The query to retrieve the memories for.
+            max_results (int, optional): The maximum number of memories per member. Defaults to 3.
+            members (List[str], optional): The names of the members. Defaults to None meaning all members.
+            local_filter (bool, optional): Select the memories with the local filter of each memory. Defaults to True.
+
+        Returns:
+            Dict[str,List[Dict]]: The memories retrieved for each member with memory.
+        """
+        names = [name for name in (members or self.members_map) if getattr(self.members_map[name], "memory", None)]
+        results = Memory.retrieve_long_term_memory_batch([self.members_map[name].memory for name in names], query, max_results, local_filter)
+        return dict(zip(names, results))
+
     def update_group_messages(self, message:Union[Message,List[Message]]):
         if isinstance(message,Message):
             self.group_messages.context.append(message)
@@ -414,6 +806,8 @@ class Group:
         Reset the group messages.
         """
         self.group_messages.context = []
+        self.group_messages.summary = None
+        self.group_messages.summarized_until = 0
 
 
     def draw_relations(self):
@@ -433,23 +827,21 @@ class Group:
     
     def _rectify_relationships(self):
         """
-        Rectify the relationships between the agents.
+        Rectify the relationships between the agents into a RelationshipGraph.
         """
-        if self.env.relationships is None or self.fully_connected:
+        if isinstance(self.env.relationships, RelationshipGraph):
+            for m in self.env.members:
+                self.env.relationships.add_node(m.name)
+        elif self.env.relationships is None:
             self._logger.log("info","All agents are fully connected")
-            self.fully_connected = True
-            self.env.relationships = {m.name: [n.name for n in self.env.members if n.name != m.name] for m in self.env.members}
+            self.env.relationships = RelationshipGraph([m.name for m in self.env.members])
         elif isinstance(self.env.relationships, list):
-            self._logger.log("info","Self-defined relationships,covnert relationships from list to dictionary")
-            relationships = {m.name: [] for m in self.env.members}
-            for m1, m2 in self.env.relationships:
-                relationships[m1].append(m2)
-                relationships[m2].append(m1)
+            self._logger.log("info","Self-defined relationships,covnert relationships from list to graph")
+            self.env.relationships = RelationshipGraph([m.name for m in self.env.members],self.env.relationships)
         else:
             self._logger.log("info","Self-defined relationships")
-            for m in self.env.members:
-                if m.name not in self.env.relationships:
-                    self.env.relationships[m.name] = []
+            self.env.relationships = RelationshipGraph([m.name for m in self.env.members],self.env.relationships)
+        self.fully_connected = self.env.relationships.fully_connected
 
     def _add_relationship(self,member:Member,relation:Optional[Tuple[str,str]] = None):
         """
@@ -459,13 +851,14 @@ class Group:
             member (Member): The member to add the relationship for.
             relation (Optional[Tuple[str, str]]): The relationship tuple. Defaults to None.
         """
+        self.env.relationships.add_node(member.name)
         if not self.fully_connected and relation is not None:
             for r in relation:
                 if r[0] not in self.env.relationships:
                     raise ValueError(f"Member with name {r[0]} does not exist")
                 if member.name not in r:
                     continue
-                self.env.relationships[r[0]].append(r[1])
+                self.env.relationships.add_edge(r[0],r[1])
 
     def _remove_relationships(self, member_name: str):
         """
@@ -474,13 +867,30 @@ class Group:
         Args:
             member_name (str): The name of the member to remove relationships for.
         """
-        if not self.fully_connected:
-            self.env.relationships.pop(member_name, None)
-            for k, v in self.env.relationships.items():
-                if member_name in v:
-                    v.remove(member_name)
+        self.env.relationships.remove_node(member_name)
 
     def _select_next_agent_auto(self, model: str, include_current: bool) -> str:
+        response = self.model_client.chat.completions.create(
+            model=model,
+            messages=self._build_handoff_messages(),
+            temperature=0.0,
+            tools=self._build_current_agent_handoff_tools(include_current),
+            tool_choice="required"
+        )
+        return response.choices[0].message.tool_calls[0].function.name
+
+    async def _aselect_next_agent_auto(self, model: str, include_current: bool) -> str:
+        response = await acall(
+            self.model_client.chat.completions.create,
+            model=model,
+            messages=self._build_handoff_messages(),
+            temperature=0.0,
+            tools=self._build_current_agent_handoff_tools(include_current),
+            tool_choice="required"
+        )
+        return response.choices[0].message.tool_calls[0].function.name
+
+    def _build_handoff_messages(self) -> List[Dict]:
 
         pre_messages = "\n\n".join([f"```{m.sender}\n {m.result}\n```" for m in self.group_messages.context[-1:]])
 
@@ -493,17 +903,7 @@ class Group:
 
         messages = [{"role": "system", "content": "Decide who should be the next person to talk. Transfer the conversation to the next person."}]
         messages.extend([{"role": "user", "content": handoff_message}])
-
-        handoff_tools = self._build_current_agent_handoff_tools(include_current)
-
-        response = self.model_client.chat.completions.create(
-            model=model,
-            messages=messages,
-            temperature=0.0,
-            tools=handoff_tools,
-            tool_choice="required"
-        )
-        return response.choices[0].message.tool_calls[0].function.name
+        return messages
 
     def _task_sequential(self,task:str,model:str="gpt-4o-mini"):
         self.user_input(task,action="task")
@@ -516,8 +916,19 @@ class Group:
         self._logger.log("info","Task finished")
         return response
 
+    async def _atask_sequential(self,task:str,model:str="gpt-4o-mini"):
+        self.user_input(task,action="task")
+        step = 0
+        self._logger.log("info",f"Start task: {task}")
+        for member in self.env.members:
+            step += 1
+            self._logger.log("info",f"===> Step {step} for {member.name}")
+            response = await self.acall_agent(agent=member.name,model=model,include_current=False,message_cut_off=None)
+        self._logger.log("info","Task finished")
+        return response
+
     def _task_auto(self,task:str,model:str="gpt-4o-mini",model_for_planning:str=None,
-                   with_plan_revise:bool=True,with_in_transit_revise:bool=True):
+                   with_plan_revise:bool=True,with_in_transit_revise:Union[bool,InTransitRevisionPolicy]=True,max_concurrency:int=4,speculative_planning:bool=False):
 
         if self.planner is None:
             self.planner = GroupPlanner(env=self.env,model_client=self.model_client,verbose=self.verbose)
@@ -525,37 +936,222 @@ class Group:
 
         self.planner.set_task(task)
         self.planner.planning(model_for_planning if model_for_planning else model)
-        if with_plan_revise:
+        speculative = {}
+        if with_plan_revise and speculative_planning:
+            speculation_executor = ThreadPoolExecutor(max_workers=max(1,max_concurrency))
+            started = {self._task_key(t):speculation_executor.submit(self._speculate_task_step,task,t,model) for t in self._independent_tasks(self.planner.plan,max_concurrency)}
+            self.planner.revise_plan(model_for_planning if model_for_planning else model)
+            speculative = self._keep_speculative_steps(self.planner.plan,started)
+            for future in started.values():
+                future.cancel() # the dropped steps still running finish in the background, their responses are ignored
+            speculation_executor.shutdown(wait=False)
+        elif with_plan_revise:
             self.planner.revise_plan(model_for_planning if model_for_planning else model)
         tasks = self.planner.plan
+        dependencies = self._build_task_dependencies(tasks)
 
-        step = 0
         self._logger.log("info",f"Start Task ...")
-        for t in tasks:
-            step += 1
-            self._logger.log("info",f"===> Step {step} for {t.agent_name} \n\ndo task: {t.task} \n\nreceive information from: {t.receive_information_from}")
-            self.set_current_agent(t.agent_name)
+        results = {}
+        pending = list(range(len(tasks)))
+        running = {}
+        revisions = {}
+        with ThreadPoolExecutor(max_workers=max(1,max_concurrency)) as executor, ThreadPoolExecutor(max_workers=max(1,max_concurrency)) as revision_executor:
+            while pending or running:
+                for step in list(pending):
+                    if len(running) >= max(1,max_concurrency):
+                        break
+                    if dependencies[step].issubset(results):
+                        pending.remove(step)
+                        future = executor.submit(self._run_task_step,task,step,tasks[step],model,model_for_planning,with_in_transit_revise,speculative.get(step))
+                        running[future] = step
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    step = running.pop(future)
+                    results[step] = future.result()
+                    if self._in_transit_revision_mode(with_in_transit_revise,step,results[step]) == "background":
+                        # the next steps start without waiting for the revision
+                        revisions[step] = revision_executor.submit(self._run_in_transit_revision,task,tasks[step],results[step],model,model_for_planning)
+            for step,future in revisions.items():
+                results[step] = future.result()
+
+        self._logger.log("info","Task finished")
+        return self._finish_task_auto(tasks,results[len(tasks)-1] if tasks else [])
+
+    async def _atask_auto(self,task:str,model:str="gpt-4o-mini",model_for_planning:str=None,
+                          with_plan_revise:bool=True,with_in_transit_revise:Union[bool,InTransitRevisionPolicy]=True,max_concurrency:int=4,speculative_planning:bool=False):
+
+        if self.planner is None:
+            self.planner = GroupPlanner(env=self.env,model_client=self.model_client,verbose=self.verbose)
+            self._logger.log("info","Group Planner initialized (used for planning and managing group tasks)")
+
+        self.planner.set_task(task)
+        await self.planner.aplanning(model_for_planning if model_for_planning else model)
+        speculative = {}
+        if with_plan_revise and speculative_planning:
+            started = {self._task_key(t):asyncio.ensure_future(self._aspeculate_task_step(task,t,model)) for t in self._independent_tasks(self.planner.plan,max_concurrency)}
+            await self.planner.arevise_plan(model_for_planning if model_for_planning else model)
+            speculative = self._keep_speculative_steps(self.planner.plan,started)
+            for future in started.values():
+                future.cancel()
+        elif with_plan_revise:
+            await self.planner.arevise_plan(model_for_planning if model_for_planning else model)
+        tasks = self.planner.plan
+        dependencies = self._build_task_dependencies(tasks)
+        semaphore = asyncio.Semaphore(max(1,max_concurrency))
+
+        revisions = {}
+
+        async def run_step(step,upstream_steps):
+            await asyncio.gather(*upstream_steps)
+            async with semaphore:
+                response = await self._arun_task_step(task,step,tasks[step],model,model_for_planning,with_in_transit_revise,speculative.get(step))
+            if self._in_transit_revision_mode(with_in_transit_revise,step,response) == "background":
+                # the next steps start without waiting for the revision
+                revisions[step] = asyncio.ensure_future(self._arun_in_transit_revision(task,tasks[step],response,model,model_for_planning))
+            return response
+
+        self._logger.log("info",f"Start Task ...")
+        steps = []
+        for step in range(len(tasks)):
+            steps.append(asyncio.ensure_future(run_step(step,[steps[d] for d in dependencies[step]])))
+        results = await asyncio.gather(*steps)
+        for step,revision in revisions.items():
+            results[step] = await revision
+
+        self._logger.log("info","Task finished")
+        return self._finish_task_auto(tasks,results[-1] if tasks else [])
+
+    def _finish_task_auto(self,tasks,response:List[Message]) -> List[Message]:
+        # the steps run concurrently and never change the current agent, it is set once to the agent of the final step
+        if tasks:
+            self.set_current_agent(tasks[-1].agent_name)
+        return response
+
+    @staticmethod
+    def _build_task_dependencies(tasks) -> List[set]:
+        """
+        Builds the dependency graph of a plan.
+
+        A step depends on the latest earlier step of each agent it receives information from, 
+        and on the latest earlier step of its own agent, so steps without such predecessors can run concurrently.
+
+        Returns:
+            List[set]: The indices of the steps each step depends on.
+        """
+        dependencies = []
+        latest_step = {}
+        for step,t in enumerate(tasks):
+            senders = set(t.receive_information_from) | {t.agent_name}
+            dependencies.append({latest_step[sender] for sender in senders if sender in latest_step})
+            latest_step[t.agent_name] = step
+        return dependencies
+
+    def _run_task_step(self,task:str,step:int,t,model:str,model_for_planning:str,with_in_transit_revise:Union[bool,InTransitRevisionPolicy],speculative:Future=None) -> List[Message]:
+        self._logger.log("info",f"===> Step {step+1} for {t.agent_name} \n\ndo task: {t.task} \n\nreceive information from: {t.receive_information_from}")
+        if speculative is not None:
+            response = speculative.result()
+        else:
             message_send = self._build_auto_task_message(task,t,cut_off=3,model=model)
             response = self.members_map[t.agent_name].do(message = message_send,model = model,keep_memory=False)
+        self.update_group_messages(response)
+        for r in response:
+            self._logger.log("info",f"Agent {t.agent_name} response:\n\n{r.result}",color="bold_purple")
+
+        if self._in_transit_revision_mode(with_in_transit_revise,step,response) == "inline":
+            response = self._run_in_transit_revision(task,t,response,model,model_for_planning)
+
+        return response
+
+    def _run_in_transit_revision(self,task:str,t,response:List[Message],model:str,model_for_planning:str) -> List[Message]:
+        # extra tasks for the step
+        extra_tasks = self.planner.in_transit_revisions(t,response,model_for_planning if model_for_planning else model)
+        for index,et in enumerate(extra_tasks):
+            self._logger.log("info",f"===> Extra Task {index+1} for {et.agent_name} \n\ndo task: {et.task} \n\nreceive information from: {et.receive_information_from}")
+            message_send = self._build_auto_task_message(task,et,cut_off=3,model=model)
+            response = self.members_map[et.agent_name].do(message = message_send,model = model,keep_memory=False)
             self.update_group_messages(response)
             for r in response:
-                self._logger.log("info",f"Agent {self.current_agent} response:\n\n{r.result}",color="bold_purple")
-
-            if with_in_transit_revise:
-                # extra tasks for each step
-                extra_tasks = self.planner.in_transit_revisions(t,response,model_for_planning if model_for_planning else model)
-                for index,et in enumerate(extra_tasks):
-                    self._logger.log("info",f"===> Extra Task {index+1} for {et.agent_name} \n\ndo task: {et.task} \n\nreceive information from: {et.receive_information_from}")
-                    self.set_current_agent(et.agent_name)
-                    message_send = self._build_auto_task_message(task,et,cut_off=3,model=model)
-                    response = self.members_map[et.agent_name].do(message = message_send,model = model,keep_memory=False)
-                    self.update_group_messages(response)
-                    for r in response:
-                        self._logger.log("info",f"Agent {self.current_agent} response(extra task):\n\n{r.result}",color="bold_purple")
+                self._logger.log("info",f"Agent {et.agent_name} response(extra task):\n\n{r.result}",color="bold_purple")
+        return response
 
-        self._logger.log("info","Task finished")
+    async def _arun_task_step(self,task:str,step:int,t,model:str,model_for_planning:str,with_in_transit_revise:Union[bool,InTransitRevisionPolicy],speculative:asyncio.Future=None) -> List[Message]:
+        self._logger.log("info",f"===> Step {step+1} for {t.agent_name} \n\ndo task: {t.task} \n\nreceive information from: {t.receive_information_from}")
+        if speculative is not None:
+            response = await speculative
+        else:
+            message_send = self._build_auto_task_message(task,t,cut_off=3,model=model)
+            response = await self.members_map[t.agent_name].ado(message = message_send,model = model,keep_memory=False)
+        self.update_group_messages(response)
+        for r in response:
+            self._logger.log("info",f"Agent {t.agent_name} response:\n\n{r.result}",color="bold_purple")
+
+        if self._in_transit_revision_mode(with_in_transit_revise,step,response) == "inline":
+            response = await self._arun_in_transit_revision(task,t,response,model,model_for_planning)
+
+        return response
+
+    async def _arun_in_transit_revision(self,task:str,t,response:List[Message],model:str,model_for_planning:str) -> List[Message]:
+        extra_tasks = await self.planner.ain_transit_revisions(t,response,model_for_planning if model_for_planning else model)
+        for index,et in enumerate(extra_tasks):
+            self._logger.log("info",f"===> Extra Task {index+1} for {et.agent_name} \n\ndo task: {et.task} \n\nreceive information from: {et.receive_information_from}")
+            message_send = self._build_auto_task_message(task,et,cut_off=3,model=model)
+            response = await self.members_map[et.agent_name].ado(message = message_send,model = model,keep_memory=False)
+            self.update_group_messages(response)
+            for r in response:
+                self._logger.log("info",f"Agent {et.agent_name} response(extra task):\n\n{r.result}",color="bold_purple")
         return response
 
+    @staticmethod
+    def _in_transit_revision_mode(with_in_transit_revise:Union[bool,InTransitRevisionPolicy],step:int,response:List[Message]) -> Optional[Literal["inline","background"]]:
+        """
+        Returns how the in-transit revision of a step runs: None (skipped), "inline" (before the next steps) or "background" (alongside them).
+        True revises every step inline, a policy decides from the response.
+        """
+        if isinstance(with_in_transit_revise,InTransitRevisionPolicy):
+            if not with_in_transit_revise.should_revise(step,response):
+                return None
+            return "background" if with_in_transit_revise.background else "inline"
+        return "inline" if with_in_transit_revise else None
+
+    def _speculate_task_step(self,main_task:str,t,model:str) -> List[Message]:
+        """
+        Runs a plan step before the plan is final, without adding the response to the group messages.
+        Only steps that depend on no other step are speculated, so their prompt does not depend on the progress of the task.
+        """
+        self._logger.log("info",f"===> Speculative step for {t.agent_name} \n\ndo task: {t.task}")
+        message_send = self._build_auto_task_message(main_task,t,cut_off=3,model=model)
+        return self.members_map[t.agent_name].do(message = message_send,model = model,keep_memory=False)
+
+    async def _aspeculate_task_step(self,main_task:str,t,model:str) -> List[Message]:
+        self._logger.log("info",f"===> Speculative step for {t.agent_name} \n\ndo task: {t.task}")
+        message_send = self._build_auto_task_message(main_task,t,cut_off=3,model=model)
+        return await self.members_map[t.agent_name].ado(message = message_send,model = model,keep_memory=False)
+
+    @staticmethod
+    def _task_key(t) -> Tuple[str,str]:
+        return (t.agent_name,t.task)
+
+    def _independent_tasks(self,tasks,max_concurrency:int) -> List:
+        dependencies = self._build_task_dependencies(tasks)
+        return [t for t,d in zip(tasks,dependencies) if not d][:max(1,max_concurrency)]
+
+    def _keep_speculative_steps(self,tasks,started:Dict) -> Dict:
+        """
+        Matches the speculated steps with the steps of the revised plan by agent and task, the matched steps must still depend on no other step.
+        The matched futures are removed from `started`, the ones left are dropped by the caller.
+
+        Returns:
+            Dict: The future of the speculated response of each kept step.
+        """
+        kept = {}
+        dependencies = self._build_task_dependencies(tasks)
+        for step,t in enumerate(tasks):
+            key = self._task_key(t)
+            if not dependencies[step] and key in started:
+                kept[step] = started.pop(key)
+        self._logger.log("info",f"Speculative planning: {len(kept)} steps kept, {len(started)} dropped")
+        return kept
+
     def _build_auto_task_message(self,main_task,task,cut_off:int=None,model:str="gpt-4o-mini"):
         if cut_off < 1:
             cut_off = None
@@ -563,20 +1159,14 @@ class Group:
         task_deatil = task.task
         receive_information_from = set(task.receive_information_from)
 
-        members_description = "\n".join([f"- {m.name} ({m.role})" for m in self.env.members])
+        members_description = self._build_members_description(with_tools=False)
 
-        previous_messages = [message for message in self.group_messages.context if message.sender == agent_name]
-        if cut_off is not None:
-            previous_messages = previous_messages[-cut_off:]
+        context = self.group_messages.context
+        previous_messages = context.by_sender(agent_name,last=cut_off)
 
-        receive_informations = []
-        receive_sender_couter = {}
-        for message in self.group_messages.context:
-            if message.sender in receive_information_from and (receive_sender_couter.get(message.sender,0) < cut_off or cut_off is None):
-                if message.sender not in receive_sender_couter:
-                    receive_sender_couter[message.sender] = 0
-                receive_sender_couter[message.sender] += 1
-                receive_informations.append(message)
+        # the first cut_off messages of every sender, in the order of the group messages
+        receive_positions = sorted(i for sender in receive_information_from for i in context.sender_positions(sender)[:cut_off])
+        receive_informations = [context[i] for i in receive_positions]
 
         previous_messages_str = "\n\n".join([f"```{m.sender}:{m.action}\n{m.result}\n```" for m in previous_messages])
         receive_informations_str = "\n\n".join([f"```{m.sender}:{m.action}\n{m.result}\n```" for m in receive_informations])
@@ -617,33 +1207,31 @@ class Group:
         }
 
 
-    def _build_send_message(self,cut_off:int=None,send_to:str=None) -> str:
+    def _build_send_message(self,cut_off:int=None,send_to:str=None,model:str=None) -> str:
         """ 
         This function builds a prompt for the agent to send a message in the group message protocol.
 
         Args:
             cut_off (int): The number of previous messages to consider.
             send_to (str): The agent to send the message
+            model (str): The model the prompt is sent to, selects the token budget of the group messages.
 
         Returns:
             str: The prompt for the agent to send a message.
         """
         
-        members_description = "\n".join([f"- {m.name} ({m.role})" + (f" [tools available: {', '.join([x.__name__ for x in m.tools])}]" if m.tools else "") for m in self.env.members])
+        members_description = self._build_members_description()
 
-
-        if cut_off is None:
-            previous_messages = "\n\n".join([f"```{m.sender}:{m.action}\n{m.result}\n```" for m in self.group_messages.context if m.sender == send_to])
-            others_messages = "\n\n".join([f"```{m.sender}:{m.action}\n{m.result}\n```" for m in self.group_messages.context if m.sender != send_to])
-        else:
-            previous_messages = "\n\n".join([f"```{m.sender}:{m.action}\n{m.result}\n```" for m in self.group_messages.context[-cut_off:] if m.sender == send_to])
-            others_messages = "\n\n".join([f"```{m.sender}:{m.action}\n{m.result}\n```" for m in self.group_messages.context[-cut_off:] if m.sender != send_to])
+        # only the messages appended since the last call are formatted
+        token_budget = resolve_token_budget(self.context_token_budget, model)
+        previous_messages, others_messages = self._prompt_builder.split_messages(self.group_messages.context, send_to, cut_off, token_budget, since=self.group_messages.summarized_until)
 
         prompt = (
             f"### Background Information\n"
             f"{self.env.description}\n\n"
             f"### Members\n"
             f"{members_description}\n\n"
+            + (f"### Summary of Earlier Messages\n{self.group_messages.summary}\n\n" if self.group_messages.summary else "") +
             f"### Your Previous Message\n"
             f"{previous_messages}\n\n"
             f"### Other people's Messages\n"
@@ -697,14 +1285,41 @@ class Group:
         self.group_workspace = group_workspace
 
     def _set_env_public(self):
+        # the members or relationships changed, the cached handoff tools and member descriptions are rebuilt on demand
+        self._topology_version += 1
+        # the public copies of the members are reused, only the joining members are copied (and validated)
+        public_members = {}
+        for m in self.env.members:
+            cached = self._public_members.get(m.name)
+            public_members[m.name] = cached if cached is not None and cached[0] is m else (m, Member(name=m.name, role=m.role, description=m.description))
+        self._public_members = public_members
+        self._topology_cache = {}
         self.env_public = Env(
             description=self.env.description,
-            members=[Member(name=m.name, role=m.role, description=m.description) for m in self.env.members],
+            members=[public for _, public in self._public_members.values()],
             relationships=self.env.relationships,
             language=self.env.language
         )
 
+    def _from_topology_cache(self, key:Tuple, build):
+        """
+        Returns the value cached for the current topology (members and relationships), building it on the first call.
+        """
+        if key not in self._topology_cache:
+            self._topology_cache[key] = build()
+        return self._topology_cache[key]
+
+    def _build_members_description(self, with_tools:bool = True) -> str:
+        if with_tools:
+            return self._from_topology_cache(("members_description",True),lambda: "\n".join([f"- {m.name} ({m.role})" + (f" [tools available: {', '.join([x.__name__ for x in m.tools])}]" if m.tools else "") for m in self.env.members]))
+        return self._from_topology_cache(("members_description",False),lambda: "\n".join([f"- {m.name} ({m.role})" for m in self.env.members]))
+
     def _build_current_agent_handoff_tools(self, include_current_agent:bool = False):
-        handoff_tools = [self._build_agent_handoff_tool_function(self.members_map[self.current_agent])] if include_current_agent else []
-        handoff_tools.extend(self._build_agent_handoff_tool_function(self.members_map[agent]) for agent in self.env.relationships[self.current_agent])
-        return handoff_tools
\ No newline at end of file
+        def build():
+            handoff_tools = [self._build_cached_handoff_tool(self.current_agent)] if include_current_agent else []
+            handoff_tools.extend(self._build_cached_handoff_tool(agent) for agent in self.env.relationships[self.current_agent])
+            return handoff_tools
+        return self._from_topology_cache(("handoff_tools",self.current_agent,include_current_agent),build)
+
+    def _build_cached_handoff_tool(self, agent_name:str) -> Dict:
+        return self._from_topology_cache(("handoff_tool",agent_name),lambda: self._build_agent_handoff_tool_function(self.members_map[agent_name]))
\ No newline at end of file
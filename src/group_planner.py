@@ -7,15 +7,75 @@
 """
 
 
-from openai import OpenAI
-from pydantic import BaseModel
-from typing import List,Literal
-
-from src.protocol import Env
+from openai import OpenAI,AsyncOpenAI
+from pydantic import BaseModel, create_model
+from typing import List,Literal,Union,Tuple,Type,Optional
+from functools import lru_cache
+from dataclasses import dataclass
+import asyncio
+
+from src.protocol import Env, Message
 from src.utilities.logger import Logger
+from src.utilities.utils import acall
+
+@lru_cache(maxsize=256)
+def build_tasks_model(agent_names:Tuple[str,...],member_names:Tuple[str,...]) -> Type[BaseModel]:
+    """
+    Builds the response format of a plan: `Tasks` with a list of `Task` assigned to one of `agent_names`, receiving information from `member_names`.
+    The models are cached by the member names, so the planners (and groups) with the same members share the same classes.
+
+    Args:
+        agent_names (Tuple[str,...]): The names the tasks can be assigned to.
+        member_names (Tuple[str,...]): The names the tasks can receive information from.
+
+    Returns:
+        Type[BaseModel]: The `Tasks` model.
+    """
+    task_model = create_model(
+        "Task",
+        agent_name=(Literal[agent_names],...),
+        task=(str,...),
+        receive_information_from=(List[Literal[member_names]],...),
+    )
+    return create_model("Tasks",tasks=(List[task_model],...))
+
+@dataclass
+class InTransitRevisionPolicy:
+    """
+    Decides after which plan steps the planner looks for extra tasks (`GroupPlanner.in_transit_revisions`),
+    instead of after every step: when the response contains a failure marker, is shorter than `min_length`
+    or longer than `max_length` characters, or every `every_k_steps` steps.
+
+    Args:
+        failure_markers (Tuple[str,...], optional): Lower case phrases hinting that the step is incomplete.
+        min_length (int, optional): Responses shorter than this are revised. Defaults to 50.
+        max_length (Optional[int], optional): Responses longer than this are revised. Defaults to None meaning no limit.
+        every_k_steps (Optional[int], optional): Revise every k steps whatever the response. Defaults to None.
+        background (bool, optional): Run the revision (and its extra tasks) alongside the next steps instead of before them. Defaults to True.
+
+    Examples:
+        >>> g.task("Write a design brief.", strategy="auto", with_in_transit_revise=InTransitRevisionPolicy(every_k_steps=3))
+    """
+    failure_markers: Tuple[str,...] = ("error","failed","unable to","cannot","can't","sorry","not sure","need more information","incomplete","todo","tbd")
+    min_length: int = 50
+    max_length: Optional[int] = None
+    every_k_steps: Optional[int] = None
+    background: bool = True
+
+    def should_revise(self, step: int, response: List[Message]) -> bool:
+        """
+        Returns True if the response of the step (0-based) should be revised.
+        """
+        if self.every_k_steps and (step + 1) % self.every_k_steps == 0:
+            return True
+        text = "\n".join(str(r.result) for r in response)
+        if len(text) < self.min_length or (self.max_length is not None and len(text) > self.max_length):
+            return True
+        text = text.lower()
+        return any(marker in text for marker in self.failure_markers)
 
 class GroupPlanner:
-    def __init__(self, env: Env,model_client: OpenAI,verbose: bool = False):
+    def __init__(self, env: Env,model_client: Union[OpenAI,AsyncOpenAI],verbose: bool = False):
         self.env = env
         self.model_client = model_client
         self.plan = []
@@ -56,23 +116,145 @@ class GroupPlanner:
         """
         self._logger.log("info","Start planning the task")
 
-        member_list = ",".join([f'"{m.name}"' for m in self.env.members]) # for pydantic Literal
+        messages,response_format = self._build_planning_messages()
+
+        completion = self.model_client.beta.chat.completions.parse(
+            model=model,
+            messages=messages,
+            temperature=0.0,
+            response_format=response_format,
+        )
+        
+        self._set_plan(completion.choices[0].message.parsed.tasks)
+
+    async def aplanning(self,model:str="gpt-4o-mini"):
+        """
+        Async version of `planning`.
+        """
+        self._logger.log("info","Start planning the task")
+
+        messages,response_format = self._build_planning_messages()
+
+        completion = await acall(
+            self.model_client.beta.chat.completions.parse,
+            model=model,
+            messages=messages,
+            temperature=0.0,
+            response_format=response_format,
+        )
+        
+        self._set_plan(completion.choices[0].message.parsed.tasks)
+
+    def revise_plan(self,model:str="gpt-4o-mini"):
+
+        if self.plan is None:
+            raise ValueError("No plan to revise, please plan the task first by calling the planning method.")
+
+        self._logger.log("info","Start revising the plan")
+
+        self._logger.log("info","Get feedback from the members")
+
+        feedback_prompt = self._build_feedback_prompt()
+
+        feedbacks = []
+        for member in self.env.members:
+            response = member.do(feedback_prompt,model)
+            feedbacks.extend(self._collect_feedbacks(member,response))
+
+        messages,response_format = self._build_revise_messages(feedbacks)
+        
+        completion = self.model_client.beta.chat.completions.parse(
+            model=model,
+            messages=messages,
+            temperature=0.0,
+            response_format=response_format,
+        )
+        self._set_plan(completion.choices[0].message.parsed.tasks,revised=True)
+
+    async def arevise_plan(self,model:str="gpt-4o-mini"):
+        """
+        Async version of `revise_plan`, the feedbacks from the members are collected concurrently.
+        """
+
+        if self.plan is None:
+            raise ValueError("No plan to revise, please plan the task first by calling the planning method.")
+
+        self._logger.log("info","Start revising the plan")
+
+        self._logger.log("info","Get feedback from the members")
+
+        feedback_prompt = self._build_feedback_prompt()
+
+        responses = await asyncio.gather(*[member.ado(feedback_prompt,model) for member in self.env.members])
+        feedbacks = []
+        for member,response in zip(self.env.members,responses):
+            feedbacks.extend(self._collect_feedbacks(member,response))
+
+        messages,response_format = self._build_revise_messages(feedbacks)
+        
+        completion = await acall(
+            self.model_client.beta.chat.completions.parse,
+            model=model,
+            messages=messages,
+            temperature=0.0,
+            response_format=response_format,
+        )
+        self._set_plan(completion.choices[0].message.parsed.tasks,revised=True)
+
+    def in_transit_revisions(self,current_task,current_response:str,model:str="gpt-4o-mini"):
+
+        self._logger.log("info",f"Decide weather to assign extra tasks before next task in the plan")
+
+        messages,response_format = self._build_in_transit_messages(current_task,current_response)
+
+        completion = self.model_client.beta.chat.completions.parse(
+            model=model,
+            messages=messages,
+            temperature=0.0,
+            response_format=response_format,
+        )
+        
+        return self._log_extra_task(completion.choices[0].message.parsed.tasks)
+
+    async def ain_transit_revisions(self,current_task,current_response:str,model:str="gpt-4o-mini"):
+        """
+        Async version of `in_transit_revisions`.
+        """
+
+        self._logger.log("info",f"Decide weather to assign extra tasks before next task in the plan")
+
+        messages,response_format = self._build_in_transit_messages(current_task,current_response)
 
-        class_str = (
-            f"class Task(BaseModel):\n"
-            f"    agent_name:Literal[{member_list}]\n"
-            f"    task:str\n"
-            f"    receive_information_from:List[Literal[{member_list}]]\n"
-            f""
-            f"class Tasks(BaseModel):\n"
-            f"    tasks:List[Task]\n"
+        completion = await acall(
+            self.model_client.beta.chat.completions.parse,
+            model=model,
+            messages=messages,
+            temperature=0.0,
+            response_format=response_format,
         )
         
-        exec(class_str, globals())
+        return self._log_extra_task(completion.choices[0].message.parsed.tasks)
+
+    @property
+    def env(self) -> Env:
+        return self._env
 
-        response_format = eval("Tasks")
+    @env.setter
+    def env(self, env: Env):
+        # set again by the group when members join or leave
+        self._env = env
+        self._members_description = None
 
-        members_description = "\n".join([f"- {m.name} ({m.role})" + (f" [tools available: {', '.join([x.__name__ for x in m.tools])}]" if m.tools else "") for m in self.env.members])
+    def _build_members_description(self) -> str:
+        if self._members_description is None:
+            self._members_description = "\n".join([f"- {m.name} ({m.role})" + (f" [tools available: {', '.join([x.__name__ for x in m.tools])}]" if m.tools else "") for m in self.env.members])
+        return self._members_description
+
+    def _build_planning_messages(self):
+        member_names = tuple(m.name for m in self.env.members)
+        response_format = build_tasks_model(member_names,member_names)
+
+        members_description = self._build_members_description()
 
 
         prompt = (
@@ -96,32 +278,22 @@ class GroupPlanner:
         messages = [{"role": "system", "content": self.planner_prompt}]
 
         messages.extend([{"role": "user", "content": prompt}])
-        
-        completion = self.model_client.beta.chat.completions.parse(
-            model=model,
-            messages=messages,
-            temperature=0.0,
-            response_format=response_format,
-        )
-        
-        self.plan = completion.choices[0].message.parsed.tasks
-        self._logger.log("info","Planning finished")
-
-        tasks_str = "\n\n".join([f"Step {i+1}: {t.agent_name}\n{t.task}\nreceive information from: {t.receive_information_from}\n" for i,t in enumerate(self.plan)])
-        
-        self._logger.log("info",f"Task: {self.task}\n\nPlan:\n{tasks_str}",color="bold_blue")
 
+        return messages,response_format
 
-    def revise_plan(self,model:str="gpt-4o-mini"):
-
-        if self.plan is None:
-            raise ValueError("No plan to revise, please plan the task first by calling the planning method.")
-
-        self._logger.log("info","Start revising the plan")
+    def _set_plan(self,tasks,revised:bool=False):
+        self.plan = tasks
+        if revised:
+            self._logger.log("info","Revising the plan finished, replacing the initial plan with the revised plan")
+        else:
+            self._logger.log("info","Planning finished")
 
-        members_description = "\n".join([f"- {m.name} ({m.role})" + (f" [tools available: {', '.join([x.__name__ for x in m.tools])}]" if m.tools else "") for m in self.env.members])
+        tasks_str = "\n\n".join([f"Step {i+1}: {t.agent_name}\n{t.task}\nreceive information from: {t.receive_information_from}\n" for i,t in enumerate(self.plan)])
+        
+        self._logger.log("info",f"Task: {self.task}\n\n{'Revised Plan' if revised else 'Plan'}:\n{tasks_str}",color="bold_blue")
 
-        self._logger.log("info","Get feedback from the members")
+    def _build_feedback_prompt(self) -> str:
+        members_description = self._build_members_description()
 
         feedback_prompt = (
             f"### Contextual Information\n"
@@ -142,31 +314,23 @@ class GroupPlanner:
         if self.env.language is not None:
             feedback_prompt += f"\n\n### Response in Language: {self.env.language}\n"
 
+        return feedback_prompt
+
+    def _collect_feedbacks(self,member,response):
         feedbacks = []
-        for member in self.env.members:
-            response = member.do(feedback_prompt,model)
-            for r in response:
-                feedback_str = f"Feedback from {member.name}: {r.result}"
-                self._logger.log("info",feedback_str,color="bold_blue")
-                feedbacks.append(r)
-        
-        feedbacks_str = "\n".join([f"{f.sender}: {f.result}" for f in feedbacks])
+        for r in response:
+            feedback_str = f"Feedback from {member.name}: {r.result}"
+            self._logger.log("info",feedback_str,color="bold_blue")
+            feedbacks.append(r)
+        return feedbacks
 
-        member_list = ",".join([f'"{m.name}"' for m in self.env.members]) # for pydantic Literal
+    def _build_revise_messages(self,feedbacks):
+        members_description = self._build_members_description()
 
-        class_str = (
-            f"class Task(BaseModel):\n"
-            f"    agent_name:Literal[{member_list}]\n"
-            f"    task:str\n"
-            f"    receive_information_from:List[Literal[{member_list}]]\n"
-            f""
-            f"class Tasks(BaseModel):\n"
-            f"    tasks:List[Task]\n"
-        )
-        
-        exec(class_str, globals())
+        feedbacks_str = "\n".join([f"{f.sender}: {f.result}" for f in feedbacks])
 
-        response_format = eval("Tasks")
+        member_names = tuple(m.name for m in self.env.members)
+        response_format = build_tasks_model(member_names,member_names)
 
         prompt = (
             f"### Contextual Information\n"
@@ -188,45 +352,14 @@ class GroupPlanner:
 
         messages = [{"role": "system", "content": self.planner_prompt}]
         messages.extend([{"role": "user", "content": prompt}])
-        
-        completion = self.model_client.beta.chat.completions.parse(
-            model=model,
-            messages=messages,
-            temperature=0.0,
-            response_format=response_format,
-        )
-        self.plan = completion.choices[0].message.parsed.tasks
-        self._logger.log("info","Revising the plan finished, replacing the initial plan with the revised plan")
-
-        tasks_str = "\n\n".join([f"Step {i+1}: {t.agent_name}\n{t.task}\nreceive information from: {t.receive_information_from}\n" for i,t in enumerate(self.plan)])
 
-        self._logger.log("info",f"Task: {self.task}\n\nRevised Plan:\n{tasks_str}",color="bold_blue")
+        return messages,response_format
 
+    def _build_in_transit_messages(self,current_task,current_response:str):
+        members_description = self._build_members_description()
 
-    def in_transit_revisions(self,current_task,current_response:str,model:str="gpt-4o-mini"):
-
-        self._logger.log("info",f"Decide weather to assign extra tasks before next task in the plan")
-
-
-        members_description = "\n".join([f"- {m.name} ({m.role})" + (f" [tools available: {', '.join([x.__name__ for x in m.tools])}]" if m.tools else "") for m in self.env.members])
-
-        member_list = f'"{current_task.agent_name}"' # for pydantic Literal
-
-        all_member_list = ",".join([f'"{m.name}"' for m in self.env.members]) # for pydantic Literal
-
-        class_str = (
-            f"class Task(BaseModel):\n"
-            f"    agent_name:Literal[{member_list}]\n"
-            f"    task:str\n"
-            f"    receive_information_from:List[Literal[{all_member_list}]]\n"
-            f""
-            f"class Tasks(BaseModel):\n"
-            f"    tasks:List[Task]\n"
-        )
-        
-        exec(class_str, globals())
-
-        response_format = eval("Tasks")
+        # extra tasks are only for the current agent
+        response_format = build_tasks_model((current_task.agent_name,),tuple(m.name for m in self.env.members))
 
         prompt = (
             f"### Contextual Information\n"
@@ -262,15 +395,9 @@ class GroupPlanner:
         messages = [{"role": "system", "content": planner_assistant_prompt}]
         messages.extend([{"role": "user", "content": prompt}])
 
-        completion = self.model_client.beta.chat.completions.parse(
-            model=model,
-            messages=messages,
-            temperature=0.0,
-            response_format=response_format,
-        )
-        
-        extra_task = completion.choices[0].message.parsed.tasks
-    
+        return messages,response_format
+
+    def _log_extra_task(self,extra_task):
         if extra_task:
 
             tasks_str = "\n\n".join([f"Step {i+1}: {t.agent_name}\n{t.task}\nreceive information from: {t.receive_information_from}\n" for i,t in enumerate(extra_task)])
@@ -279,4 +406,4 @@ class GroupPlanner:
         else:
             self._logger.log("info","No extra task assigned",color="bold_blue")
 
-        return extra_task
\ No newline at end of file
+        return extra_task
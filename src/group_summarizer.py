@@ -0,0 +1,101 @@
+# -*- coding: utf-8 -*-
+"""
+@Time: 2026/10/18 10:00
+@Author: ZJun
+@File: group_summarizer.py
+@Description: This file contains the GroupSummarizer class which folds the old group messages into a running summary.
+"""
+
+
+from openai import OpenAI,AsyncOpenAI
+from typing import List,Union,Optional
+import json
+from dataclasses import asdict
+
+from src.protocol import GroupMessageProtocol
+from src.utilities.logger import Logger
+from src.utilities.utils import acall
+
+class GroupSummarizer:
+    """
+    Folds the group messages older than the `keep_recent` most recent ones into a running summary stored on the
+    GroupMessageProtocol (`summary`, covering the messages before `summarized_until`).
+
+    A fold is triggered once `fold_every` messages are waiting to be folded, and only sends the previous summary and these messages,
+    so its cost does not grow with the length of the conversation.
+
+    Args:
+        model_client (Union[OpenAI,AsyncOpenAI]): The model client used to summarize.
+        fold_every (int, optional): The number of old messages that triggers a fold. Defaults to 20.
+        keep_recent (int, optional): The number of most recent messages never folded. Defaults to 20.
+        language (Optional[str], optional): The language of the summary. Defaults to None.
+        verbose (bool, optional): The verbosity. Defaults to False.
+
+    Examples:
+        >>> summarizer = GroupSummarizer(model_client, fold_every=20, keep_recent=10)
+        >>> if summarizer.should_fold(group_messages):
+        ...     summarizer.fold(group_messages, model="gpt-4o-mini")
+        >>> group_messages.summary, group_messages.summarized_until
+    """
+
+    def __init__(self, model_client: Union[OpenAI,AsyncOpenAI], fold_every: int = 20, keep_recent: int = 20, language: Optional[str] = None, verbose: bool = False):
+        self.model_client = model_client
+        self.fold_every = fold_every
+        self.keep_recent = keep_recent
+        self.language = language
+        self._logger = Logger(verbose=verbose)
+
+    def should_fold(self, group_messages: GroupMessageProtocol) -> bool:
+        return len(group_messages.context) - self.keep_recent - group_messages.summarized_until >= self.fold_every
+
+    def fold(self, group_messages: GroupMessageProtocol, model: str = "gpt-4o-mini") -> str:
+        """
+        Folds the messages between `summarized_until` and the `keep_recent` most recent ones into the summary.
+
+        Returns:
+            str: The updated summary.
+        """
+        end = len(group_messages.context) - self.keep_recent
+        messages = self._build_fold_messages(group_messages, end)
+        if messages is None:
+            return group_messages.summary
+        response = self.model_client.chat.completions.create(model=model, messages=messages, temperature=0.0)
+        return self._set_summary(group_messages, response.choices[0].message.content, end)
+
+    async def afold(self, group_messages: GroupMessageProtocol, model: str = "gpt-4o-mini") -> str:
+        """
+        Async version of `fold`.
+        """
+        end = len(group_messages.context) - self.keep_recent
+        messages = self._build_fold_messages(group_messages, end)
+        if messages is None:
+            return group_messages.summary
+        response = await acall(self.model_client.chat.completions.create, model=model, messages=messages, temperature=0.0)
+        return self._set_summary(group_messages, response.choices[0].message.content, end)
+
+    def _build_fold_messages(self, group_messages: GroupMessageProtocol, end: int) -> Optional[List[dict]]:
+        start = group_messages.summarized_until
+        if end <= start:
+            return None
+        new_messages = group_messages.context[start:end]
+        prompt = (
+            f"### Summary So Far\n"
+            f"{group_messages.summary or 'Nothing yet.'}\n\n"
+            f"### New Messages\n"
+            f"{json.dumps([asdict(m) for m in new_messages], indent=4, ensure_ascii=False)}\n\n"
+            f"### Task\n"
+            f"Update the summary so far with the new messages. Keep who said or did what, the decisions, the results and the open questions, "
+            f"drop greetings and repetitions. Just return the updated summary in concise sentences."
+        )
+        if self.language is not None:
+            prompt += f"\n\n### Response in Language: {self.language}\n"
+        return [
+            {"role": "system", "content": "You are good at summarizing. You maintain the running summary of a group conversation."},
+            {"role": "user", "content": prompt}
+        ]
+
+    def _set_summary(self, group_messages: GroupMessageProtocol, summary: str, end: int) -> str:
+        self._logger.log("info", f"Folded messages {group_messages.summarized_until} to {end} into the summary")
+        group_messages.summary = summary
+        group_messages.summarized_until = end
+        return summary
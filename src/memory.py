@@ -1,19 +1,24 @@
-from typing import List, Optional, Tuple, Any, Literal
+from typing import List, Optional, Tuple, Any, Literal, Union, Dict
 from pydantic import BaseModel, Field
+from dataclasses import dataclass
+from datetime import datetime
+import numpy as np
 import os
 import uuid
+import time
+import queue
+import atexit
+import asyncio
+import threading
+import warnings
 import chromadb
+from chromadb import EmbeddingFunction
 from dotenv import load_dotenv
 import chromadb.utils.embedding_functions as embedding_functions
 
 from src.utilities.logger import Logger
-
-# 增加记忆衰减机制
-# 添加记忆整合机制
-#   Find similar memories using semantic similarity
-#   Merge related memories into more concise, comprehensive versions
-#   Increase the importance of frequently referenced information
-#   Update the vector database to reflect the consolidated memories
+from src.utilities.utils import acall, is_async_client
+from src.utilities.embedding import CachedEmbeddingFunction
 
 class MemoryItem(BaseModel):
     """
@@ -31,9 +36,132 @@ class LongTermMemory(BaseModel):
     """
     memorys: Optional[List[MemoryItem]] = Field(default_factory=list)
 
+class SourcedMemoryItem(MemoryItem):
+    """
+    Sourced Memory Item: A memory item attributed to the memory sample of a batch it is extracted from.
+    """
+    source: int = Field(..., description="Number of the memory sample the memory item is extracted from")
+class BatchLongTermMemory(BaseModel):
+    """
+    Batch Long Term Memory: Represents the long term memory extracted from a batch of memory samples.
+    """
+    memorys: Optional[List[SourcedMemoryItem]] = Field(default_factory=list)
+
+@dataclass
+class LocalMemoryFilter:
+    """
+    Selects the relevant long term memories without a model call.
+
+    Candidates farther than `max_distance` from the query are dropped, the others are scored by their relevance
+    (the cosine similarity to the query, converted from the distance of the collection space, see `relevance`) plus the weighted
+    importance and recency, then picked by maximal marginal relevance so near-duplicates do not crowd out the rest.
+
+    Args:
+        max_distance (Optional[float], optional): The maximum Chroma distance of a relevant memory, in the space of the collection:
+            squared l2 ("l2", 0 to 4 for normalized embeddings), 1 - cosine similarity ("cosine", 0 to 2) or 1 - inner product ("ip").
+            Defaults to None meaning no threshold.
+        mmr_lambda (float, optional): Trade-off between score (1.0) and diversity (0.0). Defaults to 0.7.
+        importance_weight (float, optional): Weight of the importance (1 to 5, scaled to 0 to 1). Defaults to 0.1.
+        recency_weight (float, optional): Weight of the recency, halving every `recency_half_life` seconds. Defaults to 0.1.
+        recency_half_life (float, optional): Defaults to one week.
+        candidate_multiplier (int, optional): Number of candidates retrieved per selected memory. Defaults to 4.
+    """
+    max_distance: Optional[float] = None
+    mmr_lambda: float = 0.7
+    importance_weight: float = 0.1
+    recency_weight: float = 0.1
+    recency_half_life: float = 7 * 24 * 3600
+    candidate_multiplier: int = 4
+
+    def select(self, candidates: List[Dict], max_results: int, space: Literal["l2", "cosine", "ip"] = "l2") -> List[Dict]:
+        candidates = [c for c in candidates if self.max_distance is None or c["distance"] <= self.max_distance]
+        if not candidates:
+            return []
+        now = time.time()
+        scores = [self._score(c, now, space) for c in candidates]
+        embeddings = np.array([c["embedding"] for c in candidates], dtype=float)
+        embeddings /= np.linalg.norm(embeddings, axis=1, keepdims=True) + 1e-12
+        similarities = embeddings @ embeddings.T
+
+        selected: List[int] = []
+        remaining = list(range(len(candidates)))
+        while remaining and len(selected) < max_results:
+            best = max(remaining, key=lambda i: self.mmr_lambda * scores[i] - (1 - self.mmr_lambda) * max((similarities[i][j] for j in selected), default=0.0))
+            selected.append(best)
+            remaining.remove(best)
+        return [candidates[i] for i in selected]
+
+    @staticmethod
+    def relevance(distance: float, space: Literal["l2", "cosine", "ip"] = "l2") -> float:
+        """
+        Converts a Chroma distance into the cosine similarity of (normalized) embeddings.
+        """
+        if space == "l2":
+            # squared l2 distance of unit vectors: 2 - 2 * cos
+            return 1 - distance / 2
+        if space in ("cosine", "ip"):
+            return 1 - distance
+        raise ValueError(f"Unsupported distance space: {space}")
+
+    def _score(self, candidate: Dict, now: float, space: Literal["l2", "cosine", "ip"] = "l2") -> float:
+        relevance = self.relevance(candidate["distance"], space)
+        importance = (candidate["importance"] - 1) / 4 if candidate["importance"] else 0.0
+        created_at = candidate["created_at"]
+        recency = 0.5 ** (max(0.0, now - created_at) / self.recency_half_life) if created_at else 0.0
+        return relevance + self.importance_weight * importance + self.recency_weight * recency
+
+    @staticmethod
+    def parse_time(metadata: Dict) -> Optional[float]:
+        if metadata.get("created_at"):
+            return float(metadata["created_at"])
+        try:
+            return datetime.fromisoformat(metadata.get("timestamp") or "").timestamp()
+        except ValueError:
+            return None
+
+_chroma_clients: Dict[str, Any] = {}
+_embedding_functions: Dict[Tuple[str, str], EmbeddingFunction] = {}
+_registry_lock = threading.Lock()
+
+def get_chroma_client(path: str) -> Any:
+    """
+    Returns the process-wide Chroma client of a database path, opened on first use, so that many memories on the same path share one client.
+    """
+    path = os.path.abspath(path)
+    with _registry_lock:
+        if path not in _chroma_clients:
+            if not os.path.exists(path):
+                os.makedirs(path)
+            _chroma_clients[path] = chromadb.PersistentClient(path)
+        return _chroma_clients[path]
+
+_FLUSH = object() # wakes up the extraction worker to extract the batch it is collecting
+
 class Memory:
     """
     Simple memory for demo.
+
+    When `background_extraction` is True, the working memories evicted beyond the threshold are extracted into
+    long term memory by a background worker (a thread, or tasks on the running event loop for async model clients),
+    so adding a working memory does not wait for the extraction call. At most `max_pending_extractions` evicted
+    memories wait for extraction, adding more blocks until the worker catches up. Call `flush` (`aflush`) to wait
+    for the pending extractions, the worker thread is also flushed when the interpreter exits.
+
+    With `extraction_batch_size` > 1 the worker collects up to `extraction_batch_size` evicted memories, or what arrived
+    within `extraction_batch_interval` seconds, and extracts them in a single call storing the source of every item.
+
+    `get_memorys_str(enhanced_filter=True)` filters the memories with `local_filter` (no model call) when `filter_mode` is "local",
+    or asks the model to select the relevant ones when it is "llm".
+
+    The long term memory database embeds with `embedding_function`: "openai" (text-embedding-3-large), "local"
+    (Chroma's ONNX all-MiniLM-L6-v2 on CPU, the model is downloaded once) or any Chroma embedding function.
+    With `embedding_cache` every text is embedded once, the embeddings are cached in memory and in `embedding_cache_path`
+    (defaults to `embedding_cache.db` in `db_path`).
+
+    All memories on the same `db_path` share one Chroma client (and one "openai"/"local" embedding function). By default every memory
+    has its own collection, with `shared_collection` the memories share that collection instead, partitioned by a `memory_unique_id` metadata.
+
+    `compact` decays and consolidates the long term memories, on demand or every `interval` seconds after `start_compaction`.
     """
 
     def __init__(self,
@@ -43,7 +171,17 @@ class Memory:
                  language: str = None,
                  db_path: str = None,  # For long term memory embedded database
                  memory_unique_id: str = None,
-                 verbose: bool = False):
+                 verbose: bool = False,
+                 background_extraction: bool = True,
+                 max_pending_extractions: int = 100,
+                 extraction_batch_size: int = 1,
+                 extraction_batch_interval: float = 5.0,
+                 filter_mode: Literal["local", "llm"] = "local",
+                 local_filter: LocalMemoryFilter = None,
+                 embedding_function: Union[Literal["openai", "local"], EmbeddingFunction] = "openai",
+                 embedding_cache: bool = True,
+                 embedding_cache_path: Optional[str] = None,
+                 shared_collection: Optional[str] = None):
         self._logger = Logger(verbose=verbose)
         self.working_memory_threshold = working_memory_threshold
         self.working_memory: List[str] = []
@@ -54,6 +192,25 @@ class Memory:
         self.db_path = db_path
         self.verbose = verbose
         self.memory_unique_id = str(uuid.uuid4()) if memory_unique_id is None else memory_unique_id
+        self.background_extraction = background_extraction
+        self.max_pending_extractions = max_pending_extractions
+        self._extraction_queue: queue.Queue = queue.Queue(maxsize=max_pending_extractions)
+        self._extraction_worker: Optional[threading.Thread] = None
+        self._extraction_tasks: set = set()
+        self.extraction_batch_size = extraction_batch_size
+        self.extraction_batch_interval = extraction_batch_interval
+        self._extraction_buffer: List[str] = []
+        self._extraction_timer: Optional[asyncio.Task] = None
+        self.filter_mode = filter_mode
+        self.local_filter = local_filter if local_filter is not None else LocalMemoryFilter()
+        self.embedding_function = embedding_function
+        self.embedding_cache = embedding_cache
+        self.embedding_cache_path = embedding_cache_path
+        self.shared_collection = shared_collection
+        self._partition = {"memory_unique_id": self.memory_unique_id} if shared_collection else None
+        self._compaction_lock = threading.Lock()
+        self._compaction_worker: Optional[threading.Thread] = None
+        self._compaction_stop = threading.Event()
         load_dotenv()
         self._create_long_term_memory_db()
         self._logger.log("info",f"Memory initialized with working memory threshold: {working_memory_threshold}")
@@ -62,35 +219,209 @@ class Memory:
         self.working_memory.append(memory)
         if len(self.working_memory) > self.working_memory_threshold:
             removed_memory = self.working_memory.pop(0)
-            self._extract_long_term_memory(removed_memory)  # Can be updated to run asynchronously later
+            if self.background_extraction:
+                self._enqueue_extraction(removed_memory)
+            else:
+                self._extract_long_term_memory(removed_memory)
+
+    async def aadd_working_memory(self, memory: str) -> None:
+        self.working_memory.append(memory)
+        if len(self.working_memory) > self.working_memory_threshold:
+            removed_memory = self.working_memory.pop(0)
+            if not self.background_extraction:
+                await self._aextract_long_term_memory(removed_memory)
+            elif is_async_client(self.model_client):
+                await self._aenqueue_extraction(removed_memory)
+            else:
+                await asyncio.to_thread(self._enqueue_extraction, removed_memory)
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """
+        Waits until the background worker thread has extracted every pending memory.
+
+        Args:
+            timeout (Optional[float], optional): The maximum number of seconds to wait. Defaults to None meaning wait forever.
+
+        Returns:
+            bool: True if nothing is pending anymore.
+        """
+        if self._extraction_worker is not None and self.extraction_batch_size > 1:
+            self._extraction_queue.put(_FLUSH)
+        if timeout is None:
+            self._extraction_queue.join()
+            return True
+        with self._extraction_queue.all_tasks_done:
+            return self._extraction_queue.all_tasks_done.wait_for(lambda: not self._extraction_queue.unfinished_tasks, timeout)
+
+    async def aflush(self) -> None:
+        """
+        Waits until every pending extraction, on the event loop and in the worker thread, is done.
+        """
+        if self._extraction_buffer:
+            self._aextract_buffer()
+        while self._extraction_tasks:
+            await asyncio.gather(*self._extraction_tasks)
+        await asyncio.to_thread(self.flush)
+
+    def close(self) -> None:
+        """
+        Flushes the pending extractions and stops the background worker threads.
+        """
+        self.stop_compaction()
+        if self._extraction_worker is not None:
+            self._extraction_queue.put(None)
+            self._extraction_worker.join()
+            self._extraction_worker = None
+            atexit.unregister(self.close)
+
+    def _enqueue_extraction(self, memory: str) -> None:
+        if self._extraction_worker is None:
+            self._extraction_worker = threading.Thread(target=self._extraction_loop, name=f"memory-extraction-{self.memory_unique_id}", daemon=True)
+            self._extraction_worker.start()
+            atexit.register(self.close)
+        if self._extraction_queue.full():
+            self._logger.log("warning",f"Extraction queue is full ({self.max_pending_extractions} pending), waiting for the worker.")
+        self._extraction_queue.put(memory)  # blocks while the queue is full
+
+    def _extraction_loop(self) -> None:
+        while True:
+            batch = [self._extraction_queue.get()]
+            deadline = time.monotonic() + self.extraction_batch_interval
+            while len(batch) < self.extraction_batch_size and batch[-1] is not None and batch[-1] is not _FLUSH:
+                try:
+                    batch.append(self._extraction_queue.get(timeout=max(0, deadline - time.monotonic())))
+                except queue.Empty:
+                    break
+            memories = [m for m in batch if isinstance(m, str)]
+            try:
+                if memories:
+                    self._extract_memories(memories)
+            except Exception as e:
+                self._logger.log("error",f"Background long term memory extraction failed: {e}",color="bold_red")
+            finally:
+                for _ in batch:
+                    self._extraction_queue.task_done()
+            if None in batch:
+                return
+
+    async def _aenqueue_extraction(self, memory: str) -> None:
+        while len(self._extraction_tasks) >= max(1, self.max_pending_extractions // self.extraction_batch_size):
+            await asyncio.wait(self._extraction_tasks, return_when=asyncio.FIRST_COMPLETED)
+        self._extraction_buffer.append(memory)
+        if len(self._extraction_buffer) >= self.extraction_batch_size:
+            self._aextract_buffer()
+        elif self._extraction_timer is None:
+            self._extraction_timer = asyncio.create_task(self._aextract_buffer_later())
+
+    async def _aextract_buffer_later(self) -> None:
+        await asyncio.sleep(self.extraction_batch_interval)
+        self._extraction_timer = None
+        self._aextract_buffer()
+
+    def _aextract_buffer(self) -> None:
+        if self._extraction_timer is not None:
+            self._extraction_timer.cancel()
+            self._extraction_timer = None
+        memories, self._extraction_buffer = self._extraction_buffer, []
+        task = asyncio.create_task(self._aextract_in_background(memories))
+        self._extraction_tasks.add(task)
+        task.add_done_callback(self._extraction_tasks.discard)
+
+    async def _aextract_in_background(self, memories: List[str]) -> None:
+        try:
+            await self._aextract_memories(memories)
+        except Exception as e:
+            self._logger.log("error",f"Background long term memory extraction failed: {e}",color="bold_red")
+
+    def _extract_memories(self, memories: List[str]) -> None:
+        if len(memories) == 1:
+            self._extract_long_term_memory(memories[0])
+        else:
+            self._extract_long_term_memory_batch(memories)
+
+    async def _aextract_memories(self, memories: List[str]) -> None:
+        if len(memories) == 1:
+            await self._aextract_long_term_memory(memories[0])
+        else:
+            await self._aextract_long_term_memory_batch(memories)
 
     def manual_add_long_term_memory(self, memory: str) -> None:
         self._extract_long_term_memory(memory)
 
+    async def amanual_add_long_term_memory(self, memory: str) -> None:
+        await self._aextract_long_term_memory(memory)
+
     def _create_long_term_memory_db(self) -> None:
         if self.db_path:
-            if not os.path.exists(self.db_path):
-                os.makedirs(self.db_path)
-            client = chromadb.PersistentClient(self.db_path)
-            openai_ef = embedding_functions.OpenAIEmbeddingFunction(
+            client = get_chroma_client(self.db_path)
+            with warnings.catch_warnings():
+                # the embedding cache wraps the embedding function under its name, Chroma stores it as a legacy (unnamed) config
+                warnings.filterwarnings("ignore", message="legacy embedding function config", category=DeprecationWarning)
+                self.db_embedding_function = self._get_embedding_function()
+                self.db_collection = client.get_or_create_collection(self.shared_collection or self.memory_unique_id, embedding_function=self.db_embedding_function)
+            self._logger.log("info",f"Long term memory database created at: {self.db_path}")
+        else:
+            self.db_embedding_function = None
+            self.db_collection = None
+
+    def _distance_space(self) -> str:
+        """
+        The distance space of the collection, the "openai" embedding function creates "cosine" collections, the default is "l2".
+        """
+        with warnings.catch_warnings():
+            warnings.filterwarnings("ignore", message="legacy embedding function config", category=DeprecationWarning)
+            configuration = getattr(self.db_collection, "configuration", None) or {}
+        space = (configuration.get("hnsw") or {}).get("space")
+        if space is None:
+            space = (getattr(self.db_collection, "metadata", None) or {}).get("hnsw:space", "l2")
+        return space
+
+    def _get_embedding_function(self) -> EmbeddingFunction:
+        if not isinstance(self.embedding_function, str):
+            return self._build_embedding_function()
+        key = (self.embedding_function, os.path.abspath(self._embedding_cache_path()) if self.embedding_cache else "")
+        with _registry_lock:
+            if key not in _embedding_functions:
+                _embedding_functions[key] = self._build_embedding_function()
+            return _embedding_functions[key]
+
+    def _embedding_cache_path(self) -> str:
+        return self.embedding_cache_path or os.path.join(self.db_path, "embedding_cache.db")
+
+    def _build_embedding_function(self) -> EmbeddingFunction:
+        if self.embedding_function == "openai":
+            ef = embedding_functions.OpenAIEmbeddingFunction(
                 api_key=os.environ.get("OPENAI_API_KEY"),
                 api_base=os.environ.get("OPENAI_BASE_URL"),
                 model_name="text-embedding-3-large"
             )
-            self.db_collection = client.get_or_create_collection(self.memory_unique_id, embedding_function=openai_ef)
-            self._logger.log("info",f"Long term memory database created at: {self.db_path}")
+        elif self.embedding_function == "local":
+            ef = embedding_functions.DefaultEmbeddingFunction()
         else:
-            self.db_collection = None
+            ef = self.embedding_function
+        if self.embedding_cache:
+            ef = CachedEmbeddingFunction(ef, path=self._embedding_cache_path())
+        return ef
 
-    def _extract_long_term_memory(self, memory: str) -> None:
+    def _build_extract_messages(self, memory: Union[str, List[str]]) -> List[dict]:
         system_message = "You are skilled at identifying and categorizing memories for long-term storage."
-            
-        prompt = (
-            "Based on established principles in cognitive science, please analyze the following memory sample with an emphasis on memory systems and retrieval mechanisms:\n\n"
-            "### Memory Sample:\n"
-            "```\n"
-            f"{memory}\n"
-            "```\n\n"
+
+        if isinstance(memory, list):
+            samples = "".join(f"### Memory Sample {i+1}:\n```\n{m}\n```\n\n" for i, m in enumerate(memory))
+            prompt = (
+                "Based on established principles in cognitive science, please analyze each of the following memory samples with an emphasis on memory systems and retrieval mechanisms:\n\n"
+                f"{samples}"
+            )
+        else:
+            prompt = (
+                "Based on established principles in cognitive science, please analyze the following memory sample with an emphasis on memory systems and retrieval mechanisms:\n\n"
+                "### Memory Sample:\n"
+                "```\n"
+                f"{memory}\n"
+                "```\n\n"
+            )
+
+        prompt += (
             "### Analysis Requirements:\n"
             "1. **Summary:**\n"
             "   - Summarize the core content of the memory.\n"
@@ -108,23 +439,60 @@ class Memory:
             "   - Specify the **Emotional Valence** on a scale from -2 (very negative) to +2 (very positive), using only objective evidence from the memory content.\n\n"
             "Ensure that your analysis is strictly factual and directly derived from the memory sample, without introducing any additional speculation."
         )
+
+        if isinstance(memory, list):
+            prompt += "\n\n### Source Attribution:\nSet the source of every memory item to the number of the memory sample it is derived from."
  
-        self._logger.log("info",f"Start Extracting Long Term Memory...")
         if self.language:
             prompt += f"\n\n### Response in Language: {self.language}"
     
         messages = [{"role": "system", "content": system_message},
                     {"role": "user", "content": prompt}]
-        
+        return messages
+
+    def _extract_long_term_memory(self, memory: str) -> None:
+        self._logger.log("info",f"Start Extracting Long Term Memory...")
         completion = self.model_client.beta.chat.completions.parse(
             model=self.model,
-            messages=messages,
+            messages=self._build_extract_messages(memory),
             temperature=0.0,
             response_format=LongTermMemory
         )
+        self._store_long_term_memory(completion.choices[0].message.parsed)
+
+    async def _aextract_long_term_memory(self, memory: str) -> None:
+        self._logger.log("info",f"Start Extracting Long Term Memory...")
+        completion = await acall(
+            self.model_client.beta.chat.completions.parse,
+            model=self.model,
+            messages=self._build_extract_messages(memory),
+            temperature=0.0,
+            response_format=LongTermMemory
+        )
+        await asyncio.to_thread(self._store_long_term_memory, completion.choices[0].message.parsed)
+
+    def _extract_long_term_memory_batch(self, memories: List[str]) -> None:
+        self._logger.log("info",f"Start Extracting Long Term Memory from a batch of {len(memories)} memories...")
+        completion = self.model_client.beta.chat.completions.parse(
+            model=self.model,
+            messages=self._build_extract_messages(memories),
+            temperature=0.0,
+            response_format=BatchLongTermMemory
+        )
+        self._store_long_term_memory(completion.choices[0].message.parsed, memories)
 
-        long_term_memory: LongTermMemory = completion.choices[0].message.parsed
+    async def _aextract_long_term_memory_batch(self, memories: List[str]) -> None:
+        self._logger.log("info",f"Start Extracting Long Term Memory from a batch of {len(memories)} memories...")
+        completion = await acall(
+            self.model_client.beta.chat.completions.parse,
+            model=self.model,
+            messages=self._build_extract_messages(memories),
+            temperature=0.0,
+            response_format=BatchLongTermMemory
+        )
+        await asyncio.to_thread(self._store_long_term_memory, completion.choices[0].message.parsed, memories)
 
+    def _store_long_term_memory(self, long_term_memory: Union[LongTermMemory, BatchLongTermMemory], sources: Optional[List[str]] = None) -> None:
         self._logger.log("info",f"Extract Long Term Memory Completed.")
 
         if long_term_memory.memorys:
@@ -137,33 +505,319 @@ class Memory:
                               "timestamp": memory.timestamp or "",
                               "retrieval_cue": memory.retrieval_cue,
                               "importance": memory.importance,
-                              "emotional_valence": memory.emotional_valence}
+                              "emotional_valence": memory.emotional_valence,
+                              "created_at": time.time(),
+                              "memory_unique_id": self.memory_unique_id}
                               for memory in long_term_memory.memorys]
+                if sources:
+                    for memory, metadata in zip(long_term_memory.memorys, metadatas):
+                        if 1 <= memory.source <= len(sources):
+                            metadata["source"] = sources[memory.source - 1]
                 self.db_collection.add(documents=documents, ids=ids, metadatas=metadatas)
 
     def retrieve_working_memory(self) -> List[str]:
         return self.working_memory
 
-    def retrieve_long_term_memory(self, query: str, max_results: int = 5) -> Any:
+    def _query_long_term_memory(self, query: str, n_results: int, include: Optional[List[str]] = None) -> Any:
         if self.db_collection is None or not query:
-            return []
-        # Retrieve available document count from the collection.
-        available_count = self.db_collection.count() if hasattr(self.db_collection, "count") else max_results
-        if available_count == 0:
-            return []
-        n_results = min(max_results, available_count)
-        res = self.db_collection.query(query_texts=[query], n_results=n_results)
+            return None
+        if self._partition is None:
+            # Retrieve available document count from the collection.
+            available_count = self.db_collection.count() if hasattr(self.db_collection, "count") else n_results
+            if available_count == 0:
+                return None
+            n_results = min(n_results, available_count)
+        return self.db_collection.query(query_texts=[query], n_results=n_results, where=self._partition, include=include or ["documents", "metadatas"])
+
+    def retrieve_long_term_memory(self, query: str, max_results: int = 5) -> Any:
+        res = self._query_long_term_memory(query, max_results)
         if res is None:
             return []
         try:
-            return [{"content": doc, "time": meta.get('timestamp',None)} for doc, meta 
+            return [{"content": doc, "time": (meta or {}).get('timestamp',None)} for doc, meta 
                     in zip(res.get('documents', [])[0],res.get('metadatas', [])[0])]
         except (IndexError, KeyError):
             return []
 
+    def retrieve_relevant_long_term_memory(self, query: str, max_results: int = 5) -> Any:
+        """
+        Retrieves the long term memories selected by the local filter among the nearest candidates of the query.
+        """
+        res = self._query_long_term_memory(query, max_results * self.local_filter.candidate_multiplier, ["documents", "metadatas", "distances", "embeddings"])
+        if res is None:
+            return []
+        return self._select_long_term_memory(self._build_candidates(res), max_results, local_filter=True)
+
+    @staticmethod
+    def retrieve_long_term_memory_batch(memories: List["Memory"], query: str, max_results: int = 5, local_filter: bool = False) -> List[List[Dict]]:
+        """
+        Retrieves the long term memories of many memories (e.g. the agents of a group) for the same query.
+
+        The query is embedded once per embedding function, and the memories sharing a collection are searched together
+        with one query filtered on their `memory_unique_id`s. Every memory gets the same result as `retrieve_long_term_memory`
+        (`retrieve_relevant_long_term_memory` with `local_filter`) would give.
+
+        Returns:
+            List[List[Dict]]: The memories retrieved for each memory, in order.
+        """
+        results = [[] for _ in memories]
+        if not query:
+            return results
+        include = ["documents", "metadatas", "distances"] + (["embeddings"] if local_filter else [])
+        collections: Dict[Tuple, List[int]] = {}
+        for i, memory in enumerate(memories):
+            if memory.db_collection is not None:
+                key = (os.path.abspath(memory.db_path), memory.db_collection.name) if memory._partition else (id(memory),)
+                collections.setdefault(key, []).append(i)
+
+        query_embeddings = {}
+        for indices in collections.values():
+            first = memories[indices[0]]
+            ef = first.db_embedding_function
+            if id(ef) not in query_embeddings:
+                query_embeddings[id(ef)] = ef.embed_query([query])[0]
+            n_results = [max_results * (memories[i].local_filter.candidate_multiplier if local_filter else 1) for i in indices]
+            candidates = first._query_partitions([memories[i] for i in indices], query_embeddings[id(ef)], n_results, include)
+            for i, c in zip(indices, candidates):
+                results[i] = memories[i]._select_long_term_memory(c, max_results, local_filter)
+        return results
+
+    def _query_partitions(self, memories: List["Memory"], query_embedding: Any, n_results: List[int], include: List[str]) -> List[List[Dict]]:
+        if self._partition is None:
+            available_count = self.db_collection.count()
+            if available_count == 0:
+                return [[]]
+            res = self.db_collection.query(query_embeddings=[query_embedding], n_results=min(n_results[0], available_count), include=include)
+            return [self._build_candidates(res)]
+
+        ids = [memory.memory_unique_id for memory in memories]
+        where = {"memory_unique_id": {"$in": ids}} if len(ids) > 1 else {"memory_unique_id": ids[0]}
+        res = self.db_collection.query(query_embeddings=[query_embedding], n_results=sum(n_results), where=where, include=include)
+        rows = self._build_candidates(res)
+        partitions = {memory_unique_id: [] for memory_unique_id in ids}
+        for row in rows:
+            partitions[row["memory_unique_id"]].append(row)
+
+        candidates = []
+        for memory, n in zip(memories, n_results):
+            found = partitions[memory.memory_unique_id]
+            if len(found) < n and len(rows) == sum(n_results):
+                # the nearest rows of the other memories took the slots, query this partition alone
+                res = self.db_collection.query(query_embeddings=[query_embedding], n_results=n, where=memory._partition, include=include)
+                found = self._build_candidates(res)
+            candidates.append(found[:n])
+        return candidates
+
+    def _build_candidates(self, res: Dict) -> List[Dict]:
+        documents = res["documents"][0]
+        metadatas = [meta or {} for meta in res["metadatas"][0]]
+        distances = res["distances"][0] if res.get("distances") is not None else [None] * len(documents)
+        embeddings = res["embeddings"][0] if res.get("embeddings") is not None else [None] * len(documents)
+        return [
+            {"content": doc, "time": meta.get("timestamp", None), "distance": distance, "embedding": embedding,
+             "importance": meta.get("importance"), "created_at": self.local_filter.parse_time(meta), "memory_unique_id": meta.get("memory_unique_id")}
+            for doc, meta, distance, embedding in zip(documents, metadatas, distances, embeddings)
+        ]
+
+    def _select_long_term_memory(self, candidates: List[Dict], max_results: int, local_filter: bool) -> List[Dict]:
+        if local_filter:
+            selected = self.local_filter.select(candidates, max_results, self._distance_space())
+            self._logger.log("info",f"Local filter kept {len(selected)} of {len(candidates)} long term memories",color="bold_blue")
+        else:
+            selected = candidates[:max_results]
+        return [{"content": c["content"], "time": c["time"]} for c in selected]
+
+    def compact(self,
+                similarity_threshold: float = 0.92,
+                decay_half_life: float = 30 * 24 * 3600,
+                min_strength: float = 0.1,
+                consolidate_with_model: bool = False) -> Dict[str, Any]:
+        """
+        Compacts the long term memory database.
+
+        1. Decay: the strength of a memory is its importance (1 to 5, scaled to 0.2 to 1) halving every `decay_half_life` seconds
+           since it was stored (or its timestamp), memories weaker than `min_strength` are deleted.
+        2. Consolidation: the remaining memories are clustered by embedding cosine similarity (at least `similarity_threshold`),
+           each cluster is merged into its most important (then newest) memory, whose importance goes up by one as the information
+           was stored repeatedly, and the others are deleted. With `consolidate_with_model` the model rewrites each cluster as one memory.
+
+        Args:
+            similarity_threshold (float, optional): Minimum cosine similarity of near-duplicate memories. Defaults to 0.92.
+            decay_half_life (float, optional): Defaults to 30 days.
+            min_strength (float, optional): Defaults to 0.1, e.g. an importance 1 memory is deleted after one half-life.
+            consolidate_with_model (bool, optional): Defaults to False.
+
+        Returns:
+            Dict[str, Any]: The metrics of the compaction: size before and after, number of decayed, merged and deleted memories, seconds.
+        """
+        empty_metrics = {"before": 0, "after": 0, "decayed": 0, "merged": 0, "deleted": 0, "seconds": 0.0}
+        if self.db_collection is None:
+            return empty_metrics
+        with self._compaction_lock:
+            start = time.time()
+            res = self.db_collection.get(where=self._partition, include=["documents", "metadatas", "embeddings"])
+            ids, documents = res["ids"], res["documents"]
+            if not ids:
+                return dict(empty_metrics, seconds=time.time() - start)
+            metadatas = [meta or {} for meta in res["metadatas"]]
+            embeddings = np.array(res["embeddings"], dtype=float).reshape(len(ids), -1)
+
+            now = time.time()
+            decayed = [i for i in range(len(ids)) if self._memory_strength(metadatas[i], now, decay_half_life) < min_strength]
+            kept = sorted(set(range(len(ids))) - set(decayed))
+            clusters = self._cluster_memories(kept, metadatas, embeddings, similarity_threshold)
+
+            superseded = []
+            for cluster in clusters:
+                if len(cluster) > 1:
+                    self._merge_memories(cluster, ids, documents, metadatas, consolidate_with_model)
+                    superseded.extend(cluster[1:])
+
+            deleted = [ids[i] for i in decayed + superseded]
+            if deleted:
+                self.db_collection.delete(ids=deleted)
+            metrics = {
+                "before": len(ids),
+                "after": len(ids) - len(deleted),
+                "decayed": len(decayed),
+                "merged": sum(1 for cluster in clusters if len(cluster) > 1),
+                "deleted": len(deleted),
+                "seconds": time.time() - start,
+            }
+        self._logger.log("info",f"Long term memory compacted: {metrics}",color="bold_blue")
+        return metrics
+
+    def start_compaction(self, interval: float = 3600, **kwargs) -> None:
+        """
+        Runs `compact` with `kwargs` every `interval` seconds in a background thread until `stop_compaction` (or `close`).
+        """
+        if self._compaction_worker is not None:
+            return
+        self._compaction_stop.clear()
+        self._compaction_worker = threading.Thread(target=self._compaction_loop, args=(interval, kwargs), name=f"memory-compaction-{self.memory_unique_id}", daemon=True)
+        self._compaction_worker.start()
+
+    def stop_compaction(self) -> None:
+        if self._compaction_worker is not None:
+            self._compaction_stop.set()
+            self._compaction_worker.join()
+            self._compaction_worker = None
+
+    def _compaction_loop(self, interval: float, kwargs: Dict) -> None:
+        while not self._compaction_stop.wait(interval):
+            try:
+                self.compact(**kwargs)
+            except Exception as e:
+                self._logger.log("error",f"Background long term memory compaction failed: {e}",color="bold_red")
+
+    @staticmethod
+    def _memory_strength(metadata: Dict, now: float, decay_half_life: float) -> float:
+        importance = (metadata.get("importance") or 5) / 5
+        created_at = LocalMemoryFilter.parse_time(metadata)
+        if created_at is None:
+            return importance
+        return importance * 0.5 ** (max(0.0, now - created_at) / decay_half_life)
+
+    @staticmethod
+    def _cluster_memories(indices: List[int], metadatas: List[Dict], embeddings: np.ndarray, similarity_threshold: float) -> List[List[int]]:
+        """
+        Greedy clustering, the most important (then newest) memory of each cluster comes first.
+        """
+        order = sorted(indices, key=lambda i: (metadatas[i].get("importance") or 0, LocalMemoryFilter.parse_time(metadatas[i]) or 0), reverse=True)
+        if not order:
+            return []
+        vectors = embeddings[order]
+        vectors = vectors / (np.linalg.norm(vectors, axis=1, keepdims=True) + 1e-12)
+        similarities = vectors @ vectors.T
+        assigned = np.zeros(len(order), dtype=bool)
+        clusters = []
+        for a in range(len(order)):
+            if assigned[a]:
+                continue
+            members = [b for b in range(a, len(order)) if not assigned[b] and similarities[a][b] >= similarity_threshold]
+            assigned[members] = True
+            clusters.append([order[b] for b in members])
+        return clusters
+
+    def _merge_memories(self, cluster: List[int], ids: List[str], documents: List[str], metadatas: List[Dict], consolidate_with_model: bool) -> None:
+        head = cluster[0]
+        metadata = dict(metadatas[head])
+        metadata["importance"] = min(5, max(metadatas[i].get("importance") or 1 for i in cluster) + 1)
+        metadata["created_at"] = max(LocalMemoryFilter.parse_time(metadatas[i]) or 0 for i in cluster) or time.time()
+        metadata["merged_count"] = sum(metadatas[i].get("merged_count", 1) for i in cluster)
+        if consolidate_with_model and self.model_client is not None:
+            completion = self.model_client.beta.chat.completions.parse(
+                model=self.model,
+                messages=self._build_consolidate_messages([documents[i] for i in cluster]),
+                temperature=0.0,
+                response_format=MemoryItem
+            )
+            item = completion.choices[0].message.parsed
+            metadata.update({"category": item.category, "retrieval_cue": item.retrieval_cue, "emotional_valence": item.emotional_valence})
+            self.db_collection.update(ids=[ids[head]], documents=[item.content], metadatas=[metadata])
+        else:
+            self.db_collection.update(ids=[ids[head]], metadatas=[metadata])
+
+    def _build_consolidate_messages(self, memories: List[str]) -> List[dict]:
+        system_message = "You are skilled at consolidating related memories for long-term storage."
+        samples = "".join(f"- {memory}\n" for memory in memories)
+        prompt = (
+            "The following memories describe the same information:\n\n"
+            f"{samples}\n"
+            "Merge them into one concise, comprehensive memory that keeps every fact, with its category, retrieval cue, importance (1 to 5) and emotional valence (-2 to 2)."
+        )
+        if self.language:
+            prompt += f"\n\n### Response in Language: {self.language}"
+        return [{"role": "system", "content": system_message},
+                {"role": "user", "content": prompt}]
+
     def get_memorys_str(self, query: str = None, max_results: int = 3, enhanced_filter: bool = False) -> str:
+        if query and enhanced_filter and self.filter_mode == "local":
+            return self._build_memorys_str(query, max_results, local_filter=True)
+
+        memories_res = self._build_memorys_str(query, max_results)
+
+        if query and enhanced_filter:
+            completion = self.model_client.chat.completions.create(
+                model=self.model,
+                messages=self._build_filter_messages(query, memories_res),
+                tools=None,
+                tool_choice=None,
+                temperature=0.0,
+            )
+            filtered_memories = completion.choices[0].message.content
+            self._logger.log("info",f"Filtered memories:\n\n{filtered_memories}",color="bold_blue")
+            return filtered_memories
+
+        return memories_res
+
+    async def aget_memorys_str(self, query: str = None, max_results: int = 3, enhanced_filter: bool = False) -> str:
+        if query and enhanced_filter and self.filter_mode == "local":
+            return await asyncio.to_thread(self._build_memorys_str, query, max_results, True)
+
+        memories_res = await asyncio.to_thread(self._build_memorys_str, query, max_results)
+
+        if query and enhanced_filter:
+            completion = await acall(
+                self.model_client.chat.completions.create,
+                model=self.model,
+                messages=self._build_filter_messages(query, memories_res),
+                tools=None,
+                tool_choice=None,
+                temperature=0.0,
+            )
+            filtered_memories = completion.choices[0].message.content
+            self._logger.log("info",f"Filtered memories:\n\n{filtered_memories}",color="bold_blue")
+            return filtered_memories
+
+        return memories_res
+
+    def _build_memorys_str(self, query: str = None, max_results: int = 3, local_filter: bool = False) -> str:
         working_memory = self.retrieve_working_memory()
-        semantic_matching = self.retrieve_long_term_memory(query, max_results)
+        if local_filter:
+            semantic_matching = self.retrieve_relevant_long_term_memory(query, max_results)
+        else:
+            semantic_matching = self.retrieve_long_term_memory(query, max_results)
 
         sections = [
             ("Working Memory", working_memory),
@@ -179,41 +833,28 @@ class Memory:
 
         self._logger.log("info",f"Retrieved memories:\n{memories_res}")
 
-        if query and enhanced_filter:
-            system_message = (
-                f"You are skilled at identifying and selecting relevant memories based on the context provided. "
-                f"Here are the initial filtered memories:\n```{memories_res}```"
-            )
-            prompt = (
-                "Select the most relevant memories based on the current context: \n"
-                f"```{query}```\n"
-                "Most relevant memories are those that are directly related to the context provided and can be used to answer the query effectively."
-                "Just return the memories do not add any additional information and without code blocks."
-                "If There is no relevant memory, please type 'No relevant memory'."
-            )
-            if self.language:
-                prompt += f"\n\n### Response in Language: {self.language}"
-
-            messages = [
-                {"role": "system", "content": system_message},
-                {"role": "user", "content": prompt},
-            ]
-            
-            completion = self.model_client.chat.completions.create(
-                model=self.model,
-                messages=messages,
-                tools=None,
-                tool_choice=None,
-                temperature=0.0,
-            )
-
-            filtered_memories = completion.choices[0].message.content
+        return memories_res
 
-            self._logger.log("info",f"Filtered memories:\n\n{filtered_memories}",color="bold_blue")
+    def _build_filter_messages(self, query: str, memories_res: str) -> List[dict]:
+        system_message = (
+            f"You are skilled at identifying and selecting relevant memories based on the context provided. "
+            f"Here are the initial filtered memories:\n```{memories_res}```"
+        )
+        prompt = (
+            "Select the most relevant memories based on the current context: \n"
+            f"```{query}```\n"
+            "Most relevant memories are those that are directly related to the context provided and can be used to answer the query effectively."
+            "Just return the memories do not add any additional information and without code blocks."
+            "If There is no relevant memory, please type 'No relevant memory'."
+        )
+        if self.language:
+            prompt += f"\n\n### Response in Language: {self.language}"
 
-            return filtered_memories
+        return [
+            {"role": "system", "content": system_message},
+            {"role": "user", "content": prompt},
+        ]
 
-        return memories_res
     
 
 if __name__ == "__main__":
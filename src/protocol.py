@@ -6,9 +6,11 @@
 @Description: This file contains the data classes for the protocol used in the system.
 """
 
-from dataclasses import dataclass, field
-from typing import List, Tuple, Dict, Optional, Union
+from dataclasses import dataclass, field, asdict
+from typing import List, Tuple, Dict, Optional, Union, Iterable, Iterator, Set
+from collections.abc import Mapping
 import re
+import threading
 
 @dataclass
 class Member:
@@ -42,6 +44,7 @@ class Env:
         description (str): The description of the environment.
         members (List[Member]): The list of members in the environment.
         relationships (Optional[Union[List[Tuple[str, str]], Dict[str, List[str]]]], optional): The relationships between the members. It can be a list of tuples, a dictionary, or None. Defaults to None.
+            A group converts them into a RelationshipGraph.
         language (Optional[str], optional): The language of the environment. Defaults to None.
 
     Examples:
@@ -60,9 +63,113 @@ class Env:
     """
     description: str
     members: List[Member] = field(default_factory=list)
-    relationships: Optional[Union[List[Tuple[str, str]], Dict[str, List[str]]]] = None
+    relationships: Optional[Union[List[Tuple[str, str]], Dict[str, List[str]], "RelationshipGraph"]] = None
     language: Optional[str] = None
 
+    def to_dict(self) -> Dict:
+        """Returns the environment as a JSON serializable dict, a RelationshipGraph in its `Dict[str, List[str]]` form."""
+        record = asdict(self)
+        if isinstance(self.relationships, RelationshipGraph):
+            record["relationships"] = self.relationships.to_dict()
+        return record
+
+class RelationshipGraph(Mapping):
+    """The directed relationships between the members of a group: whom each member can hand the conversation off to.
+
+    The neighbors of every member are kept in insertion-ordered adjacency sets with a reverse index, so adding or removing
+    a relationship is O(1) and removing a member is O(degree). A fully connected graph stores no edges at all.
+    It reads like the `Dict[str, List[str]]` form of `Env.relationships` (`graph["Alice"]` is the list of neighbors of Alice)
+    and converts to it with `to_dict` (see `Env.to_dict` to serialize an environment).
+
+    Args:
+        members (Iterable[str], optional): The names of the members. Defaults to empty.
+        relationships (Optional[Union[List[Tuple[str, str]], Dict[str, List[str]]]], optional): The relationships as in `Env`: None means fully connected,
+            a list of pairs relates both members of each pair, a dictionary gives the neighbors of each member. Defaults to None.
+
+    Examples:
+        >>> graph = RelationshipGraph(["Alice", "Bob", "Charlie"], [("Alice", "Bob")])
+        >>> graph["Alice"], graph["Charlie"]
+        (['Bob'], [])
+        >>> graph.remove_node("Bob")
+        >>> graph.to_dict()
+        {'Alice': [], 'Charlie': []}
+    """
+
+    def __init__(self, members: Iterable[str] = (), relationships: Optional[Union[List[Tuple[str, str]], Dict[str, List[str]]]] = None):
+        self.fully_connected = relationships is None
+        self._adjacency: Dict[str, Dict[str, None]] = {}
+        self._reverse: Dict[str, Set[str]] = {}
+        self._neighbors: Dict[str, List[str]] = {}
+        for member in members:
+            self.add_node(member)
+        if isinstance(relationships, Mapping):
+            for member, neighbors in relationships.items():
+                self.add_node(member)
+                for neighbor in neighbors:
+                    self.add_edge(member, neighbor)
+        elif relationships is not None:
+            for m1, m2 in relationships:
+                self.add_edge(m1, m2)
+                self.add_edge(m2, m1)
+
+    def add_node(self, name: str) -> None:
+        if name not in self._adjacency:
+            self._adjacency[name] = {}
+            self._reverse[name] = set()
+            if self.fully_connected:
+                self._neighbors = {}
+
+    def remove_node(self, name: str) -> None:
+        if name not in self._adjacency:
+            return
+        for source in self._reverse.pop(name):
+            self._adjacency[source].pop(name, None)
+            self._neighbors.pop(source, None)
+        for target in self._adjacency.pop(name):
+            self._reverse[target].discard(name)
+        if self.fully_connected:
+            self._neighbors = {}
+        self._neighbors.pop(name, None)
+
+    def add_edge(self, source: str, target: str) -> None:
+        if self.fully_connected:
+            return
+        self.add_node(source)
+        self.add_node(target)
+        self._adjacency[source][target] = None
+        self._reverse[target].add(source)
+        self._neighbors.pop(source, None)
+
+    def has_edge(self, source: str, target: str) -> bool:
+        if self.fully_connected:
+            return source != target and source in self._adjacency and target in self._adjacency
+        return target in self._adjacency.get(source, ())
+
+    def __getitem__(self, name: str) -> List[str]:
+        if name not in self._neighbors:
+            if name not in self._adjacency:
+                raise KeyError(name)
+            if self.fully_connected:
+                self._neighbors[name] = [n for n in self._adjacency if n != name]
+            else:
+                self._neighbors[name] = list(self._adjacency[name])
+        return self._neighbors[name]
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._adjacency)
+
+    def __len__(self) -> int:
+        return len(self._adjacency)
+
+    def to_dict(self) -> Dict[str, List[str]]:
+        return {name: list(self[name]) for name in self}
+
+    def __deepcopy__(self, memo) -> "RelationshipGraph":
+        return RelationshipGraph(self, None if self.fully_connected else self.to_dict())
+
+    def __repr__(self) -> str:
+        return repr(self.to_dict())
+
 @dataclass
 class Message:
     """Defines a simple message exchanged between agents.
@@ -76,6 +183,90 @@ class Message:
     action: str
     result: str
 
+class MessageLog(list):
+    """An append-only list of messages indexed by sender and by action.
+
+    The indices are updated lazily with the messages appended since the last lookup, so looking up
+    the last k messages of a sender costs O(k) whatever the length of the log. Any other change to the list
+    (assignment, deletion, insertion, sorting...) drops the indices, which are rebuilt on the next lookup.
+    Lookups and changes hold a lock, the log can be read and appended from several threads (e.g. the concurrent plan steps).
+
+    Examples:
+        >>> log = MessageLog([Message("Alice", "talk", "Hi"), Message("Bob", "talk", "Hello"), Message("Alice", "talk", "Bye")])
+        >>> log.by_sender("Alice", last=1)
+        [Message(sender='Alice', action='talk', result='Bye')]
+        >>> log.sender_positions("Alice")
+        [0, 2]
+    """
+
+    def __init__(self, messages=()):
+        super().__init__(messages)
+        self._lock = threading.RLock()
+        self._reset_index()
+
+    def __reduce__(self):
+        # the lock can be neither copied nor pickled, the indices are rebuilt on demand
+        return (MessageLog, (list(self),))
+
+    def _reset_index(self):
+        with self._lock:
+            self._indexed = 0
+            self._senders: Dict[str, List[int]] = {}
+            self._actions: Dict[str, List[int]] = {}
+
+    def _update_index(self):
+        with self._lock:
+            end = len(self)
+            for i in range(self._indexed, end):
+                message = self[i]
+                self._senders.setdefault(message.sender, []).append(i)
+                self._actions.setdefault(message.action, []).append(i)
+            self._indexed = end
+
+    def sender_positions(self, sender: str) -> List[int]:
+        with self._lock:
+            self._update_index()
+            return list(self._senders.get(sender, []))
+
+    def action_positions(self, action: str) -> List[int]:
+        with self._lock:
+            self._update_index()
+            return list(self._actions.get(action, []))
+
+    def by_sender(self, sender: str, last: Optional[int] = None) -> List["Message"]:
+        """Returns the messages of `sender`, only the `last` ones if given."""
+        with self._lock:
+            self._update_index()
+            return self._select(self._senders.get(sender, []), last)
+
+    def by_action(self, action: str, last: Optional[int] = None) -> List["Message"]:
+        """Returns the messages of `action`, only the `last` ones if given."""
+        with self._lock:
+            self._update_index()
+            return self._select(self._actions.get(action, []), last)
+
+    def _select(self, positions: List[int], last: Optional[int]) -> List["Message"]:
+        return [self[i] for i in (positions[-last:] if last else positions)]
+
+    def _mutating(name):
+        def method(self, *args, **kwargs):
+            with self._lock:
+                self._reset_index()
+                return getattr(super(MessageLog, self), name)(*args, **kwargs)
+        method.__name__ = name
+        return method
+
+    __setitem__ = _mutating("__setitem__")
+    __delitem__ = _mutating("__delitem__")
+    __imul__ = _mutating("__imul__")
+    insert = _mutating("insert")
+    pop = _mutating("pop")
+    remove = _mutating("remove")
+    clear = _mutating("clear")
+    sort = _mutating("sort")
+    reverse = _mutating("reverse")
+    del _mutating
+
 @dataclass
 class GroupMessageProtocol:
     """Defines a group message protocol used to share messages between agents in a group.
@@ -83,11 +274,27 @@ class GroupMessageProtocol:
     Args:
         group_id (str): The group ID.
         env (Env): The environment settings of the group.
-        context (List[Message], optional): The list of messages exchanged between agents. Defaults to empty list.
+        context (List[Message], optional): The list of messages exchanged between agents, kept as a MessageLog
+            (also when a plain list is assigned) to look up the messages by sender or action. Defaults to empty list.
+        summary (Optional[str], optional): The running summary of the messages before `summarized_until`. Defaults to None.
+        summarized_until (int, optional): The number of messages of the context folded into the summary. Defaults to 0.
         next_agent (Optional[str], optional): The next agent to send the message. Defaults to None.
     """
     group_id: str
     env: Env
-    context: List[Message] = field(default_factory=list)
+    context: List[Message] = field(default_factory=MessageLog)
+    summary: Optional[str] = None
+    summarized_until: int = 0
+
+    def __setattr__(self, name, value):
+        if name == "context" and not isinstance(value, MessageLog):
+            value = MessageLog(value)
+        super().__setattr__(name, value)
+
+    def to_dict(self) -> Dict:
+        """Returns the group messages as a JSON serializable dict."""
+        record = asdict(self)
+        record["env"] = self.env.to_dict()
+        return record
 
 
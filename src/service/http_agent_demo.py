@@ -8,9 +8,11 @@
 
 
 from fastapi import FastAPI
+from fastapi.responses import StreamingResponse
 from openai import AsyncOpenAI
 from dotenv import load_dotenv
 import uvicorn
+import json
 from pydantic import BaseModel
 
 load_dotenv()
@@ -37,6 +39,28 @@ async def do(input: Input):
 
     return {"response": res}
 
+@app.post("/http_agent_demo/stream")
+async def do_stream(input: Input):
+    """
+    Stream the response as server-sent events, one `{"delta": ...}` event per generated chunk followed by `[DONE]`.
+    """
+    model = "gpt-4o-mini"
+    system_message = [{"role": "system", "content": "You are a helpful assistant. Your name is 'HTTP Agent'"}]
+    messages = system_message + [{"role": "user", "content": input.content}]
+
+    async def event_stream():
+        stream = await client.chat.completions.create(
+            model=model,
+            messages=messages,
+            stream=True
+        )
+        async for chunk in stream:
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield f"data: {json.dumps({'delta': chunk.choices[0].delta.content}, ensure_ascii=False)}\n\n"
+        yield "data: [DONE]\n\n"
+
+    return StreamingResponse(event_stream(), media_type="text/event-stream")
+
 if __name__ == "__main__":
     uvicorn.run(app, host="0.0.0.0", port=1415)
 
@@ -66,4 +90,11 @@ if __name__ == "__main__":
 # -d '{"content": "你是谁？"}'
 
 
+# ------------------------------------------------------------------------------------------------
+
+# curl -N -X POST "http://localhost:1415/http_agent_demo/stream" \
+# -H "Content-Type: application/json" \
+# -d '{"content": "你是谁？"}'
+
+
 # ------------------------------------------------------------------------------------------------
\ No newline at end of file
@@ -43,6 +43,36 @@ async def websocket_endpoint(websocket: WebSocket):
     except Exception as e:
         await websocket.close()
 
+@app.websocket("/ws_agent_demo/stream")
+async def websocket_stream_endpoint(websocket: WebSocket):
+    """
+    Same as `/ws_agent_demo` but sends a `{"delta": ...}` message per generated chunk, followed by `{"response": ..., "done": true}`.
+    """
+    await websocket.accept()
+    try:
+        while True:
+            data = await websocket.receive_json()
+            input = Input(**data)
+            model = "gpt-4o-mini"
+            system_message = [{"role": "system", "content": "You are a helpful assistant. Your name is 'WebSocket Agent'"}]
+            messages = system_message + [{"role": "user", "content": input.content}]
+
+            stream = await client.chat.completions.create(
+                model=model,
+                messages=messages,
+                stream=True
+            )
+
+            res = ""
+            async for chunk in stream:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    res += chunk.choices[0].delta.content
+                    await websocket.send_json({"delta": chunk.choices[0].delta.content})
+
+            await websocket.send_json({"response": res, "done": True})
+    except Exception as e:
+        await websocket.close()
+
 if __name__ == "__main__":
     uvicorn.run(app, host="0.0.0.0", port=5358)
 
@@ -89,3 +119,20 @@ if __name__ == "__main__":
 
 # ------------------------------------------------------------------------------------------------
 
+# import asyncio
+# import websockets
+# import json
+
+# async def stream_message():
+#     uri = "ws://localhost:5358/ws_agent_demo/stream"
+#     async with websockets.connect(uri) as websocket:
+#         await websocket.send(json.dumps({"content": "你是谁？"}))
+#         while True:
+#             message = json.loads(await websocket.recv())
+#             if message.get("done"):
+#                 break
+#             print(message["delta"], end="", flush=True)
+
+# asyncio.run(stream_message())
+
+# ------------------------------------------------------------------------------------------------
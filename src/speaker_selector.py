@@ -0,0 +1,111 @@
+# -*- coding: utf-8 -*-
+"""
+@Time: 2026/10/18 10:00
+@Author: ZJun
+@File: speaker_selector.py
+@Description: This file contains the SpeakerSelector class which selects the next speaker of a group without a model call when the choice is clear.
+"""
+
+
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+import re
+
+from src.protocol import Message
+from src.utilities.logger import Logger
+
+class SpeakerSelector:
+    """
+    Cheap tiers in front of the model based speaker selection of `Group.handoff`, tried in order:
+
+    1. mention: the last message addresses exactly one candidate, by `@name` or by starting with the name followed by a comma or colon
+       ("Bob, what do you think?"). A name only mentioned in passing ("Alice said she'd handle it") is not conclusive.
+    2. heuristic: there is a single candidate, or the speakers chosen by the model after the sender of the last message
+       are concentrated on one candidate (at least `min_observations` choices, `confidence` of them for that candidate).
+
+    When no tier is conclusive `select` returns None and the group falls back to the model, whose choice is `record`ed
+    to learn the transitions between speakers. `stats` counts the turns decided by every tier.
+
+    Args:
+        min_observations (int, optional): The number of model choices after a sender needed to trust its transitions. Defaults to 5.
+        confidence (float, optional): The share of these choices the most chosen candidate needs. Defaults to 0.8.
+        verbose (bool, optional): The verbosity. Defaults to False.
+
+    Examples:
+        >>> selector = SpeakerSelector()
+        >>> selector.select(["Alice", "Bob"], [Message(sender="user", action="talk", result="Bob, what do you think?")])
+        'Bob'
+        >>> selector.stats()
+        {'mention': 1, 'heuristic': 0, 'llm': 0, 'avoided': 1, 'avoided_rate': 1.0}
+    """
+
+    def __init__(self, min_observations: int = 5, confidence: float = 0.8, verbose: bool = False):
+        self.min_observations = min_observations
+        self.confidence = confidence
+        self.transitions: Dict[str, Counter] = {}
+        self.counters: Dict[str, int] = {"mention": 0, "heuristic": 0, "llm": 0}
+        self._patterns: Dict[str, Tuple[re.Pattern, re.Pattern]] = {}
+        self._logger = Logger(verbose=verbose)
+
+    def select(self, candidates: List[str], context: List[Message]) -> Optional[str]:
+        """
+        Returns the next speaker among the candidates if a cheap tier is conclusive, else None.
+        """
+        if not candidates:
+            return None
+        last_message = context[-1] if context else None
+        next_speaker = self._select_by_mention(candidates, last_message)
+        tier = "mention"
+        if next_speaker is None:
+            next_speaker = self._select_by_heuristic(candidates, last_message)
+            tier = "heuristic"
+        if next_speaker is not None:
+            self.counters[tier] += 1
+            self._logger.log("info", f"next speaker {next_speaker} selected by {tier}")
+        return next_speaker
+
+    def record(self, last_sender: Optional[str], next_speaker: str) -> None:
+        """
+        Records the speaker chosen by the model after `last_sender`.
+        """
+        self.counters["llm"] += 1
+        if last_sender is not None:
+            self.transitions.setdefault(last_sender, Counter())[next_speaker] += 1
+
+    def stats(self) -> Dict:
+        avoided = self.counters["mention"] + self.counters["heuristic"]
+        total = avoided + self.counters["llm"]
+        return {**self.counters, "avoided": avoided, "avoided_rate": avoided / total if total else 0.0}
+
+    def _select_by_mention(self, candidates: List[str], last_message: Optional[Message]) -> Optional[str]:
+        if last_message is None or not isinstance(last_message.result, str):
+            return None
+        candidates = [c for c in candidates if c != last_message.sender]
+        # an explicit @name comes first, then the name the message starts with
+        mentioned = [c for c in candidates if self._patterns_of(c)[0].search(last_message.result)]
+        if not mentioned:
+            mentioned = [c for c in candidates if self._patterns_of(c)[1].match(last_message.result)]
+        return mentioned[0] if len(mentioned) == 1 else None
+
+    def _select_by_heuristic(self, candidates: List[str], last_message: Optional[Message]) -> Optional[str]:
+        if len(candidates) == 1:
+            return candidates[0]
+        if last_message is None or last_message.sender not in self.transitions:
+            return None
+        counts = Counter({c: n for c, n in self.transitions[last_message.sender].items() if c in candidates})
+        total = sum(counts.values())
+        if total < self.min_observations:
+            return None
+        next_speaker, n = counts.most_common(1)[0]
+        return next_speaker if n / total >= self.confidence else None
+
+    def _patterns_of(self, name: str) -> Tuple[re.Pattern, re.Pattern]:
+        """
+        The `@name` pattern and the pattern of a message starting with "name," or "name:".
+        """
+        if name not in self._patterns:
+            self._patterns[name] = (
+                re.compile(rf"(?<![\w@])@{re.escape(name)}(?![\w])", re.IGNORECASE),
+                re.compile(rf"\s*{re.escape(name)}\s*[,:]", re.IGNORECASE),
+            )
+        return self._patterns[name]
@@ -0,0 +1,295 @@
+# -*- coding: utf-8 -*-
+"""
+@Time: 2026/10/18 10:00
+@Author: ZJun
+@File: cache.py
+@Description: This file contains the prompt/response cache for the model client calls.
+"""
+
+from typing import Optional, Dict, Any
+from collections import OrderedDict
+from abc import ABC, abstractmethod
+from pydantic import BaseModel
+from openai.types.chat import ChatCompletion, ParsedChatCompletion
+import threading
+import sqlite3
+import hashlib
+import json
+import time
+import os
+
+from src.utilities.utils import is_async_client
+
+
+class CompletionCache(ABC):
+    """
+    Base class of the completion cache backends.
+
+    A backend stores serialized completions by key, evicting entries older than `ttl` seconds
+    and the least recently used entries beyond `max_size`. Hits and misses are counted for monitoring.
+
+    Args:
+        max_size (Optional[int], optional): The maximum number of cached completions. Defaults to None meaning no limit.
+        ttl (Optional[float], optional): The number of seconds a cached completion stays valid. Defaults to None meaning forever.
+    """
+
+    def __init__(self, max_size: Optional[int] = None, ttl: Optional[float] = None):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            value = self._get(key)
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+            return value
+
+    def set(self, key: str, value: str) -> None:
+        with self._lock:
+            self._set(key, value)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._clear()
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {"hits": self.hits, "misses": self.misses, "hit_rate": self.hits / total if total else 0.0, "size": len(self)}
+
+    def _expired(self, created_at: float) -> bool:
+        return self.ttl is not None and time.time() - created_at > self.ttl
+
+    @abstractmethod
+    def _get(self, key: str) -> Optional[str]:
+        ...
+
+    @abstractmethod
+    def _set(self, key: str, value: str) -> None:
+        ...
+
+    @abstractmethod
+    def _clear(self) -> None:
+        ...
+
+    @abstractmethod
+    def __len__(self) -> int:
+        ...
+
+    @staticmethod
+    def make_key(**kwargs) -> str:
+        """
+        Builds the cache key from the request arguments (model, messages, tools, response_format, temperature ...).
+        """
+        response_format = kwargs.get("response_format")
+        if isinstance(response_format, type) and issubclass(response_format, BaseModel):
+            kwargs["response_format"] = response_format.model_json_schema()
+        payload = json.dumps(kwargs, sort_keys=True, ensure_ascii=False, default=str)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class LRUCache(CompletionCache):
+    """
+    In-memory least recently used completion cache.
+
+    Examples:
+        >>> cache = LRUCache(max_size=1024, ttl=3600)
+        >>> model_client = CachedModelClient(OpenAI(), cache)
+    """
+
+    def __init__(self, max_size: Optional[int] = 1024, ttl: Optional[float] = None):
+        super().__init__(max_size, ttl)
+        self._entries: OrderedDict = OrderedDict()
+
+    def _get(self, key: str) -> Optional[str]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        value, created_at = entry
+        if self._expired(created_at):
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    def _set(self, key: str, value: str) -> None:
+        self._entries[key] = (value, time.time())
+        self._entries.move_to_end(key)
+        while self.max_size is not None and len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def _clear(self) -> None:
+        self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class SQLiteCache(CompletionCache):
+    """
+    On-disk completion cache backed by SQLite, shared across processes and runs.
+
+    Examples:
+        >>> cache = SQLiteCache("cache/completions.db", max_size=100000, ttl=7 * 24 * 3600)
+        >>> model_client = CachedModelClient(OpenAI(), cache)
+    """
+
+    def __init__(self, path: str = "completion_cache.db", max_size: Optional[int] = None, ttl: Optional[float] = None):
+        super().__init__(max_size, ttl)
+        self.path = path
+        if os.path.dirname(path) and not os.path.exists(os.path.dirname(path)):
+            os.makedirs(os.path.dirname(path))
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS completions (key TEXT PRIMARY KEY, value TEXT, created_at REAL, accessed_at REAL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS completions_accessed_at ON completions (accessed_at)")
+        self._conn.commit()
+
+    def _get(self, key: str) -> Optional[str]:
+        row = self._conn.execute("SELECT value, created_at FROM completions WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        value, created_at = row
+        if self._expired(created_at):
+            self._conn.execute("DELETE FROM completions WHERE key = ?", (key,))
+            self._conn.commit()
+            return None
+        self._conn.execute("UPDATE completions SET accessed_at = ? WHERE key = ?", (time.time(), key))
+        self._conn.commit()
+        return value
+
+    def _set(self, key: str, value: str) -> None:
+        now = time.time()
+        self._conn.execute("INSERT OR REPLACE INTO completions VALUES (?, ?, ?, ?)", (key, value, now, now))
+        if self.ttl is not None:
+            self._conn.execute("DELETE FROM completions WHERE created_at < ?", (now - self.ttl,))
+        if self.max_size is not None:
+            self._conn.execute(
+                "DELETE FROM completions WHERE key IN (SELECT key FROM completions ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+                (self.max_size,),
+            )
+        self._conn.commit()
+
+    def _clear(self) -> None:
+        self._conn.execute("DELETE FROM completions")
+        self._conn.commit()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM completions").fetchone()[0]
+
+
+class _CachedCompletions:
+    def __init__(self, completions, cache: CompletionCache, deterministic_only: bool):
+        self._completions = completions
+        self._cache = cache
+        self._deterministic_only = deterministic_only
+
+    def __getattr__(self, name):
+        return getattr(self._completions, name)
+
+    def _cache_key(self, method: str, kwargs: Dict) -> Optional[str]:
+        if kwargs.get("stream"):
+            return None
+        if self._deterministic_only and kwargs.get("temperature") != 0:
+            return None
+        return self._cache.make_key(method=method, **kwargs)
+
+    @staticmethod
+    def _load(method: str, value: str, kwargs: Dict):
+        if method == "parse":
+            return ParsedChatCompletion[kwargs["response_format"]].model_validate_json(value)
+        return ChatCompletion.model_validate_json(value)
+
+    def _lookup(self, method: str, kwargs: Dict):
+        key = self._cache_key(method, kwargs)
+        value = self._cache.get(key) if key else None
+        return key, (self._load(method, value, kwargs) if value is not None else None)
+
+    def _store(self, key: Optional[str], completion) -> None:
+        if key and hasattr(completion, "model_dump_json"):
+            self._cache.set(key, completion.model_dump_json())
+
+    def create(self, **kwargs):
+        key, completion = self._lookup("create", kwargs)
+        if completion is None:
+            completion = self._completions.create(**kwargs)
+            self._store(key, completion)
+        return completion
+
+    def parse(self, **kwargs):
+        key, completion = self._lookup("parse", kwargs)
+        if completion is None:
+            completion = self._completions.parse(**kwargs)
+            self._store(key, completion)
+        return completion
+
+
+class _AsyncCachedCompletions(_CachedCompletions):
+    async def create(self, **kwargs):
+        key, completion = self._lookup("create", kwargs)
+        if completion is None:
+            completion = await self._completions.create(**kwargs)
+            self._store(key, completion)
+        return completion
+
+    async def parse(self, **kwargs):
+        key, completion = self._lookup("parse", kwargs)
+        if completion is None:
+            completion = await self._completions.parse(**kwargs)
+            self._store(key, completion)
+        return completion
+
+
+class _Namespace:
+    def __init__(self, target, **attributes):
+        self._target = target
+        self.__dict__.update(attributes)
+
+    def __getattr__(self, name):
+        return getattr(self._target, name)
+
+
+class CachedModelClient:
+    """
+    Wraps an OpenAI or AsyncOpenAI model client so that `chat.completions.create`, `chat.completions.parse`
+    and `beta.chat.completions.parse` are served from the cache on repeat. Every other attribute is forwarded to the wrapped client.
+
+    Since all agents, groups, planners and memories call the model through their model client,
+    passing the wrapped client to them caches every call site in the package.
+
+    Args:
+        model_client (Union[OpenAI, AsyncOpenAI]): The model client to wrap.
+        cache (CompletionCache, optional): The cache backend. Defaults to a new LRUCache.
+        deterministic_only (bool, optional): Only cache calls made with `temperature=0`, so sampled replies stay varied. Defaults to True.
+
+    Examples:
+        >>> model_client = CachedModelClient(OpenAI(), SQLiteCache("cache/completions.db", ttl=24 * 3600))
+        >>> g = Group(env=env, model_client=model_client)
+        >>> model_client.cache.stats()
+        {'hits': 12, 'misses': 30, 'hit_rate': 0.2857142857142857, 'size': 30}
+    """
+
+    def __init__(self, model_client, cache: CompletionCache = None, deterministic_only: bool = True):
+        self.model_client = model_client
+        self.cache = cache if cache is not None else LRUCache()
+        completions_class = _AsyncCachedCompletions if is_async_client(model_client) else _CachedCompletions
+        self.chat = _Namespace(
+            model_client.chat,
+            completions=completions_class(model_client.chat.completions, self.cache, deterministic_only),
+        )
+        self.beta = _Namespace(
+            model_client.beta,
+            chat=_Namespace(
+                model_client.beta.chat,
+                completions=completions_class(model_client.beta.chat.completions, self.cache, deterministic_only),
+            ),
+        )
+
+    def __getattr__(self, name):
+        return getattr(self.model_client, name)
@@ -0,0 +1,134 @@
+# -*- coding: utf-8 -*-
+"""
+@Time: 2026/10/18 10:00
+@Author: ZJun
+@File: embedding.py
+@Description: This file contains the content-hash embedding cache put in front of the embedding functions of the memory database.
+"""
+
+from typing import List, Dict, Any, Optional
+from collections import OrderedDict
+from chromadb import EmbeddingFunction, Documents, Embeddings
+import numpy as np
+import threading
+import sqlite3
+import hashlib
+import json
+import os
+
+
+class CachedEmbeddingFunction(EmbeddingFunction):
+    """
+    Wraps a Chroma embedding function so that every text is embedded once: the embeddings are cached by the hash
+    of the embedding function config and the text, in memory (least recently used first out) and optionally on disk (SQLite).
+    Only the texts missing from the cache are sent to the wrapped function, in a single call.
+
+    The wrapper keeps the name and config of the wrapped function, so it can open collections created without the cache.
+
+    Args:
+        embedding_function (EmbeddingFunction): The embedding function to wrap, e.g. OpenAIEmbeddingFunction or DefaultEmbeddingFunction.
+        path (Optional[str], optional): The SQLite file of the on-disk cache. Defaults to None meaning memory only.
+        max_size (int, optional): The maximum number of embeddings cached in memory. Defaults to 10000.
+
+    Examples:
+        >>> ef = CachedEmbeddingFunction(OpenAIEmbeddingFunction(model_name="text-embedding-3-large"), path="data/embedding_cache.db")
+        >>> collection = chromadb.PersistentClient("data").get_or_create_collection("memory", embedding_function=ef)
+        >>> ef.stats()
+        {'hits': 8, 'misses': 2, 'hit_rate': 0.8, 'size': 2}
+    """
+
+    def __init__(self, embedding_function: EmbeddingFunction, path: Optional[str] = None, max_size: int = 10000):
+        self.embedding_function = embedding_function
+        self.path = path
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+        self._namespace = self._build_namespace(embedding_function)
+        self._conn = None
+        if path:
+            if os.path.dirname(path) and not os.path.exists(os.path.dirname(path)):
+                os.makedirs(os.path.dirname(path))
+            self._conn = sqlite3.connect(path, check_same_thread=False)
+            self._conn.execute("CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, embedding BLOB)")
+            self._conn.commit()
+
+    def __call__(self, input: Documents) -> Embeddings:
+        return self._embed(input, "document", self.embedding_function.__call__)
+
+    def embed_query(self, input: Documents) -> Embeddings:
+        return self._embed(input, "query", self.embedding_function.embed_query)
+
+    def name(self) -> str:
+        return self.embedding_function.name()
+
+    def get_config(self) -> Dict[str, Any]:
+        return self.embedding_function.get_config()
+
+    def default_space(self):
+        return self.embedding_function.default_space()
+
+    def supported_spaces(self):
+        return self.embedding_function.supported_spaces()
+
+    def is_legacy(self) -> bool:
+        return self.embedding_function.is_legacy()
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {"hits": self.hits, "misses": self.misses, "hit_rate": self.hits / total if total else 0.0, "size": len(self._entries)}
+
+    def _embed(self, texts: List[str], kind: str, embed) -> Embeddings:
+        keys = [self._make_key(kind, text) for text in texts]
+        with self._lock:
+            embeddings = [self._get(key) for key in keys]
+        missing = [i for i, embedding in enumerate(embeddings) if embedding is None]
+        if missing:
+            computed = embed([texts[i] for i in missing])
+            with self._lock:
+                for i, embedding in zip(missing, computed):
+                    embeddings[i] = np.asarray(embedding, dtype=np.float32)
+                    self._set(keys[i], embeddings[i])
+                if self._conn is not None:
+                    self._conn.commit()
+        self.hits += len(texts) - len(missing)
+        self.misses += len(missing)
+        return embeddings
+
+    def _make_key(self, kind: str, text: str) -> str:
+        return hashlib.sha256(f"{self._namespace}\0{kind}\0{text}".encode("utf-8")).hexdigest()
+
+    def _get(self, key: str) -> Optional[np.ndarray]:
+        if key in self._entries:
+            self._entries.move_to_end(key)
+            return self._entries[key]
+        if self._conn is not None:
+            row = self._conn.execute("SELECT embedding FROM embeddings WHERE key = ?", (key,)).fetchone()
+            if row is not None:
+                self._remember(key, np.frombuffer(row[0], dtype=np.float32))
+                return self._entries[key]
+        return None
+
+    def _set(self, key: str, embedding: np.ndarray) -> None:
+        self._remember(key, embedding)
+        if self._conn is not None:
+            self._conn.execute("INSERT OR REPLACE INTO embeddings VALUES (?, ?)", (key, embedding.tobytes()))
+
+    def _remember(self, key: str, embedding: np.ndarray) -> None:
+        self._entries[key] = embedding
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    @staticmethod
+    def _build_namespace(embedding_function: EmbeddingFunction) -> str:
+        try:
+            config = embedding_function.get_config()
+        except Exception:
+            config = None
+        try:
+            name = embedding_function.name()
+        except Exception:
+            name = None
+        return json.dumps({"class": type(embedding_function).__name__, "name": name, "config": config}, sort_keys=True, default=str)
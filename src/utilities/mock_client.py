@@ -0,0 +1,291 @@
+# -*- coding: utf-8 -*-
+"""
+@Time: 2026/10/18 10:00
+@Author: ZJun
+@File: mock_client.py
+@Description: This file contains local stand-in model clients implementing the subset of the OpenAI interface used by this package, for tests and benchmarks without network access.
+"""
+
+from typing import List, Dict, Union, Callable, Optional, Literal, Any, get_origin, get_args
+from pydantic import BaseModel
+from openai.types.chat import ChatCompletion, ChatCompletionChunk, ParsedChatCompletion
+from openai.types import CreateEmbeddingResponse
+from chromadb import EmbeddingFunction, Documents, Embeddings
+from chromadb.utils.embedding_functions import register_embedding_function
+from types import SimpleNamespace
+import threading
+import hashlib
+import asyncio
+import json
+import math
+import time
+import re
+
+
+def _default_value(annotation) -> Any:
+    origin = get_origin(annotation)
+    args = get_args(annotation)
+    if origin is Literal:
+        return args[0]
+    if origin is list or origin is List:
+        return [_default_value(args[0])] if args else []
+    if origin is Union:
+        return _default_value(next(a for a in args if a is not type(None)))
+    if isinstance(annotation, type) and issubclass(annotation, BaseModel):
+        return default_instance(annotation)
+    return {str: "mock", int: 0, float: 0.0, bool: False}.get(annotation)
+
+
+def default_instance(model: type) -> BaseModel:
+    """
+    Builds a valid instance of a pydantic model: the first choice of every Literal, one item for every list.
+    """
+    return model.model_validate({name: _default_value(field.annotation) for name, field in model.model_fields.items()})
+
+
+def mock_embedding(text: str, dim: int = 64) -> List[float]:
+    """
+    Deterministic bag-of-words embedding, texts sharing words get similar vectors.
+    """
+    vector = [0.0] * dim
+    for word in re.findall(r"\w+", text.lower()):
+        digest = hashlib.md5(word.encode("utf-8")).digest()
+        vector[digest[0] % dim] += 1.0 if digest[1] % 2 else -1.0
+    norm = math.sqrt(sum(v * v for v in vector)) or 1.0
+    return [v / norm for v in vector]
+
+
+@register_embedding_function
+class MockEmbeddingFunction(EmbeddingFunction):
+    """
+    Chroma embedding function computing `mock_embedding` locally, e.g. `Memory(embedding_function=MockEmbeddingFunction())`.
+    """
+
+    def __init__(self, dim: int = 64, space: str = "l2"):
+        self.dim = dim
+        self.space = space
+        self.calls = 0
+
+    def __call__(self, input: Documents) -> Embeddings:
+        self.calls += 1
+        return [mock_embedding(text, self.dim) for text in input]
+
+    @staticmethod
+    def name() -> str:
+        return "mock"
+
+    def get_config(self) -> Dict[str, Any]:
+        return {"dim": self.dim, "space": self.space}
+
+    @staticmethod
+    def build_from_config(config: Dict[str, Any]) -> "MockEmbeddingFunction":
+        return MockEmbeddingFunction(config["dim"], config.get("space", "l2"))
+
+    def default_space(self) -> str:
+        return self.space
+
+
+def _count_tokens(value) -> int:
+    return max(1, len(json.dumps(value, ensure_ascii=False, default=str)) // 4)
+
+
+class _MockBackend:
+    """
+    Builds the responses shared by the sync and async mock clients.
+    """
+
+    def __init__(self, responses, parsed_responses, latency: float, embedding_dim: int):
+        self.responses = list(responses) if isinstance(responses, list) else responses
+        self.parsed_responses = list(parsed_responses) if isinstance(parsed_responses, list) else parsed_responses
+        self.latency = latency
+        self.embedding_dim = embedding_dim
+        self.calls: Dict[str, int] = {"create": 0, "parse": 0, "embeddings": 0}
+        self._lock = threading.Lock()
+
+    def _next(self, scripted, kwargs):
+        if callable(scripted):
+            return scripted(**kwargs)
+        with self._lock:
+            return scripted.pop(0) if scripted else None
+
+    def _count(self, method: str) -> int:
+        with self._lock:
+            self.calls[method] += 1
+            return self.calls[method]
+
+    def create(self, kwargs: Dict):
+        n = self._count("create")
+        response = self._next(self.responses, kwargs)
+        if isinstance(response, (ChatCompletion, list)) or hasattr(response, "__next__"):
+            return response
+        if response is None:
+            response = self._default_response(n, kwargs)
+        if isinstance(response, str):
+            response = {"content": response}
+        tool_calls = [
+            {"id": f"call_{n}_{i}", "type": "function",
+             "function": {"name": t["name"], "arguments": json.dumps(t.get("arguments", {}))}}
+            for i, t in enumerate(response.get("tool_calls") or [])
+        ]
+        if kwargs.get("stream"):
+            return self._build_chunks(n, response.get("content"), tool_calls, kwargs)
+        return ChatCompletion.model_validate({
+            "id": f"mock-{n}", "object": "chat.completion", "created": int(time.time()), "model": kwargs.get("model", "mock"),
+            "choices": [{
+                "index": 0,
+                "finish_reason": "tool_calls" if tool_calls else "stop",
+                "message": {"role": "assistant", "content": response.get("content"), "tool_calls": tool_calls or None},
+            }],
+            "usage": self._build_usage(kwargs, response),
+        })
+
+    def _default_response(self, n: int, kwargs: Dict) -> Dict:
+        tools = kwargs.get("tools")
+        if tools and kwargs.get("tool_choice") == "required":
+            # rotate over the candidates, e.g. the handoff tools of a group
+            return {"tool_calls": [{"name": tools[n % len(tools)]["function"]["name"]}]}
+        return {"content": f"Mock response {n}."}
+
+    def _build_usage(self, kwargs: Dict, response) -> Dict:
+        prompt_tokens = _count_tokens(kwargs.get("messages"))
+        completion_tokens = _count_tokens(response)
+        return {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens, "total_tokens": prompt_tokens + completion_tokens}
+
+    def _build_chunks(self, n: int, content: Optional[str], tool_calls: List[Dict], kwargs: Dict) -> List[ChatCompletionChunk]:
+        def chunk(delta, finish_reason=None, usage=None):
+            return ChatCompletionChunk.model_validate({
+                "id": f"mock-{n}", "object": "chat.completion.chunk", "created": int(time.time()), "model": kwargs.get("model", "mock"),
+                "choices": [] if delta is None else [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+                "usage": usage,
+            })
+        chunks = [chunk({"content": word}) for word in re.findall(r"\S+\s*", content or "")]
+        if tool_calls:
+            chunks.append(chunk({"tool_calls": [dict(tool_call, index=i) for i, tool_call in enumerate(tool_calls)]}))
+        chunks.append(chunk({}, finish_reason="tool_calls" if tool_calls else "stop"))
+        if (kwargs.get("stream_options") or {}).get("include_usage"):
+            chunks.append(chunk(None, usage=self._build_usage(kwargs, {"content": content, "tool_calls": tool_calls})))
+        return chunks
+
+    def parse(self, kwargs: Dict) -> ParsedChatCompletion:
+        n = self._count("parse")
+        response_format = kwargs["response_format"]
+        parsed = self._next(self.parsed_responses, kwargs)
+        if parsed is None:
+            parsed = default_instance(response_format)
+        elif not isinstance(parsed, BaseModel):
+            parsed = response_format.model_validate(parsed)
+        return ParsedChatCompletion[response_format].model_validate({
+            "id": f"mock-{n}", "object": "chat.completion", "created": int(time.time()), "model": kwargs.get("model", "mock"),
+            "choices": [{
+                "index": 0,
+                "finish_reason": "stop",
+                "message": {"role": "assistant", "content": parsed.model_dump_json(), "parsed": parsed},
+            }],
+            "usage": self._build_usage(kwargs, parsed.model_dump()),
+        })
+
+    def embeddings(self, kwargs: Dict) -> CreateEmbeddingResponse:
+        self._count("embeddings")
+        inputs = kwargs["input"] if isinstance(kwargs["input"], list) else [kwargs["input"]]
+        return CreateEmbeddingResponse.model_validate({
+            "object": "list", "model": kwargs.get("model", "mock"),
+            "data": [{"object": "embedding", "index": i, "embedding": mock_embedding(text, self.embedding_dim)} for i, text in enumerate(inputs)],
+            "usage": {"prompt_tokens": _count_tokens(inputs), "total_tokens": _count_tokens(inputs)},
+        })
+
+
+class _Completions:
+    def __init__(self, backend: _MockBackend):
+        self._backend = backend
+
+    def create(self, **kwargs):
+        time.sleep(self._backend.latency)
+        response = self._backend.create(kwargs)
+        return iter(response) if isinstance(response, list) else response
+
+    def parse(self, **kwargs):
+        time.sleep(self._backend.latency)
+        return self._backend.parse(kwargs)
+
+
+class _AsyncCompletions(_Completions):
+    async def create(self, **kwargs):
+        await asyncio.sleep(self._backend.latency)
+        response = self._backend.create(kwargs)
+        if isinstance(response, list):
+            async def stream():
+                for chunk in response:
+                    yield chunk
+            return stream()
+        return response
+
+    async def parse(self, **kwargs):
+        await asyncio.sleep(self._backend.latency)
+        return self._backend.parse(kwargs)
+
+
+class _Embeddings:
+    def __init__(self, backend: _MockBackend):
+        self._backend = backend
+
+    def create(self, **kwargs):
+        time.sleep(self._backend.latency)
+        return self._backend.embeddings(kwargs)
+
+
+class _AsyncEmbeddings(_Embeddings):
+    async def create(self, **kwargs):
+        await asyncio.sleep(self._backend.latency)
+        return self._backend.embeddings(kwargs)
+
+
+class MockOpenAI:
+    """
+    Local stand-in for the OpenAI client, covering `chat.completions.create` (tools, tool_choice, stream),
+    `beta.chat.completions.parse` (pydantic response_format) and `embeddings.create`.
+
+    Args:
+        responses (Union[List, Callable], optional): Scripted replies of `chat.completions.create`, used in order. An item can be a string (content),
+            a dict `{"content": ..., "tool_calls": [{"name": ..., "arguments": {...}}]}` or a ChatCompletion. A callable receives the request arguments
+            and returns such an item. When the script is exhausted (or returns None) the client answers "Mock response N.",
+            or with a call to one of the tools (rotating) if `tool_choice="required"`.
+        parsed_responses (Union[List, Callable], optional): Scripted replies of `parse`, pydantic instances or dicts validated against the response_format.
+            Defaults to a generated instance: the first choice of every Literal and one item for every list.
+        latency (float, optional): Seconds to wait before every response, to emulate the network. Defaults to 0.
+        embedding_dim (int, optional): The dimension of the deterministic bag-of-words embeddings. Defaults to 64.
+
+    Examples:
+        >>> model_client = MockOpenAI(responses=["Hello!", "Goodbye. [=END=]"], latency=0.05)
+        >>> agent = Agent(name="Alice", role="Manager", model_client=model_client)
+        >>> agent.do("Hi")[0].result
+        'Hello!'
+        >>> model_client.calls
+        {'create': 1, 'parse': 0, 'embeddings': 0}
+    """
+
+    def __init__(self,
+                 responses: Union[List, Callable] = None,
+                 parsed_responses: Union[List, Callable] = None,
+                 latency: float = 0.0,
+                 embedding_dim: int = 64):
+        self._backend = _MockBackend(responses, parsed_responses, latency, embedding_dim)
+        completions = self._completions_class(self._backend)
+        self.chat = SimpleNamespace(completions=completions)
+        self.beta = SimpleNamespace(chat=SimpleNamespace(completions=completions))
+        self.embeddings = self._embeddings_class(self._backend)
+
+    _completions_class = _Completions
+    _embeddings_class = _Embeddings
+
+    @property
+    def calls(self) -> Dict[str, int]:
+        return self._backend.calls
+
+
+class AsyncMockOpenAI(MockOpenAI):
+    """
+    Async version of MockOpenAI, standing in for AsyncOpenAI.
+    """
+
+    _completions_class = _AsyncCompletions
+    _embeddings_class = _AsyncEmbeddings
@@ -0,0 +1,101 @@
+# -*- coding: utf-8 -*-
+"""
+@Time: 2026/10/18 10:00
+@Author: ZJun
+@File: prompt_builder.py
+@Description: This file contains the incremental builder of the message history sections of the group prompts.
+"""
+
+from typing import List, Dict, Tuple, Callable, Optional
+from bisect import bisect_left
+
+from src.protocol import Message
+from src.utilities.tokens import count_tokens, truncate_tokens
+
+
+def format_message(message: Message) -> str:
+    return f"```{message.sender}:{message.action}\n{message.result}\n```"
+
+
+class IncrementalPromptBuilder:
+    """
+    Keeps the formatted fragment of every message of a group context and the positions of the messages of every sender.
+
+    Only the messages appended since the previous call are formatted, so building the "own" and "others" sections
+    of the last `cut_off` messages costs O(cut_off) whatever the length of the history.
+    The cache is rebuilt when the context is replaced or truncated.
+
+    With a token budget, the most recent messages are packed until the budget is used up; the token counts
+    of the fragments are cached as well, so packing costs O(messages packed).
+
+    Args:
+        format_message (Callable[[Message], str], optional): Formats a message into its prompt fragment.
+        count_tokens (Callable[[str], int], optional): Counts the tokens of a fragment. Defaults to the offline approximate counter.
+        max_message_tokens (Optional[int], optional): Truncates the result of every message to this number of tokens. Defaults to None meaning no truncation.
+
+    Examples:
+        >>> builder = IncrementalPromptBuilder(max_message_tokens=500)
+        >>> previous_messages, others_messages = builder.split_messages(group_messages.context, send_to="Alice", cut_off=3)
+        >>> previous_messages, others_messages = builder.split_messages(group_messages.context, send_to="Alice", token_budget=4000)
+    """
+
+    def __init__(self,
+                 format_message: Callable[[Message], str] = format_message,
+                 count_tokens: Callable[[str], int] = count_tokens,
+                 max_message_tokens: Optional[int] = None):
+        self.format_message = format_message
+        self.count_tokens = count_tokens
+        self.max_message_tokens = max_message_tokens
+        self._context: Optional[List[Message]] = None
+        self._fragments: List[str] = []
+        self._tokens: List[Optional[int]] = []
+        self._senders: Dict[str, List[int]] = {}
+        self._last_message: Optional[Message] = None
+
+    def sync(self, context: List[Message]) -> None:
+        """
+        Formats the messages appended to the context since the last call.
+        """
+        n = len(self._fragments)
+        if context is not self._context or len(context) < n or (n and context[n - 1] is not self._last_message):
+            self._context = context
+            self._fragments = []
+            self._tokens = []
+            self._senders = {}
+            n = 0
+        for i in range(n, len(context)):
+            message = context[i]
+            if self.max_message_tokens is not None:
+                result = truncate_tokens(str(message.result), self.max_message_tokens, self.count_tokens)
+                if result != message.result:
+                    message = Message(sender=message.sender, action=message.action, result=result)
+            self._fragments.append(self.format_message(message))
+            self._tokens.append(None)
+            self._senders.setdefault(context[i].sender, []).append(i)
+        self._last_message = context[-1] if context else None
+
+    def split_messages(self, context: List[Message], send_to: str, cut_off: Optional[int] = None, token_budget: Optional[int] = None, since: int = 0) -> Tuple[str, str]:
+        """
+        Returns the formatted messages of `send_to` and of the other senders among the last `cut_off` messages (all if None) from position `since`,
+        keeping only the most recent ones fitting in `token_budget` tokens if given (at least the last message).
+        """
+        self.sync(context)
+        start = max(since, len(context) - cut_off) if cut_off else since
+        if token_budget is not None:
+            start = self._budget_start(start, len(context), token_budget)
+        own_positions = self._senders.get(send_to, [])
+        own = own_positions[bisect_left(own_positions, start):]
+        own_set = set(own)
+        previous_messages = "\n\n".join(self._fragments[i] for i in own)
+        others_messages = "\n\n".join(self._fragments[i] for i in range(start, len(context)) if i not in own_set)
+        return previous_messages, others_messages
+
+    def _budget_start(self, start: int, end: int, token_budget: int) -> int:
+        used = 0
+        for i in range(end - 1, start - 1, -1):
+            if self._tokens[i] is None:
+                self._tokens[i] = self.count_tokens(self._fragments[i]) + 1 # the separator
+            used += self._tokens[i]
+            if used > token_budget and i < end - 1:
+                return i + 1
+        return start
@@ -0,0 +1,76 @@
+# -*- coding: utf-8 -*-
+"""
+@Time: 2026/10/18 10:00
+@Author: ZJun
+@File: tokens.py
+@Description: This file contains the offline token counting and truncation used to keep the group prompts within a token budget.
+"""
+
+from typing import Callable, Dict, Optional, Union
+import math
+import re
+
+_TOKEN_PATTERN = re.compile(
+    r"(?P<cjk>[぀-ヿ㐀-䶿一-鿿가-힯豈-﫿])"
+    r"|(?P<word>[^\W\d_]+)"
+    r"|(?P<number>\d+)"
+    r"|(?P<newline>\s*\n\s*)"
+    r"|(?P<space>\s+)"
+    r"|(?P<symbol>.)",
+    re.DOTALL
+)
+
+
+def count_tokens(text: str) -> int:
+    """
+    Approximates the number of tokens of a BPE tokenizer (cl100k/o200k style) without loading any vocabulary:
+    one token per CJK character, punctuation character or line break, one per 5 letters of a word, one per 3 digits of a number.
+    Spaces are merged into the next word like the BPE tokenizers do.
+
+    Any other `Callable[[str], int]`, e.g. `lambda text: len(tiktoken.get_encoding("o200k_base").encode(text))`, can be used instead.
+
+    Examples:
+        >>> count_tokens("Hello, world!")
+        4
+    """
+    tokens = 0
+    for match in _TOKEN_PATTERN.finditer(text):
+        kind = match.lastgroup
+        if kind == "word":
+            tokens += math.ceil(len(match.group()) / 5)
+        elif kind == "number":
+            tokens += math.ceil(len(match.group()) / 3)
+        elif kind != "space":
+            tokens += 1
+    return tokens
+
+
+def truncate_tokens(text: str, max_tokens: int, count_tokens: Callable[[str], int] = count_tokens, suffix: str = " ...[truncated]") -> str:
+    """
+    Truncates the text to at most `max_tokens` tokens, `suffix` included, keeping the longest prefix. Returns the text unchanged if it fits.
+    """
+    if count_tokens(text) <= max_tokens:
+        return text
+    max_tokens -= count_tokens(suffix)
+    low, high = 0, len(text)
+    while low < high:
+        middle = (low + high + 1) // 2
+        if count_tokens(text[:middle]) <= max_tokens:
+            low = middle
+        else:
+            high = middle - 1
+    return text[:low].rstrip() + suffix
+
+
+def resolve_token_budget(token_budget: Union[int, Dict[str, int], None], model: Optional[str] = None) -> Optional[int]:
+    """
+    Returns the token budget of the model: `token_budget` itself if an int, else the entry of the model
+    (or the longest model name prefix, e.g. "gpt-4o" for "gpt-4o-2024-08-06") falling back to the "default" entry.
+    """
+    if token_budget is None or isinstance(token_budget, int):
+        return token_budget
+    if model is not None:
+        prefixes = [name for name in token_budget if model.startswith(name)]
+        if prefixes:
+            return token_budget[max(prefixes, key=len)]
+    return token_budget.get("default")
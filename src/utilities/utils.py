@@ -8,6 +8,11 @@
 
 
 import inspect
+import asyncio
+from typing import Optional
+from openai.types.chat import ChatCompletion, ChatCompletionMessage, ChatCompletionMessageToolCall
+from openai.types.chat.chat_completion import Choice
+from openai.types.chat.chat_completion_message_tool_call import Function
 
 def function_to_schema(func) -> dict:
     type_map = {
@@ -52,4 +57,80 @@ def function_to_schema(func) -> dict:
                 "required": required,
             },
         },
-    }
\ No newline at end of file
+    }
+
+def is_async_callable(func) -> bool:
+    """
+    Returns True if calling func returns an awaitable, e.g. the methods of an AsyncOpenAI client.
+    """
+    return inspect.iscoroutinefunction(inspect.unwrap(func))
+
+def is_async_client(model_client) -> bool:
+    """
+    Returns True if the model client exposes an async (AsyncOpenAI style) chat completions API.
+    """
+    return model_client is not None and is_async_callable(model_client.chat.completions.create)
+
+async def acall(func, *args, **kwargs):
+    """
+    Calls a sync or async function from a coroutine without blocking the event loop.
+
+    Async functions are awaited directly, sync functions are run in a worker thread.
+    """
+    if is_async_callable(func):
+        return await func(*args, **kwargs)
+    return await asyncio.to_thread(func, *args, **kwargs)
+
+
+class ChatCompletionStreamAccumulator:
+    """
+    Accumulates the chunks of a streamed chat completion (`stream=True`) into a regular ChatCompletion.
+
+    Examples:
+        >>> accumulator = ChatCompletionStreamAccumulator()
+        >>> for chunk in model_client.chat.completions.create(..., stream=True):
+        ...     if delta := accumulator.add(chunk):
+        ...         print(delta, end="")
+        >>> completion = accumulator.to_completion()
+    """
+    def __init__(self):
+        self.content = []
+        self.tool_calls = {}
+        self.usage = None
+        self.finish_reason = None
+
+    def add(self, chunk) -> Optional[str]:
+        """
+        Adds a chunk and returns its content delta, if any.
+        """
+        if getattr(chunk, "usage", None):
+            self.usage = chunk.usage
+        if not chunk.choices:
+            return None
+        choice = chunk.choices[0]
+        if choice.finish_reason:
+            self.finish_reason = choice.finish_reason
+        for tool_call in choice.delta.tool_calls or []:
+            entry = self.tool_calls.setdefault(tool_call.index, {"id": None, "name": "", "arguments": ""})
+            if tool_call.id:
+                entry["id"] = tool_call.id
+            if tool_call.function and tool_call.function.name:
+                entry["name"] += tool_call.function.name
+            if tool_call.function and tool_call.function.arguments:
+                entry["arguments"] += tool_call.function.arguments
+        if choice.delta.content:
+            self.content.append(choice.delta.content)
+            return choice.delta.content
+        return None
+
+    def to_completion(self) -> ChatCompletion:
+        tool_calls = [
+            ChatCompletionMessageToolCall(id=entry["id"], type="function", function=Function(name=entry["name"], arguments=entry["arguments"]))
+            for _, entry in sorted(self.tool_calls.items())
+        ]
+        message = ChatCompletionMessage(role="assistant", content="".join(self.content) if self.content else None, tool_calls=tool_calls or None)
+        return ChatCompletion.model_construct(
+            choices=[Choice.model_construct(index=0, message=message, finish_reason=self.finish_reason or "stop")],
+            usage=self.usage,
+            object="chat.completion",
+        )
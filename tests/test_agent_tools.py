@@ -0,0 +1,197 @@
+import asyncio
+import threading
+import time
+import pytest
+from concurrent.futures import ThreadPoolExecutor
+from openai.types.chat import ChatCompletion
+from src.utilities.mock_client import MockOpenAI, AsyncMockOpenAI
+from src.agent import Agent
+
+# export PYTHONPATH=$(pwd)
+
+class Tracker:
+    """Sleeping tool recording how many calls run at the same time."""
+
+    def __init__(self):
+        self.running = 0
+        self.max_running = 0
+        self.lock = threading.Lock()
+
+    def __call__(self, seconds: float) -> str:
+        with self.lock:
+            self.running += 1
+            self.max_running = max(self.max_running, self.running)
+        time.sleep(seconds)
+        with self.lock:
+            self.running -= 1
+        return f"slept {seconds}"
+
+def tool_calls(*calls):
+    return {"tool_calls": [{"name": name, "arguments": arguments} for name, arguments in calls]}
+
+def build_agent(client_class, responses, tools, **kwargs):
+    return Agent(name="Alice", role="Engineer", model_client=client_class(responses=responses), tools=tools, **kwargs)
+
+async def arun(agent, message="Go."):
+    return [m async for m in await agent.ado(message, keep_memory=False, stream=True) if m.action != "talk_chunk"]
+
+def run(agent, message="Go."):
+    """Returns the tool_call messages and the final talk message of a turn."""
+    if isinstance(agent.model_client, AsyncMockOpenAI):
+        return asyncio.run(arun(agent, message))
+    return [m for m in agent.do(message, keep_memory=False, stream=True) if m.action != "talk_chunk"]
+
+@pytest.mark.parametrize("client_class", [MockOpenAI, AsyncMockOpenAI])
+def test_tool_results_keep_call_order(client_class):
+    def sleep(seconds: float) -> str:
+        time.sleep(seconds)
+        return f"slept {seconds}"
+    agent = build_agent(client_class, [tool_calls(("sleep", {"seconds": 0.1}), ("sleep", {"seconds": 0.0}), ("sleep", {"seconds": 0.05})), "Done."], [sleep])
+    response = run(agent)
+    assert [m.action for m in response] == ["tool_call", "tool_call", "tool_call", "talk"]
+    assert ["slept 0.1" in response[0].result, "slept 0.0" in response[1].result, "slept 0.05" in response[2].result] == [True, True, True]
+
+@pytest.mark.parametrize("client_class", [MockOpenAI, AsyncMockOpenAI])
+def test_tool_timeout_and_error(client_class):
+    def slow() -> str:
+        time.sleep(0.5)
+        return "too late"
+    def broken() -> str:
+        raise RuntimeError("boom")
+    def fast() -> str:
+        return "fast"
+    agent = build_agent(client_class, [tool_calls(("slow", {}), ("broken", {}), ("fast", {})), "Done."], [slow, broken, fast], tool_timeout=0.1)
+    async def timed_arun():
+        start = time.time()
+        return await arun(agent), time.time() - start
+    if client_class is AsyncMockOpenAI:
+        # asyncio.run waits for the timed out worker thread on exit, only the turn is timed
+        response, elapsed = asyncio.run(timed_arun())
+    else:
+        start = time.time()
+        response, elapsed = run(agent), time.time() - start
+    assert elapsed < 0.4
+    assert "did not respond within 0.1 seconds" in response[0].result
+    assert "RuntimeError: boom" in response[1].result
+    assert "'fast'" in response[2].result
+    assert response[-1].result == "Done."
+
+@pytest.mark.parametrize("client_class", [MockOpenAI, AsyncMockOpenAI])
+def test_malformed_tool_arguments(client_class):
+    malformed = ChatCompletion.model_validate({
+        "id": "malformed", "object": "chat.completion", "created": 0, "model": "mock",
+        "choices": [{"index": 0, "finish_reason": "tool_calls", "message": {"role": "assistant", "content": None, "tool_calls": [
+            {"id": "call_0", "type": "function", "function": {"name": "greet", "arguments": '{"name": "Bob"'}},
+            {"id": "call_1", "type": "function", "function": {"name": "greet", "arguments": '{"name": "Carol"}'}},
+        ]}}],
+    })
+    requests = []
+    def respond(**kwargs):
+        requests.append(list(kwargs["messages"]))
+        return malformed if len(requests) == 1 else "Done."
+    agent = build_agent(client_class, respond, [greet], tool_timeout=1)
+    response = asyncio.run(agent.ado("Go.", keep_memory=False)) if client_class is AsyncMockOpenAI else agent.do("Go.", keep_memory=False)
+    assert response[-1].result == "Done."
+    # the malformed call gets an error tool message, the other call runs
+    first, second = requests[-1][-2:]
+    assert first["tool_call_id"] == "call_0" and first["content"].startswith("No result, the tool raised JSONDecodeError")
+    assert second == {"role": "tool", "tool_call_id": "call_1", "content": "Hello, Carol!"}
+
+def test_tool_timeout_with_concurrency_cap():
+    release = threading.Event()
+    def hang() -> str:
+        release.wait(3)
+        return "too late"
+    def fast() -> str:
+        return "fast"
+    calls = iter([tool_calls(("hang", {}), ("fast", {})), tool_calls(("fast", {}))])
+    def respond(**kwargs):
+        return "Done." if kwargs["messages"][-1]["role"] == "tool" else next(calls)
+    agent = build_agent(MockOpenAI, respond, [hang, fast], tool_timeout=0.2, max_tool_concurrency=1)
+    try:
+        start = time.time()
+        response = run(agent)
+        assert time.time() - start < 1
+        assert "did not respond within 0.2 seconds" in response[0].result
+        assert response[-1].result == "Done."
+        # the hanging tool does not keep the only slot, the next turn runs its tool
+        start = time.time()
+        response = run(agent)
+        assert time.time() - start < 1
+        assert "'fast'" in response[0].result
+    finally:
+        release.set()
+
+def test_tool_concurrency_cap_is_agent_wide():
+    tracker = Tracker()
+    def sleep(seconds: float) -> str:
+        return tracker(seconds)
+    calls = tool_calls(*[("sleep", {"seconds": 0.05})] * 4)
+    def respond(**kwargs):
+        return "Done." if kwargs["messages"][-1]["role"] == "tool" else calls
+    agent = build_agent(MockOpenAI, respond, [sleep], max_tool_concurrency=3)
+    # several turns of the agent at the same time, e.g. concurrent group steps
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        responses = list(executor.map(lambda _: run(agent), range(4)))
+    assert all(len(response) == 5 for response in responses)
+    assert tracker.max_running == 3
+
+def test_async_tool_concurrency_cap_is_agent_wide():
+    tracker = Tracker()
+    async def sleep(seconds: float) -> str:
+        return await asyncio.to_thread(tracker, seconds)
+    calls = tool_calls(*[("sleep", {"seconds": 0.05})] * 4)
+    def respond(**kwargs):
+        return "Done." if kwargs["messages"][-1]["role"] == "tool" else calls
+    agent = build_agent(AsyncMockOpenAI, respond, [sleep], max_tool_concurrency=3)
+    async def turns():
+        return await asyncio.gather(*[arun(agent) for _ in range(4)])
+    assert all(len(response) == 5 for response in asyncio.run(turns()))
+    assert tracker.max_running == 3
+
+
+class ToolLoop:
+    """Always asks for a tool call, records the requests."""
+
+    def __init__(self, content=None):
+        self.content = content
+        self.requests = []
+
+    def __call__(self, **kwargs):
+        self.requests.append(dict(kwargs, messages=list(kwargs["messages"])))
+        return {"content": self.content, **tool_calls(("greet", {"name": "Bob"}))}
+
+def greet(name: str) -> str:
+    return f"Hello, {name}!"
+
+@pytest.mark.parametrize("client_class", [MockOpenAI, AsyncMockOpenAI])
+@pytest.mark.parametrize("content", [None, "Bob has been greeted."])
+def test_max_tool_iterations(client_class, content):
+    loop = ToolLoop(content)
+    agent = build_agent(client_class, loop, [greet], max_tool_iterations=2)
+    response = run(agent)
+    # two rounds of tools, then the model must answer, the tool calls it still requests are ignored
+    assert [m.action for m in response] == ["tool_call", "tool_call", "talk"]
+    assert [r["tool_choice"] for r in loop.requests] == [None, None, "none"]
+    assert response[-1].result == (content or "No answer, Alice kept calling tools after the tool budget was used up")
+
+def test_tool_token_budget():
+    loop = ToolLoop()
+    agent = build_agent(MockOpenAI, loop, [greet], tool_token_budget=1)
+    response = run(agent)
+    assert [m.action for m in response] == ["tool_call", "talk"]
+    assert [r["tool_choice"] for r in loop.requests] == [None, "none"]
+    assert response[-1].result is not None
+
+def test_tool_message_shape():
+    loop = ToolLoop()
+    agent = build_agent(MockOpenAI, loop, [greet], max_tool_iterations=1)
+    run(agent)
+    assistant, tool = loop.requests[-1]["messages"][-2:]
+    assert assistant["role"] == "assistant"
+    assert assistant["tool_calls"][0]["function"] == {"name": "greet", "arguments": '{"name": "Bob"}'}
+    assert tool == {"role": "tool", "tool_call_id": assistant["tool_calls"][0]["id"], "content": "Hello, Bob!"}
+
+
+# Run the tests by executing the following command:
+# pytest tests/test_agent_tools.py
@@ -0,0 +1,99 @@
+import time
+import asyncio
+import pytest
+from pydantic import BaseModel
+from openai.types.chat import ChatCompletion
+from src.utilities.cache import CompletionCache, LRUCache, SQLiteCache, CachedModelClient
+
+# export PYTHONPATH=$(pwd)
+
+def completion(content):
+    return ChatCompletion.model_validate({
+        "id": "test", "object": "chat.completion", "created": 0, "model": "test-model",
+        "choices": [{"index": 0, "finish_reason": "stop", "message": {"role": "assistant", "content": content}}],
+    })
+
+class Answer(BaseModel):
+    answer: str
+
+class Completions:
+    def __init__(self):
+        self.calls = 0
+
+    def create(self, **kwargs):
+        self.calls += 1
+        return completion(f"reply {self.calls}")
+
+class AsyncCompletions(Completions):
+    async def create(self, **kwargs):
+        return Completions.create(self, **kwargs)
+
+class Client:
+    def __init__(self, completions):
+        self.chat = type("Chat", (), {"completions": completions})()
+        self.beta = type("Beta", (), {"chat": self.chat})()
+
+@pytest.fixture(params=["lru", "sqlite"])
+def cache(request, tmp_path):
+    if request.param == "lru":
+        return LRUCache(max_size=2)
+    return SQLiteCache(str(tmp_path / "cache.db"), max_size=2)
+
+def test_cache_eviction(cache):
+    cache.set("a", "1")
+    cache.set("b", "2")
+    assert cache.get("a") == "1"
+    cache.set("c", "3")  # evicts "b", the least recently used entry
+    assert cache.get("b") is None
+    assert cache.get("c") == "3"
+    assert len(cache) == 2
+    assert cache.stats()["hits"] == 2
+    assert cache.stats()["misses"] == 1
+
+def test_cache_ttl():
+    cache = LRUCache(ttl=0.05)
+    cache.set("a", "1")
+    time.sleep(0.1)
+    assert cache.get("a") is None
+
+def test_incomplete_cache_backend():
+    class DictCache(CompletionCache):
+        def _get(self, key):
+            return None
+        def _set(self, key, value):
+            pass
+    with pytest.raises(TypeError):
+        DictCache() # _clear and __len__ are missing
+
+def test_sqlite_cache_persists(tmp_path):
+    SQLiteCache(str(tmp_path / "cache.db")).set("a", "1")
+    assert SQLiteCache(str(tmp_path / "cache.db")).get("a") == "1"
+
+def test_cached_model_client_deterministic_calls():
+    completions = Completions()
+    client = CachedModelClient(Client(completions))
+    messages = [{"role": "user", "content": "hi"}]
+    first = client.chat.completions.create(model="m", messages=messages, temperature=0.0)
+    second = client.chat.completions.create(model="m", messages=messages, temperature=0.0)
+    assert completions.calls == 1
+    assert first.choices[0].message.content == second.choices[0].message.content
+    # sampled calls are not cached
+    client.chat.completions.create(model="m", messages=messages, temperature=1.0)
+    client.chat.completions.create(model="m", messages=messages, temperature=1.0)
+    assert completions.calls == 3
+    assert client.cache.stats()["hits"] == 1
+
+def test_cached_async_model_client():
+    completions = AsyncCompletions()
+    client = CachedModelClient(Client(completions))
+    messages = [{"role": "user", "content": "hi"}]
+
+    async def run():
+        await client.chat.completions.create(model="m", messages=messages, temperature=0.0)
+        return await client.chat.completions.create(model="m", messages=messages, temperature=0.0)
+
+    assert asyncio.run(run()).choices[0].message.content == "reply 1"
+    assert completions.calls == 1
+
+# Run the tests by executing the following command:
+# pytest tests/test_cache.py
@@ -0,0 +1,321 @@
+import asyncio
+import time
+import pytest
+from collections import namedtuple
+from src.utilities.mock_client import MockOpenAI, AsyncMockOpenAI
+from src.protocol import Env, Message
+from src.agent import Agent
+from src.group import Group
+from src.speaker_selector import SpeakerSelector
+from src.group_planner import InTransitRevisionPolicy
+
+# export PYTHONPATH=$(pwd)
+
+class Responder:
+    """Answers the summarizer with a numbered summary, the agents with a long reply, and records the agent prompts."""
+
+    def __init__(self):
+        self.prompts = []
+        self.folds = 0
+
+    def __call__(self, **kwargs):
+        if kwargs.get("tool_choice") == "required":
+            return None
+        system = kwargs["messages"][0]["content"]
+        if "running summary" in system:
+            self.folds += 1
+            return f"Summary {self.folds}."
+        self.prompts.append(kwargs["messages"][-1]["content"])
+        return "A long reply " + "with many words " * 20
+
+def build_group(client_class, responder, **kwargs):
+    model_client = client_class(responses=responder)
+    members = [Agent(name=name, role="Engineer", model_client=model_client) for name in ["Alice", "Bob", "Carol"]]
+    return Group(env=Env(description="A small team.", members=members), model_client=model_client, **kwargs)
+
+def test_rolling_summary_bounds_prompts():
+    responder = Responder()
+    group = build_group(MockOpenAI, responder, summarize_every=5, summary_keep_recent=3)
+    group.user_input("Let's discuss the design.")
+    for _ in range(40):
+        group.call_agent(message_cut_off=None)
+
+    assert responder.folds == 7
+    assert group.group_messages.summary == "Summary 7."
+    assert len(group.group_messages.context) - group.group_messages.summarized_until < 3 + 5
+    assert "### Summary of Earlier Messages\nSummary 7." in responder.prompts[-1]
+    # without a summary the prompts grow with the history, with it they stay bounded
+    assert max(len(p) for p in responder.prompts[10:]) < 2 * len(responder.prompts[8])
+    assert "Summary 7." in str(group._build_group_messages_record())
+
+    group.reset_group_messages()
+    assert group.group_messages.summary is None and group.group_messages.summarized_until == 0
+
+def test_rolling_summary_async():
+    responder = Responder()
+    group = build_group(AsyncMockOpenAI, responder, summarize_every=4, summary_keep_recent=2)
+
+    async def run():
+        group.user_input("Let's discuss the design.")
+        for _ in range(12):
+            await group.acall_agent(message_cut_off=None)
+
+    asyncio.run(run())
+    assert responder.folds == 2
+    assert group.group_messages.summarized_until == 8
+
+def test_token_budget_bounds_prompts():
+    responder = Responder()
+    group = build_group(MockOpenAI, responder, context_token_budget={"gpt-4o-mini": 300, "default": 10000}, max_message_tokens=50)
+    group.user_input("Let's discuss the design.")
+    for _ in range(30):
+        group.call_agent(message_cut_off=None)
+    assert max(len(p) for p in responder.prompts) < 3 * len(responder.prompts[2])
+
+
+@pytest.mark.parametrize("max_concurrency", [1, 5])
+def test_dismiss_group_concurrently(max_concurrency):
+    model_client = MockOpenAI(responses=lambda **kwargs: "Takeaway for " + kwargs["messages"][-1]["content"].split("from ")[-1].split("'s viewpoint")[0], latency=0.05)
+    members = [Agent(name=f"agent{i}", role="Engineer", model_client=model_client) for i in range(5)]
+    group = Group(env=Env(description="A small team.", members=members), model_client=model_client)
+    group.user_input("Hello everyone.")
+
+    start = time.perf_counter()
+    takeaways = group.dismiss_group(max_concurrency=max_concurrency)
+    elapsed = time.perf_counter() - start
+
+    assert {name: t["takeaway"] for name, t in takeaways.items()} == {f"agent{i}": f"Takeaway for agent{i}" for i in range(5)}
+    assert model_client.calls["create"] == 5
+    assert group.env.members == [] and group.members_map == {}
+    assert elapsed < 0.2 if max_concurrency == 5 else elapsed >= 0.25
+
+def test_dismiss_group_multi_view():
+    def parse(**kwargs):
+        return {"takeaways": [{"member_name": name, "takeaway": f"I am {name}."} for name in ["agent0", "agent1"]]}
+    model_client = AsyncMockOpenAI(responses=["I am agent2."], parsed_responses=parse)
+    members = [Agent(name=f"agent{i}", role="Engineer", model_client=model_client) for i in range(3)]
+    group = Group(env=Env(description="A small team.", members=members), model_client=model_client)
+    group.user_input("Hello everyone.")
+
+    takeaways = asyncio.run(group.adismiss_group(multi_view=True))
+    # one structured call, the member missing from it is summarized on its own
+    assert {name: t["takeaway"] for name, t in takeaways.items()} == {f"agent{i}": f"I am agent{i}." for i in range(3)}
+    assert model_client.calls == {"create": 1, "parse": 1, "embeddings": 0}
+
+
+def test_speaker_selector_tiers():
+    selector = SpeakerSelector(min_observations=3, confidence=0.8)
+    said = lambda sender, text: [Message(sender=sender, action="talk", result=text)]
+    assert selector.select(["Alice", "Bob"], said("user", "bob, what do you think?")) == "Bob"
+    assert selector.select(["Alice", "Bob"], said("user", "Alice and Bob, hello.")) is None
+    assert selector.select(["Alice", "Bob"], said("user", "Alice, ask @Bob.")) == "Bob"
+    assert selector.select(["Alice", "Bob"], said("Alice", "I am Alice.")) is None # own name
+    # names mentioned in passing do not address anyone
+    assert selector.select(["Alice", "Bob"], said("user", "Alice said she'd handle it.")) is None
+    assert selector.select(["Alice", "Bob"], said("user", "I agree with Bob, let's go.")) is None
+    assert selector.select(["Alice", "Bob"], said("user", "Alice: please start.")) == "Alice"
+    assert selector.select(["Bob"], said("Alice", "Next.")) == "Bob"
+    for _ in range(3):
+        selector.record("Alice", "Bob")
+    assert selector.select(["Bob", "Carol"], said("Alice", "Next.")) == "Bob"
+    assert selector.select(["Alice", "Carol"], said("Alice", "Next.")) is None
+    assert selector.stats() == {"mention": 3, "heuristic": 2, "llm": 3, "avoided": 5, "avoided_rate": 5 / 8}
+
+def test_fast_speaker_selection_avoids_model_calls():
+    model_client = MockOpenAI()
+    members = [Agent(name=name, role="Engineer", model_client=model_client) for name in ["Alice", "Bob", "Carol"]]
+    group = Group(env=Env(description="A small team.", members=members), model_client=model_client, fast_speaker_selection=True)
+
+    group.user_input("Carol, what do you think?")
+    group.call_agent()
+    assert group.current_agent == "Carol"
+    assert model_client.calls["create"] == 1 # the reply only
+
+    group.user_input("Any other opinion?")
+    group.call_agent()
+    assert model_client.calls["create"] > 2 # handoff by the model, then the reply
+    assert group.speaker_selector.stats()["mention"] == 1 and group.speaker_selector.stats()["llm"] == 1
+
+def test_fast_speaker_selection_without_related_agents():
+    model_client = MockOpenAI()
+    members = [Agent(name=name, role="Engineer", model_client=model_client) for name in ["Alice", "Bob"]]
+    group = Group(env=Env(description="A small team.", members=members, relationships={"Bob": ["Alice"]}), model_client=model_client, fast_speaker_selection=True)
+    group.set_current_agent("Alice")
+    assert group.handoff() == "Alice"
+    # Alice can only keep the turn, neither the model nor the selector decides
+    assert model_client.calls["create"] == 0
+    assert group.speaker_selector.stats()["avoided"] == 0 and group.speaker_selector.stats()["llm"] == 0
+
+
+def test_topology_cache_invalidated_by_membership_changes():
+    model_client = MockOpenAI()
+    members = [Agent(name=name, role="Engineer", model_client=model_client) for name in ["Alice", "Bob"]]
+    group = Group(env=Env(description="A small team.", members=members), model_client=model_client)
+    group._task_auto("Build it.", with_plan_revise=False, with_in_transit_revise=False) # creates the planner
+
+    tools = group._build_current_agent_handoff_tools(True)
+    assert group._build_current_agent_handoff_tools(True) is tools
+    assert group._build_members_description() is group._build_members_description()
+    version = group._topology_version
+
+    group.add_member(Agent(name="Carol", role="Designer", model_client=model_client))
+    assert group._topology_version == version + 1
+    assert [t["function"]["name"] for t in group._build_current_agent_handoff_tools(True)] == ["Alice", "Bob", "Carol"]
+    assert "Carol (Designer)" in group._build_members_description(with_tools=False)
+    assert "Carol (Designer)" in group.planner._build_members_description()
+
+    group.delete_member("Bob")
+    assert [t["function"]["name"] for t in group._build_current_agent_handoff_tools(False)] == ["Carol"]
+    assert "Bob" not in group._build_members_description() and "Bob" not in group.planner._build_members_description()
+
+
+def test_relationships_updated_incrementally():
+    model_client = MockOpenAI()
+    members = [Agent(name=name, role="Engineer", model_client=model_client) for name in ["Alice", "Bob", "Carol"]]
+    group = Group(env=Env(description="A small team.", members=members, relationships=[("Alice", "Bob"), ("Bob", "Carol")]), model_client=model_client)
+    assert group.env.relationships.to_dict() == {"Alice": ["Bob"], "Bob": ["Alice", "Carol"], "Carol": ["Bob"]}
+
+    group.add_member(Agent(name="Dave", role="Designer", model_client=model_client), relation=[("Dave", "Alice"), ("Carol", "Dave")])
+    assert group.env.relationships["Dave"] == ["Alice"] and group.env.relationships["Carol"] == ["Bob", "Dave"]
+
+    group._remove_member("Bob")
+    assert group.env.relationships.to_dict() == {"Alice": [], "Carol": ["Dave"], "Dave": ["Alice"]}
+    assert "Bob" not in group._build_group_messages_record()["env"]["relationships"]
+
+
+@pytest.mark.parametrize("client_class", [MockOpenAI, AsyncMockOpenAI])
+def test_speculative_planning(client_class):
+    plan = [{"agent_name": "Alice", "task": "Write the brief.", "receive_information_from": []},
+            {"agent_name": "Bob", "task": "Draw the sketch.", "receive_information_from": []},
+            {"agent_name": "Carol", "task": "Review the brief.", "receive_information_from": ["Alice"]}]
+    revised_plan = [dict(plan[0]), dict(plan[1], task="Draw two sketches."), dict(plan[2])]
+    tasks_done = []
+
+    def respond(**kwargs):
+        prompt = kwargs["messages"][-1]["content"]
+        if "### Current Task" not in prompt:
+            return "Looks good." # feedback on the plan
+        task = prompt.split("### Current Task\n```\n")[1].split("\n```")[0]
+        tasks_done.append(task)
+        return f"Done: {task}"
+
+    model_client = client_class(responses=respond, parsed_responses=lambda **kwargs: {"tasks": revised_plan if "### Feedbacks" in kwargs["messages"][-1]["content"] else plan}, latency=0.02)
+    members = [Agent(name=name, role="Engineer", model_client=model_client) for name in ["Alice", "Bob", "Carol"]]
+    group = Group(env=Env(description="A small team.", members=members), model_client=model_client)
+    kwargs = dict(strategy="auto", with_in_transit_revise=False, speculative_planning=True)
+    response = asyncio.run(group.atask("Design a bicycle.", **kwargs)) if client_class is AsyncMockOpenAI else group.task("Design a bicycle.", **kwargs)
+
+    assert response[0].result == "Done: Review the brief."
+    # the brief written during the revision is kept, the first sketch is dropped and the revised one done
+    assert sorted(tasks_done) == ["Draw the sketch.", "Draw two sketches.", "Review the brief.", "Write the brief."]
+    assert [m.result for m in group.group_messages.context if m.sender == "Bob"] == ["Done: Draw two sketches."]
+    assert [m.result for m in group.group_messages.context if m.sender == "Alice"] == ["Done: Write the brief."]
+
+
+def test_in_transit_revision_policy():
+    policy = InTransitRevisionPolicy(min_length=10, max_length=100, every_k_steps=3)
+    assert not policy.should_revise(0, [Message(sender="Alice", action="talk", result="The brief is written.")])
+    assert policy.should_revise(0, [Message(sender="Alice", action="talk", result="Too short")])
+    assert policy.should_revise(0, [Message(sender="Alice", action="talk", result="x" * 101)])
+    assert policy.should_revise(0, [Message(sender="Alice", action="talk", result="Sorry, I was unable to finish.")])
+    assert policy.should_revise(2, [Message(sender="Alice", action="talk", result="The brief is written.")])
+
+
+@pytest.mark.parametrize("client_class", [MockOpenAI, AsyncMockOpenAI])
+@pytest.mark.parametrize("background", [False, True])
+def test_conditional_in_transit_revision(client_class, background):
+    plan = [{"agent_name": "Alice", "task": "Write the brief.", "receive_information_from": []},
+            {"agent_name": "Bob", "task": "Draw the sketch.", "receive_information_from": ["Alice"]},
+            {"agent_name": "Carol", "task": "Review the brief.", "receive_information_from": ["Bob"]}]
+    revised_steps = []
+
+    def respond(**kwargs):
+        prompt = kwargs["messages"][-1]["content"]
+        if "### Current Task" not in prompt:
+            return "Looks good." # feedback on the plan
+        task = prompt.split("### Current Task\n```\n")[1].split("\n```")[0]
+        if task == "Draw the sketch.":
+            return "Sorry, the sketch failed."
+        return f"Done: {task} with all the details needed."
+
+    def parse(**kwargs):
+        prompt = kwargs["messages"][-1]["content"]
+        if "### Decision Point" not in prompt:
+            return {"tasks": plan}
+        current_task = prompt.split("### Current Task Details\n```\n")[1].split("\n```")[0]
+        revised_steps.append(current_task)
+        return {"tasks": [{"agent_name": "Bob", "task": "Fix the sketch.", "receive_information_from": []}]}
+
+    model_client = client_class(responses=respond, parsed_responses=parse)
+    members = [Agent(name=name, role="Engineer", model_client=model_client) for name in ["Alice", "Bob", "Carol"]]
+    group = Group(env=Env(description="A small team.", members=members), model_client=model_client)
+    kwargs = dict(strategy="auto", with_plan_revise=False, with_in_transit_revise=InTransitRevisionPolicy(background=background))
+    response = asyncio.run(group.atask("Design a bicycle.", **kwargs)) if client_class is AsyncMockOpenAI else group.task("Design a bicycle.", **kwargs)
+
+    # only the failed step is revised, its extra task is done
+    assert revised_steps == ["Draw the sketch."]
+    assert [m.result for m in group.group_messages.context if m.sender == "Bob"] == ["Sorry, the sketch failed.", "Done: Fix the sketch. with all the details needed."]
+    assert response[0].result == "Done: Review the brief. with all the details needed."
+
+
+def test_build_task_dependencies():
+    Task = namedtuple("Task", ["agent_name", "task", "receive_information_from"])
+    tasks = [Task("Alice", "a", []), Task("Bob", "b", []), Task("Alice", "c", []), Task("Carol", "d", ["Alice", "Bob"]), Task("Bob", "e", ["Dave"])]
+    assert Group._build_task_dependencies(tasks) == [set(), set(), {0}, {1, 2}, {1}]
+
+
+@pytest.mark.parametrize("client_class", [MockOpenAI, AsyncMockOpenAI])
+@pytest.mark.parametrize("max_concurrency", [1, 2, 3])
+def test_task_dag_scheduling(client_class, max_concurrency):
+    names = ["Alice", "Bob", "Carol", "Dave", "Erin"]
+    plan = [{"agent_name": name, "task": f"Part of {name}.", "receive_information_from": []} for name in names[:4]]
+    plan.append({"agent_name": "Erin", "task": "Merge the parts.", "receive_information_from": ["Alice", "Bob"]})
+    latency = 0.05
+    finished, prompts = {}, {}
+
+    def respond(**kwargs):
+        # called once the latency of the request is over
+        prompt = kwargs["messages"][-1]["content"]
+        task = prompt.split("### Current Task\n```\n")[1].split("\n```")[0]
+        finished[task], prompts[task] = time.monotonic(), prompt
+        return f"Done: {task}"
+
+    model_client = client_class(responses=respond, parsed_responses=[{"tasks": plan}], latency=latency)
+    members = [Agent(name=name, role="Engineer", model_client=model_client) for name in names]
+    group = Group(env=Env(description="A small team.", members=members), model_client=model_client)
+    kwargs = dict(strategy="auto", with_plan_revise=False, with_in_transit_revise=False, max_concurrency=max_concurrency)
+    response = asyncio.run(group.atask("Build it.", **kwargs)) if client_class is AsyncMockOpenAI else group.task("Build it.", **kwargs)
+
+    assert response[0].result == "Done: Merge the parts."
+    assert group.current_agent == "Erin"
+    # the dependent step waits for its prerequisites and receives their results
+    started = {task: end - latency for task, end in finished.items()}
+    assert started["Merge the parts."] >= max(finished["Part of Alice."], finished["Part of Bob."]) - 0.01
+    assert "Done: Part of Alice." in prompts["Merge the parts."] and "Done: Part of Bob." in prompts["Merge the parts."]
+    # the independent steps overlap, never more than max_concurrency at a time
+    running_at = lambda moment: sum(started[task] <= moment < finished[task] for task in finished)
+    assert max(running_at(started[task] + 0.01) for task in finished) == max_concurrency
+
+
+def test_task_current_agent_is_final_step_agent():
+    plan = [{"agent_name": "Alice", "task": "Slow part.", "receive_information_from": []},
+            {"agent_name": "Carol", "task": "Review the slow part.", "receive_information_from": ["Alice"]},
+            {"agent_name": "Bob", "task": "Fast part.", "receive_information_from": []}]
+
+    def respond(**kwargs):
+        task = kwargs["messages"][-1]["content"].split("### Current Task\n```\n")[1].split("\n```")[0]
+        if task == "Slow part.":
+            time.sleep(0.1) # the review starts and finishes after the final step
+        return f"Done: {task}"
+
+    model_client = MockOpenAI(responses=respond, parsed_responses=[{"tasks": plan}])
+    members = [Agent(name=name, role="Engineer", model_client=model_client) for name in ["Alice", "Bob", "Carol"]]
+    group = Group(env=Env(description="A small team.", members=members), model_client=model_client)
+    response = group.task("Build it.", strategy="auto", with_plan_revise=False, with_in_transit_revise=False, max_concurrency=2)
+    assert response[0].result == "Done: Fast part."
+    assert group.group_messages.context[-1].result == "Done: Review the slow part."
+    assert group.current_agent == "Bob"
+
+
+# Run the tests by executing the following command:
+# pytest tests/test_group.py
@@ -0,0 +1,38 @@
+import pytest
+from concurrent.futures import ThreadPoolExecutor
+from src.utilities.mock_client import MockOpenAI
+from src.protocol import Env
+from src.agent import Agent
+from src.group_planner import GroupPlanner, build_tasks_model
+
+# export PYTHONPATH=$(pwd)
+
+@pytest.fixture
+def planners():
+    model_client = MockOpenAI(latency=0.01)
+    planners = []
+    for g in range(8):
+        members = [Agent(name=f"g{g}_agent{i}", role="Engineer", model_client=model_client) for i in range(3)]
+        planner = GroupPlanner(env=Env(description="A team.", members=members), model_client=model_client)
+        planner.set_task("Build it.")
+        planners.append(planner)
+    return planners
+
+def test_tasks_model_cached():
+    model = build_tasks_model(("Alice", "Bob"), ("Alice", "Bob"))
+    assert build_tasks_model(("Alice", "Bob"), ("Alice", "Bob")) is model
+    assert build_tasks_model(("Alice",), ("Alice", "Bob")) is not model
+    with pytest.raises(ValueError):
+        model.model_validate({"tasks": [{"agent_name": "Carol", "task": "t", "receive_information_from": []}]})
+
+def test_concurrent_planning(planners):
+    # every planner gets a plan for its own members, the groups do not share any global state
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        list(executor.map(lambda planner: planner.planning(), planners))
+    for g, planner in enumerate(planners):
+        assert planner.plan[0].agent_name == f"g{g}_agent0"
+        assert planner.plan[0].receive_information_from == [f"g{g}_agent0"]
+
+
+# Run the tests by executing the following command:
+# pytest tests/test_group_planner.py
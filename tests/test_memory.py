@@ -0,0 +1,188 @@
+import time
+import asyncio
+import pytest
+from src.utilities.mock_client import MockOpenAI, AsyncMockOpenAI, MockEmbeddingFunction, mock_embedding
+from src.utilities.embedding import CachedEmbeddingFunction
+from src.memory import Memory, LocalMemoryFilter, get_chroma_client
+
+# export PYTHONPATH=$(pwd)
+
+@pytest.fixture
+def stored():
+    return []
+
+def build_memory(stored, model_client, **kwargs):
+    memory = Memory(working_memory_threshold=2, model_client=model_client, **kwargs)
+    memory._store_long_term_memory = lambda long_term_memory, sources=None: stored.append((long_term_memory, sources))
+    return memory
+
+def test_background_extraction_flush(stored):
+    memory = build_memory(stored, MockOpenAI(latency=0.05), max_pending_extractions=2)
+    for i in range(6):
+        memory.add_working_memory(f"memory {i}")
+    assert memory.working_memory == ["memory 4", "memory 5"]
+    assert memory.flush()
+    assert len(stored) == 4
+    memory.close()
+
+def test_foreground_extraction(stored):
+    memory = build_memory(stored, MockOpenAI(), background_extraction=False)
+    for i in range(3):
+        memory.add_working_memory(f"memory {i}")
+    assert len(stored) == 1
+
+def test_async_background_extraction(stored):
+    async def run():
+        memory = build_memory(stored, AsyncMockOpenAI(latency=0.05))
+        for i in range(4):
+            await memory.aadd_working_memory(f"memory {i}")
+        await memory.aflush()
+    asyncio.run(run())
+    assert len(stored) == 2
+
+def test_batched_extraction(stored):
+    model_client = MockOpenAI()
+    memory = build_memory(stored, model_client, extraction_batch_size=4, extraction_batch_interval=60)
+    for i in range(6):
+        memory.add_working_memory(f"memory {i}")
+    memory.flush()
+    assert model_client.calls["parse"] == 1
+    assert stored[0][1] == [f"memory {i}" for i in range(4)]
+    memory.close()
+
+def test_batched_extraction_source_attribution():
+    class Collection:
+        def __init__(self):
+            self.adds = []
+        def add(self, **kwargs):
+            self.adds.append(kwargs)
+    items = [{"content": f"fact {i}", "category": "semantic", "retrieval_cue": "fact", "importance": 3, "emotional_valence": 0, "source": i + 1} for i in range(3)]
+    memory = Memory(working_memory_threshold=0, model_client=MockOpenAI(parsed_responses=[{"memorys": items}]),
+                    extraction_batch_size=3, extraction_batch_interval=60)
+    memory.db_collection = Collection()
+    for i in range(3):
+        memory.add_working_memory(f"memory {i}")
+    memory.close()
+    assert len(memory.db_collection.adds) == 1
+    assert [m["source"] for m in memory.db_collection.adds[0]["metadatas"]] == ["memory 0", "memory 1", "memory 2"]
+
+def test_async_batched_extraction(stored):
+    model_client = AsyncMockOpenAI()
+    async def run():
+        memory = build_memory(stored, model_client, extraction_batch_size=3, extraction_batch_interval=0.05)
+        for i in range(7):
+            await memory.aadd_working_memory(f"memory {i}")
+        await asyncio.sleep(0.1) # the timer extracts the incomplete batch
+        assert len(stored) == 2
+    asyncio.run(run())
+    assert [len(sources) for _, sources in stored] == [3, 2]
+    assert model_client.calls["parse"] == 2
+
+def test_local_filter(tmp_path):
+    model_client = MockOpenAI()
+    memory = Memory(model_client=model_client, local_filter=LocalMemoryFilter(max_distance=1.6),
+                    db_path=str(tmp_path), embedding_function=MockEmbeddingFunction())
+    documents = ["John likes pizza", "John likes pizza a lot", "John loves pizza", "Alice plays tennis", "The sky is blue", "John went to the park"]
+    memory.db_collection.add(documents=documents, ids=[str(i) for i in range(len(documents))],
+                             metadatas=[{"importance": 3, "created_at": time.time()} for _ in documents])
+    selected = [m["content"] for m in memory.retrieve_relevant_long_term_memory("what does John like", max_results=3)]
+    assert len(selected) == 3
+    assert not {"John likes pizza", "John likes pizza a lot"} <= set(selected) # near-duplicates are not both kept
+    assert "Alice plays tennis" not in selected
+    assert "John loves pizza" in memory.get_memorys_str(query="what does John like", enhanced_filter=True)
+    assert model_client.calls["create"] == 0
+
+@pytest.mark.parametrize("space", ["l2", "cosine"])
+def test_local_filter_distance_space(tmp_path, space):
+    memory = Memory(model_client=MockOpenAI(), db_path=str(tmp_path), embedding_function=MockEmbeddingFunction(space=space))
+    assert memory._distance_space() == space
+    documents = ["John likes pizza", "John loves pizza", "Alice plays tennis", "The sky is blue"]
+    memory.db_collection.add(documents=documents, ids=[str(i) for i in range(len(documents))])
+    query = "what does John like"
+    res = memory._query_long_term_memory(query, len(documents), ["documents", "metadatas", "distances", "embeddings"])
+    # the relevance is the cosine similarity whatever the space
+    for candidate in memory._build_candidates(res):
+        cosine = sum(a * b for a, b in zip(mock_embedding(query), mock_embedding(candidate["content"])))
+        assert LocalMemoryFilter.relevance(candidate["distance"], space) == pytest.approx(cosine, abs=1e-4)
+    selected = [m["content"] for m in memory.retrieve_relevant_long_term_memory(query, max_results=2)]
+    assert selected[0] == "John likes pizza"
+
+def test_llm_filter():
+    model_client = MockOpenAI(responses=["No relevant memory"])
+    memory = Memory(model_client=model_client, filter_mode="llm")
+    assert memory.get_memorys_str(query="what does John like", enhanced_filter=True) == "No relevant memory"
+    assert model_client.calls["create"] == 1
+
+def test_embedding_cache(tmp_path):
+    ef = MockEmbeddingFunction()
+    memory = Memory(model_client=MockOpenAI(), db_path=str(tmp_path), embedding_function=ef)
+    memory.db_collection.add(documents=["John likes pizza"], ids=["0"])
+    for _ in range(3):
+        memory.retrieve_long_term_memory("what does John like")
+    assert ef.calls == 2 # one insert, one query
+    assert memory.db_collection._embedding_function.stats()["hits"] == 2
+
+    # the on-disk cache is shared across instances
+    cached = CachedEmbeddingFunction(MockEmbeddingFunction(), path=str(tmp_path / "embedding_cache.db"))
+    cached(["John likes pizza"])
+    assert cached.embedding_function.calls == 0
+
+def test_shared_collection(tmp_path):
+    items = lambda content: {"memorys": [{"content": content, "category": "semantic", "retrieval_cue": "fact", "importance": 3, "emotional_valence": 0}]}
+    model_client = MockOpenAI(parsed_responses=[items("Alice likes tea"), items("Bob likes coffee")])
+    alice, bob = [Memory(model_client=model_client, db_path=str(tmp_path), embedding_function=MockEmbeddingFunction(), shared_collection="group_memory")
+                  for _ in range(2)]
+    alice.manual_add_long_term_memory("Alice likes tea")
+    bob.manual_add_long_term_memory("Bob likes coffee")
+    assert alice.db_collection.name == bob.db_collection.name == "group_memory"
+    assert alice.db_collection.count() == 2
+    assert [m["content"] for m in alice.retrieve_long_term_memory("what does Bob like")] == ["Alice likes tea"]
+    assert [m["content"] for m in bob.retrieve_relevant_long_term_memory("what does Bob like")] == ["Bob likes coffee"]
+    assert get_chroma_client(str(tmp_path)) is get_chroma_client(str(tmp_path) + "/")
+
+@pytest.mark.parametrize("shared_collection", [None, "group_memory"])
+def test_retrieve_long_term_memory_batch(tmp_path, shared_collection):
+    ef = MockEmbeddingFunction()
+    memories = [Memory(model_client=MockOpenAI(), db_path=str(tmp_path), embedding_function=ef, embedding_cache=False, shared_collection=shared_collection)
+                for _ in range(3)]
+    for i, memory in enumerate(memories):
+        documents = [f"agent {i} fact {j} about topic {j % 3}" for j in range(6)]
+        memory.db_collection.add(documents=documents, ids=[f"{i}-{j}" for j in range(6)],
+                                 metadatas=[{"memory_unique_id": memory.memory_unique_id} for _ in documents])
+    calls = ef.calls
+    for local_filter in [False, True]:
+        batch = Memory.retrieve_long_term_memory_batch(memories, "facts about topic 1", max_results=2, local_filter=local_filter)
+        retrieve = "retrieve_relevant_long_term_memory" if local_filter else "retrieve_long_term_memory"
+        assert batch == [getattr(memory, retrieve)("facts about topic 1", max_results=2) for memory in memories]
+    assert ef.calls == calls + 2 + 6 # one embedding per batch, one per single retrieval
+
+def test_compact(tmp_path):
+    memory = Memory(model_client=MockOpenAI(), db_path=str(tmp_path), embedding_function=MockEmbeddingFunction())
+    now = time.time()
+    documents = ["John likes pizza", "John likes pizza!", "Alice plays tennis", "An old trivia fact"]
+    metadatas = [{"importance": 3, "created_at": now}, {"importance": 2, "created_at": now},
+                 {"importance": 4, "created_at": now}, {"importance": 1, "created_at": now - 90 * 24 * 3600}]
+    memory.db_collection.add(documents=documents, ids=[str(i) for i in range(len(documents))], metadatas=metadatas)
+    metrics = memory.compact()
+    assert (metrics["before"], metrics["after"], metrics["decayed"], metrics["merged"]) == (4, 2, 1, 1)
+    kept = memory.db_collection.get(ids=["0"])
+    assert kept["metadatas"][0]["importance"] == 4 and kept["metadatas"][0]["merged_count"] == 2
+    assert memory.compact()["deleted"] == 0
+
+@pytest.mark.parametrize("shared_collection", [None, "group_memory"])
+def test_compact_empty(tmp_path, shared_collection):
+    memory = Memory(model_client=MockOpenAI(), db_path=str(tmp_path), embedding_function=MockEmbeddingFunction(), shared_collection=shared_collection)
+    metrics = memory.compact()
+    assert (metrics["before"], metrics["after"], metrics["deleted"]) == (0, 0, 0)
+
+def test_background_compaction(tmp_path):
+    memory = Memory(model_client=MockOpenAI(), db_path=str(tmp_path), embedding_function=MockEmbeddingFunction())
+    memory.db_collection.add(documents=["John likes pizza", "John likes pizza"], ids=["0", "1"])
+    memory.start_compaction(interval=0.05)
+    time.sleep(0.2)
+    memory.close()
+    assert memory.db_collection.count() == 1
+
+
+# Run the tests by executing the following command:
+# pytest tests/test_memory.py
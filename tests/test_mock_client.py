@@ -0,0 +1,75 @@
+import asyncio
+import pytest
+from typing import List, Literal
+from pydantic import BaseModel
+from openai.types.chat import ChatCompletion
+from src.utilities.mock_client import MockOpenAI, AsyncMockOpenAI, default_instance
+from src.utilities.utils import is_async_client
+from src.protocol import Env
+from src.agent import Agent
+from src.group import Group
+
+# export PYTHONPATH=$(pwd)
+
+class Step(BaseModel):
+    agent_name: Literal["Alice", "Bob"]
+    priority: Literal[1, 2, 3]
+
+class Plan(BaseModel):
+    steps: List[Step]
+
+@pytest.fixture
+def group():
+    replies = ["Hi Bob.", "Hi Alice. [=END=]"]
+    # handoff calls (tool_choice="required") fall back to the default rotating tool call
+    model_client = MockOpenAI(responses=lambda **kwargs: None if kwargs.get("tool_choice") == "required" else replies.pop(0))
+    members = [Agent(name="Alice", role="Manager", model_client=model_client),
+               Agent(name="Bob", role="Engineer", model_client=model_client)]
+    return Group(env=Env(description="A small team.", members=members), model_client=model_client)
+
+def test_create_scripted_and_default():
+    model_client = MockOpenAI(responses=["Hello!"])
+    first = model_client.chat.completions.create(model="m", messages=[{"role": "user", "content": "Hi"}])
+    second = model_client.chat.completions.create(model="m", messages=[{"role": "user", "content": "Hi"}])
+    assert isinstance(first, ChatCompletion)
+    assert first.choices[0].message.content == "Hello!"
+    assert second.choices[0].message.content == "Mock response 2."
+    assert model_client.calls["create"] == 2
+
+def test_create_tool_calls():
+    tools = [{"type": "function", "function": {"name": name, "parameters": {}}} for name in ["a", "b"]]
+    model_client = MockOpenAI()
+    names = [model_client.chat.completions.create(model="m", messages=[], tools=tools, tool_choice="required").choices[0].message.tool_calls[0].function.name
+             for _ in range(2)]
+    assert sorted(names) == ["a", "b"]
+
+def test_parse_default_instance():
+    completion = MockOpenAI().beta.chat.completions.parse(model="m", messages=[], response_format=Plan)
+    assert completion.choices[0].message.parsed == default_instance(Plan)
+    assert completion.choices[0].message.parsed.steps[0].agent_name == "Alice"
+
+def test_embeddings_deterministic():
+    model_client = MockOpenAI()
+    a, b = model_client.embeddings.create(model="m", input=["same text", "same text"]).data
+    assert a.embedding == b.embedding
+
+def test_async_client():
+    model_client = AsyncMockOpenAI(responses=["Hello!"])
+    assert is_async_client(model_client)
+    completion = asyncio.run(model_client.chat.completions.create(model="m", messages=[]))
+    assert completion.choices[0].message.content == "Hello!"
+
+def test_agent_stream():
+    agent = Agent(name="Alice", role="Manager", model_client=MockOpenAI(responses=["Hello there, Bob!"]))
+    messages = list(agent.do("Hi", stream=True))
+    assert "".join(m.result for m in messages if m.action == "talk_chunk") == "Hello there, Bob!"
+    assert messages[-1].result == "Hello there, Bob!"
+
+def test_group_dialogue(group):
+    group.user_input("Say hello to each other.")
+    group.dialogue(max_turns=5)
+    assert [m.result for m in group.group_messages.context[1:]] == ["Hi Bob.", "Hi Alice. [=END=]"]
+
+
+# Run the tests by executing the following command:
+# pytest tests/test_mock_client.py
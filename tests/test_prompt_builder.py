@@ -0,0 +1,68 @@
+import random
+import pytest
+from src.protocol import Message
+from src.utilities.prompt_builder import IncrementalPromptBuilder, format_message
+from src.utilities.tokens import count_tokens, truncate_tokens, resolve_token_budget
+
+# export PYTHONPATH=$(pwd)
+
+def split_messages(context, send_to, cut_off):
+    window = context if cut_off is None else context[-cut_off:]
+    return ("\n\n".join(format_message(m) for m in window if m.sender == send_to),
+            "\n\n".join(format_message(m) for m in window if m.sender != send_to))
+
+@pytest.fixture
+def builder():
+    return IncrementalPromptBuilder()
+
+def test_incremental_matches_full_scan(builder):
+    rng = random.Random(0)
+    context = []
+    for step in range(2000):
+        r = rng.random()
+        if r < 0.9:
+            context.append(Message(sender=rng.choice(["Alice", "Bob", "user"]), action="talk", result=f"message {step}"))
+        elif r < 0.93:
+            context = [] # reset_group_messages
+        elif context:
+            context.pop()
+        send_to, cut_off = rng.choice(["Alice", "Bob", "user"]), rng.choice([None, 1, 3, 10])
+        assert builder.split_messages(context, send_to, cut_off) == split_messages(context, send_to, cut_off)
+
+def test_only_new_messages_are_formatted():
+    formatted = []
+    builder = IncrementalPromptBuilder(lambda m: formatted.append(m) or m.result)
+    context = [Message(sender="Alice", action="talk", result=str(i)) for i in range(100)]
+    builder.split_messages(context, "Alice", 3)
+    context.append(Message(sender="Bob", action="talk", result="new"))
+    assert builder.split_messages(context, "Alice", 3) == ("98\n\n99", "new")
+    assert len(formatted) == 101
+
+
+def test_count_and_truncate_tokens():
+    assert count_tokens("Hello, world!") == 4
+    assert count_tokens("你好世界") == 4
+    text = " ".join(f"word{i}" for i in range(1000))
+    truncated = truncate_tokens(text, 100)
+    assert truncated.endswith("...[truncated]") and count_tokens(truncated) <= 100
+    assert truncate_tokens("short", 100) == "short"
+    assert resolve_token_budget({"gpt-4o": 8000, "gpt-4o-mini": 2000, "default": 1000}, "gpt-4o-mini-2024-07-18") == 2000
+    assert resolve_token_budget({"gpt-4o": 8000, "default": 1000}, "o1") == 1000
+    assert resolve_token_budget(500, "gpt-4o") == 500
+
+@pytest.mark.parametrize("token_budget", [10, 200, 5000])
+def test_token_budget_keeps_most_recent_messages(token_budget):
+    builder = IncrementalPromptBuilder(max_message_tokens=50)
+    context = [Message(sender=["Alice", "Bob"][i % 2], action="talk", result=f"message {i} " + "blah " * (i % 7) * 30) for i in range(500)]
+    previous_messages, others_messages = builder.split_messages(context, "Alice", None, token_budget)
+    fragments = [f for f in previous_messages.split("\n\n") + others_messages.split("\n\n") if f]
+    assert "message 499 " in others_messages # the last message is always kept
+    assert sum(count_tokens(f) + 1 for f in fragments) <= max(token_budget, count_tokens(fragments[-1]) + 1)
+    assert all(count_tokens(f) < 80 for f in fragments) # results truncated
+    # the kept messages are the most recent ones
+    kept = sorted(int(f.split("message ")[1].split()[0]) for f in fragments)
+    assert kept == list(range(500 - len(kept), 500))
+
+
+# Run the tests by executing the following command:
+# pytest tests/test_prompt_builder.py
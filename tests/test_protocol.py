@@ -0,0 +1,113 @@
+import copy
+import json
+import random
+import sys
+import threading
+import pytest
+from src.protocol import Env, Member, Message, MessageLog, GroupMessageProtocol, RelationshipGraph
+
+# export PYTHONPATH=$(pwd)
+
+@pytest.fixture
+def group_messages():
+    return GroupMessageProtocol(group_id="test", env=Env(description="test"))
+
+def test_message_log_matches_full_scan():
+    rng = random.Random(0)
+    log = MessageLog()
+    for step in range(2000):
+        r = rng.random()
+        if r < 0.85:
+            log.append(Message(sender=rng.choice(["Alice", "Bob", "user"]), action=rng.choice(["talk", "task"]), result=f"message {step}"))
+        elif r < 0.9:
+            log.extend([Message(sender="Bob", action="talk", result=f"extended {step}")])
+        elif r < 0.93:
+            log.clear()
+        elif r < 0.96 and log:
+            log.pop(rng.randrange(len(log)))
+        elif log:
+            log[rng.randrange(len(log))] = Message(sender="Alice", action="talk", result=f"replaced {step}")
+        sender, action, k = rng.choice(["Alice", "Bob", "user"]), rng.choice(["talk", "task"]), rng.choice([None, 1, 3])
+        by_sender = [m for m in log if m.sender == sender]
+        by_action = [m for m in log if m.action == action]
+        assert log.by_sender(sender, last=k) == (by_sender[-k:] if k else by_sender)
+        assert log.by_action(action, last=k) == (by_action[-k:] if k else by_action)
+        assert log.sender_positions(sender) == [i for i, m in enumerate(log) if m.sender == sender]
+
+def test_group_messages_context_api(group_messages):
+    group_messages.context.append(Message(sender="user", action="talk", result="Hi"))
+    group_messages.context.extend([Message(sender="Alice", action="talk", result="Hello")])
+    assert isinstance(group_messages.context, MessageLog)
+    assert group_messages.context.by_sender("Alice")[0].result == "Hello"
+    assert json.loads(json.dumps(group_messages.to_dict()))["context"][1]["sender"] == "Alice"
+
+    group_messages.context = [] # reset_group_messages
+    assert isinstance(group_messages.context, MessageLog)
+    assert group_messages.context.by_sender("Alice") == []
+    assert isinstance(GroupMessageProtocol(group_id="test", env=Env(description="test"), context=[]).context, MessageLog)
+
+def test_message_log_concurrent_lookups():
+    switch_interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6) # switch threads as often as possible
+    try:
+        for _ in range(20):
+            log = MessageLog()
+            barrier = threading.Barrier(8)
+            def worker(index):
+                barrier.wait()
+                for step in range(200):
+                    log.append(Message(sender=["Alice", "Bob"][step % 2], action="task", result=f"{index}-{step}"))
+                    log.sender_positions("Alice")
+                    log.by_sender("Bob", last=3)
+            threads = [threading.Thread(target=worker, args=(index,)) for index in range(8)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            # every message is indexed exactly once
+            assert log.sender_positions("Alice") == [i for i, m in enumerate(log) if m.sender == "Alice"]
+            assert log.action_positions("task") == list(range(1600))
+    finally:
+        sys.setswitchinterval(switch_interval)
+
+def test_message_log_copy():
+    log = MessageLog([Message(sender="Alice", action="talk", result="Hi")])
+    log.by_sender("Alice")
+    copied = copy.deepcopy(log)
+    assert isinstance(copied, MessageLog) and copied == log and copied[0] is not log[0]
+    copied.append(Message(sender="Alice", action="talk", result="Bye"))
+    assert len(copied.by_sender("Alice")) == 2 and len(log.by_sender("Alice")) == 1
+
+
+def test_relationship_graph():
+    graph = RelationshipGraph(["Alice", "Bob", "Charlie"], [("Alice", "Bob"), ("Alice", "Charlie")])
+    assert graph.to_dict() == {"Alice": ["Bob", "Charlie"], "Bob": ["Alice"], "Charlie": ["Alice"]}
+    assert graph.has_edge("Bob", "Alice") and not graph.has_edge("Bob", "Charlie")
+    graph.add_node("Dave")
+    graph.add_edge("Dave", "Bob")
+    graph.remove_node("Alice")
+    assert graph.to_dict() == {"Bob": [], "Charlie": [], "Dave": ["Bob"]}
+
+    graph = RelationshipGraph(["Alice", "Bob"], {"Alice": ["Bob"]})
+    assert graph.to_dict() == {"Alice": ["Bob"], "Bob": []}
+
+    graph = RelationshipGraph(["Alice", "Bob"])
+    assert graph.fully_connected and graph["Alice"] == ["Bob"]
+    graph.add_node("Charlie")
+    assert graph["Alice"] == ["Bob", "Charlie"] and graph.has_edge("Charlie", "Bob")
+    graph.remove_node("Bob")
+    assert graph.to_dict() == {"Alice": ["Charlie"], "Charlie": ["Alice"]}
+
+    env = Env(description="test", members=[Member(name="Alice", role="r", description="d")], relationships=graph)
+    assert json.loads(json.dumps(env.to_dict()))["relationships"] == {"Alice": ["Charlie"], "Charlie": ["Alice"]}
+    copied = copy.deepcopy(env).relationships
+    assert isinstance(copied, RelationshipGraph) and copied.to_dict() == graph.to_dict()
+    copied.remove_node("Charlie")
+    assert graph["Alice"] == ["Charlie"]
+    directed = RelationshipGraph(["Alice", "Bob", "Charlie"], {"Alice": ["Bob"], "Charlie": ["Alice"]})
+    copied = copy.deepcopy(directed)
+    assert not copied.fully_connected and copied.to_dict() == directed.to_dict()
+
+
+# Run the tests by executing the following command:
+# pytest tests/test_protocol.py